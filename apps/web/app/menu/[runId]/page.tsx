@@ -1,9 +1,16 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useParams } from "next/navigation";
 import Link from "next/link";
-import { getMenuData, getMenuImages, Menu, ImagesResponse } from "@/lib/api";
+import {
+  getMenuData,
+  loadMenuImages,
+  getDishImages,
+  Menu,
+  ImagesResponse,
+  DishImages,
+} from "@/lib/api";
 import DishCard from "@/components/DishCard";
 
 type LoadState = "loading" | "loaded" | "error";
@@ -17,13 +24,48 @@ export default function MenuPage() {
   const [menuState, setMenuState] = useState<LoadState>("loading");
   const [imagesState, setImagesState] = useState<LoadState>("loading");
   const [error, setError] = useState<string | null>(null);
+  const [partial, setPartial] = useState(false);
+  // Set once a partial menu has been shown, so we don't swap it for a spinner
+  const [streamed, setStreamed] = useState(false);
+  // Images asked for per section as it scrolls into view
+  const [sectionImages, setSectionImages] = useState<Record<string, DishImages>>({});
+  const requested = useRef<Set<string>>(new Set());
+  const sectionRefs = useRef<(HTMLDivElement | null)[]>([]);
 
   useEffect(() => {
+    let cancelled = false;
+
     async function loadMenu() {
       try {
-        const data = await getMenuData(runId);
-        setMenu(data.menu ?? null);
-        setMenuState("loaded");
+        // Keep long-polling while extraction is still streaming dishes in
+        let version: string | undefined;
+        while (!cancelled) {
+          const data = await getMenuData(runId, version);
+          if (cancelled) return;
+          version = data.version;
+
+          if (data.status === "FAILED") {
+            throw new Error(data.error || "Extraction failed");
+          }
+
+          if (data.menu) {
+            setMenu(data.menu);
+            setMenuState("loaded");
+          }
+
+          if (data.status !== "PARTIAL" && data.status !== "PROCESSING") {
+            setPartial(false);
+            if (!data.menu) setMenuState("loaded");
+            loadImages();
+            return;
+          }
+
+          setPartial(true);
+          if (data.menu) setStreamed(true);
+          if (!version) {
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+          }
+        }
       } catch (err) {
         setMenuState("error");
         setError(err instanceof Error ? err.message : "Failed to load menu");
@@ -32,9 +74,17 @@ export default function MenuPage() {
 
     async function loadImages() {
       try {
-        const data = await getMenuImages(runId);
-        setImages(data);
-        setImagesState("loaded");
+        // Show dishes' photos as they come in rather than after the slowest one
+        await loadMenuImages(
+          runId,
+          (data) => {
+            if (cancelled) return;
+            data.dishes.forEach((d) => requested.current.add(d.name));
+            setImages(data);
+            setImagesState("loaded");
+          },
+          () => cancelled
+        );
       } catch (err) {
         setImagesState("error");
         // Don't set error for images - they're optional
@@ -42,18 +92,59 @@ export default function MenuPage() {
     }
 
     loadMenu();
-    loadImages();
+
+    return () => {
+      cancelled = true;
+    };
   }, [runId]);
 
+  // The background search only covers the top of the menu (drinks last, up
+  // to a cap), so ask for each section's other dishes once it's in view
+  useEffect(() => {
+    if (!menu || partial || imagesState === "loading") return;
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        entries.forEach((entry) => {
+          if (!entry.isIntersecting) return;
+          const index = Number((entry.target as HTMLElement).dataset.section);
+          const names = (menu.sections[index]?.dishes ?? [])
+            .map((dish) => dish.name)
+            .filter((name) => !requested.current.has(name));
+          if (names.length === 0) return;
+
+          names.forEach((name) => requested.current.add(name));
+          getDishImages(runId, names)
+            .then((data) => {
+              setSectionImages((prev) => {
+                const next = { ...prev };
+                data.dishes.forEach((d) => {
+                  next[d.name] = d;
+                });
+                return next;
+              });
+            })
+            .catch(() => {
+              // Try again next time the section comes into view
+              names.forEach((name) => requested.current.delete(name));
+            });
+        });
+      },
+      { rootMargin: "200px 0px" }
+    );
+    sectionRefs.current.forEach((el) => el && observer.observe(el));
+    return () => observer.disconnect();
+  }, [menu, partial, imagesState, runId]);
+
   // Create a map of dish name to images
   const dishImages: Record<string, string[]> = {};
-  if (images?.dishes) {
-    images.dishes.forEach((d) => {
-      dishImages[d.name] = d.images;
-    });
-  }
+  const dishThumbnails: Record<string, Record<string, string>> = {};
+  [...Object.values(sectionImages), ...(images?.dishes || [])].forEach((d) => {
+    dishImages[d.name] = d.images;
+    if (d.thumbnails) dishThumbnails[d.name] = d.thumbnails;
+  });
 
-  if (menuState === "loading" || imagesState === "loading") {
+  if (menuState === "loading" || (imagesState === "loading" && !streamed)) {
     return (
       <div className="max-w-4xl mx-auto px-4 py-8">
         <div className="flex flex-col items-center justify-center py-12 gap-3">
@@ -102,6 +193,12 @@ export default function MenuPage() {
           {totalDishes} dishes found in {menu.sections.length} section
           {menu.sections.length !== 1 ? "s" : ""}
         </p>
+        {partial && (
+          <p className="mt-2 text-sm text-gray-500 dark:text-gray-400 flex items-center gap-2">
+            <span className="animate-spin rounded-full h-3 w-3 border-2 border-primary-500 border-t-transparent"></span>
+            Still reading the menu...
+          </p>
+        )}
       </div>
 
       {/* Get Recommendations CTA */}
@@ -123,7 +220,14 @@ export default function MenuPage() {
 
       {/* Menu Sections */}
       {menu.sections.map((section, sectionIndex) => (
-        <div key={sectionIndex} className="mb-8">
+        <div
+          key={sectionIndex}
+          ref={(el) => {
+            sectionRefs.current[sectionIndex] = el;
+          }}
+          data-section={sectionIndex}
+          className="mb-8"
+        >
           <h2 className="text-2xl font-semibold text-gray-900 dark:text-white mb-4 pb-2 border-b border-gray-200 dark:border-gray-700">
             {section.name}
           </h2>
@@ -133,7 +237,8 @@ export default function MenuPage() {
                 key={dishIndex}
                 dish={dish}
                 images={dishImages[dish.name] || []}
-                loading={false}
+                thumbnails={dishThumbnails[dish.name]}
+                loading={streamed && imagesState === "loading"}
                 showPrice={allDishesHavePrices}
               />
             ))}
@@ -5,11 +5,13 @@ import { useParams } from "next/navigation";
 import Link from "next/link";
 import {
   getMenuData,
-  getMenuImages,
+  loadMenuImages,
+  getDishImages,
   getRecommendations,
   getReviews,
   Menu,
   ImagesResponse,
+  DishImages,
   RecommendResponse,
   ReviewsResponse,
 } from "@/lib/api";
@@ -23,6 +25,7 @@ export default function RecommendPage() {
 
   const [menu, setMenu] = useState<Menu | null>(null);
   const [images, setImages] = useState<ImagesResponse | null>(null);
+  const [recImages, setRecImages] = useState<Record<string, DishImages>>({});
   const [reviews, setReviews] = useState<ReviewsResponse | null>(null);
   const [recommendations, setRecommendations] = useState<RecommendResponse | null>(null);
   const [menuState, setMenuState] = useState<LoadState>("loading");
@@ -51,7 +54,7 @@ export default function RecommendPage() {
 
     async function loadImages() {
       try {
-        const data = await getMenuImages(runId);
+        const data = await loadMenuImages(runId);
         setImages(data);
       } catch {
         // Images are optional
@@ -90,6 +93,22 @@ export default function RecommendPage() {
       setRecommendations(recData);
       setReviews(reviewData);
       setRecState("loaded");
+
+      // Recommended dishes may be past the background image search's cap
+      const recommended = recData.recommendations.map((rec) => rec.dish);
+      if (recommended.length > 0) {
+        getDishImages(runId, recommended)
+          .then((data) => {
+            const next: Record<string, DishImages> = {};
+            data.dishes.forEach((d) => {
+              next[d.name] = d;
+            });
+            setRecImages((prev) => ({ ...prev, ...next }));
+          })
+          .catch(() => {
+            // Images are optional
+          });
+      }
     } catch (err) {
       console.error("Error getting recommendations:", err);
       setRecState("error");
@@ -121,11 +140,11 @@ export default function RecommendPage() {
   }
 
   const dishImages: Record<string, string[]> = {};
-  if (images?.dishes) {
-    images.dishes.forEach((d) => {
-      dishImages[d.name] = d.images;
-    });
-  }
+  const dishThumbnails: Record<string, Record<string, string>> = {};
+  [...Object.values(recImages), ...(images?.dishes || [])].forEach((d) => {
+    dishImages[d.name] = d.images;
+    if (d.thumbnails) dishThumbnails[d.name] = d.thumbnails;
+  });
 
   return (
     <div className="max-w-4xl mx-auto px-4 py-8">
@@ -154,6 +173,7 @@ export default function RecommendPage() {
       <RecommendationView
         menu={menu}
         dishImages={dishImages}
+        dishThumbnails={dishThumbnails}
         reviews={reviews}
         recommendations={recommendations}
         loading={recState === "loading"}
@@ -6,6 +6,8 @@ import { Dish } from "@/lib/api";
 interface DishCardProps {
   dish: Dish;
   images: string[];
+  // Mirrored copies of images[0], by size ("sm", "md")
+  thumbnails?: Record<string, string>;
   loading?: boolean;
   highlighted?: boolean;
   highlightReason?: string;
@@ -15,6 +17,7 @@ interface DishCardProps {
 export default function DishCard({
   dish,
   images,
+  thumbnails,
   loading = false,
   highlighted = false,
   highlightReason,
@@ -22,6 +25,12 @@ export default function DishCard({
 }: DishCardProps) {
   const [currentImageIndex, setCurrentImageIndex] = useState(0);
   const [imageError, setImageError] = useState<Record<number, boolean>>({});
+  const [thumbnailError, setThumbnailError] = useState(false);
+
+  // Show the first photo from our own thumbnail if there is one; the
+  // original is the fallback if the thumbnail fails to load.
+  const thumbnail = thumbnailError ? undefined : thumbnails?.md || thumbnails?.sm;
+  const sources = images.map((src, i) => (i === 0 && thumbnail) || src);
 
   // Find valid (non-errored) images
   const validIndices = images
@@ -74,11 +83,13 @@ export default function DishCard({
         ) : hasImages ? (
           <>
             <img
-              src={images[currentImageIndex]}
+              src={sources[currentImageIndex]}
               alt={dish.name}
               className="w-full h-full object-cover"
               onError={() =>
-                setImageError((prev) => ({ ...prev, [currentImageIndex]: true }))
+                currentImageIndex === 0 && thumbnail
+                  ? setThumbnailError(true)
+                  : setImageError((prev) => ({ ...prev, [currentImageIndex]: true }))
               }
             />
             {validIndices.length > 1 && (
@@ -71,16 +71,27 @@ export default function MenuUpload() {
         )
       );
 
-      // Start extraction (returns immediately)
+      // Extraction starts on the backend as soon as the uploads land. This
+      // call is only a fallback in case that trigger hasn't fired, so don't
+      // hold up polling on it.
       setState("extracting");
-      await extractMenu(run_id);
-
-      // Poll for completion
-      let attempts = 0;
-      const maxAttempts = 60; // 2 minutes max
-      while (attempts < maxAttempts) {
-        await new Promise((resolve) => setTimeout(resolve, 2000)); // Wait 2 seconds
-        const result = await getMenuData(run_id);
+      extractMenu(run_id).catch((err) => {
+        console.warn("Extract fallback request failed:", err);
+      });
+
+      // Long-poll for completion: each request returns as soon as the run changes
+      const deadline = Date.now() + 2 * 60 * 1000; // 2 minutes max
+      let version: string | undefined;
+      while (Date.now() < deadline) {
+        const result = await getMenuData(run_id, version);
+        version = result.version;
+
+        if (result.status === "PARTIAL") {
+          // First dishes are in — show them while the rest streams in
+          setState("complete");
+          router.push(`/menu/${run_id}`);
+          return;
+        }
 
         if (result.status === "EXTRACTED" || result.menu) {
           // Menu extracted — now wait for images (already being fetched by backend)
@@ -95,7 +106,10 @@ export default function MenuUpload() {
           throw new Error(result.error || "Extraction failed");
         }
 
-        attempts++;
+        if (!version) {
+          // Older API without long-poll support
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+        }
       }
 
       throw new Error("Extraction timed out");
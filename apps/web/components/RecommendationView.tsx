@@ -7,6 +7,7 @@ import DishCard from "./DishCard";
 interface RecommendationViewProps {
   menu: Menu;
   dishImages: Record<string, string[]>;
+  dishThumbnails: Record<string, Record<string, string>>;
   reviews: ReviewsResponse | null;
   recommendations: RecommendResponse | null;
   loading: boolean;
@@ -46,6 +47,7 @@ const dietaryOptions = [
 export default function RecommendationView({
   menu,
   dishImages,
+  dishThumbnails,
   reviews,
   recommendations,
   loading,
@@ -329,6 +331,7 @@ export default function RecommendationView({
                     key={index}
                     dish={dish}
                     images={dishImages[dish.name] || []}
+                    thumbnails={dishThumbnails[dish.name]}
                     highlighted={true}
                     highlightReason={rec.reason}
                     showPrice={allDishesHavePrices}
@@ -36,6 +36,7 @@ export interface Menu {
 export interface ExtractResponse {
   run_id: string;
   status?: string;
+  version?: string;
   menu?: Menu;
   error?: string;
 }
@@ -63,6 +64,8 @@ export interface RecommendResponse {
   plan: RecommendationPlan;
   recommendations: Recommendation[];
   avoid: AvoidDish[];
+  // Key for the cacheable GET of these recommendations
+  prefs_hash?: string;
 }
 
 export interface RecommendRequest {
@@ -76,11 +79,18 @@ export interface RecommendRequest {
   };
 }
 
+export interface DishImages {
+  name: string;
+  images: string[];
+  seq?: number;
+  thumbnails?: Record<string, string>;
+}
+
 export interface ImagesResponse {
-  dishes: Array<{
-    name: string;
-    images: string[];
-  }>;
+  dishes: DishImages[];
+  // Cursor for the next getMenuImages call; absent from older APIs
+  seq?: number;
+  complete?: boolean;
 }
 
 export interface ReviewMention {
@@ -145,24 +155,135 @@ export async function extractMenu(runId: string): Promise<ExtractResponse> {
   });
 }
 
-export async function getMenuImages(runId: string): Promise<ImagesResponse> {
+// Long-poll seconds for getMenuImages follow-ups (the API caps this at 20)
+export const IMAGES_POLL_WAIT_SECONDS = 15;
+
+/**
+ * Get the dish images ready so far. Pass the `seq` from the previous
+ * response as `since` to get only dishes that are new or changed since,
+ * long-polling up to `wait` seconds for some. A GET, so once the run's
+ * images are complete the browser serves repeats from its cache.
+ */
+export async function getMenuImages(
+  runId: string,
+  since?: number,
+  wait: number = IMAGES_POLL_WAIT_SECONDS
+): Promise<ImagesResponse> {
+  const query = since === undefined ? "" : `?since=${since}&wait=${wait}`;
+  return fetchAPI<ImagesResponse>(`/menu/${runId}/images${query}`, {
+    method: "GET",
+  });
+}
+
+/**
+ * Load a run's dish images as they become ready. `onUpdate` gets all dishes
+ * so far after every response; resolves once the set is complete (or
+ * `isCancelled` returns true).
+ */
+export async function loadMenuImages(
+  runId: string,
+  onUpdate?: (images: ImagesResponse) => void,
+  isCancelled?: () => boolean
+): Promise<ImagesResponse> {
+  const dishes = new Map<string, DishImages>();
+  let since: number | undefined;
+  for (;;) {
+    const data = await getMenuImages(runId, since);
+    data.dishes.forEach((dish) => dishes.set(dish.name, dish));
+    const merged = {
+      dishes: Array.from(dishes.values()),
+      seq: data.seq,
+      complete: data.complete,
+    };
+    onUpdate?.(merged);
+    // Older APIs answer with everything at once and no completion marker
+    if (data.complete !== false || isCancelled?.()) return merged;
+    since = data.seq;
+  }
+}
+
+/**
+ * Get images for specific dishes of a run, e.g. a section as it scrolls
+ * into view. Dishes the run hasn't searched yet (the background search
+ * covers the top of the menu first and stops at a cap) are searched now.
+ */
+export async function getDishImages(
+  runId: string,
+  dishes: string[]
+): Promise<ImagesResponse> {
   return fetchAPI<ImagesResponse>("/menu/images", {
     method: "POST",
-    body: JSON.stringify({ run_id: runId }),
+    body: JSON.stringify({ run_id: runId, dishes }),
   });
 }
 
+// prefs_hash of recommendations generated this session, by request
+const RECOMMENDATION_HASHES_KEY = "nibble:recommendation-hashes";
+
+function recommendationHashes(): Record<string, string> {
+  try {
+    return JSON.parse(sessionStorage.getItem(RECOMMENDATION_HASHES_KEY) || "{}");
+  } catch {
+    return {};
+  }
+}
+
+/**
+ * Get recommendations for a run and preferences. The first time they're
+ * generated (POST); after that they're fetched with a GET by their
+ * prefs_hash, which the browser answers from its cache.
+ */
 export async function getRecommendations(
   request: RecommendRequest
 ): Promise<RecommendResponse> {
-  return fetchAPI<RecommendResponse>("/menu/recommend", {
+  const requestKey = JSON.stringify(request);
+  const hashes = typeof window === "undefined" ? {} : recommendationHashes();
+  const known = hashes[requestKey];
+  if (known) {
+    try {
+      return await fetchAPI<RecommendResponse>(
+        `/menu/${request.run_id}/recommendations/${known}`,
+        { method: "GET" }
+      );
+    } catch {
+      // Not there after all; generate them below
+    }
+  }
+
+  const data = await fetchAPI<RecommendResponse>("/menu/recommend", {
     method: "POST",
     body: JSON.stringify(request),
   });
+  if (data.prefs_hash && typeof window !== "undefined") {
+    try {
+      sessionStorage.setItem(
+        RECOMMENDATION_HASHES_KEY,
+        JSON.stringify({ ...hashes, [requestKey]: data.prefs_hash })
+      );
+    } catch {
+      // Storage full or disabled: just no cache
+    }
+  }
+  return data;
 }
 
-export async function getMenuData(runId: string): Promise<ExtractResponse> {
-  return fetchAPI<ExtractResponse>(`/menu/${runId}`, {
+// Long-poll seconds for getMenuData (the API caps this at 20)
+export const MENU_POLL_WAIT_SECONDS = 20;
+
+/**
+ * Get a run's menu and status. Pass the `version` from the previous response
+ * as `since` to long-poll: the request returns as soon as the run changes,
+ * or after `wait` seconds.
+ */
+export async function getMenuData(
+  runId: string,
+  since?: string,
+  wait: number = MENU_POLL_WAIT_SECONDS
+): Promise<ExtractResponse> {
+  const query = since
+    ? `?since=${encodeURIComponent(since)}&wait=${wait}`
+    : "";
+  return fetchAPI<ExtractResponse>(`/menu/${runId}${query}`, {
     method: "GET",
   });
 }
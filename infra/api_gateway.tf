@@ -3,6 +3,11 @@ resource "aws_api_gateway_rest_api" "main" {
   name        = "${local.name_prefix}-api"
   description = "Nibble Menu API"
 
+  # Lets handlers return gzip/brotli bodies (base64 + isBase64Encoded, see
+  # lib/response.compress). Request bodies then reach Lambda base64-encoded
+  # too; lib/response.compress_response decodes them.
+  binary_media_types = ["*/*"]
+
   endpoint_configuration {
     types = ["REGIONAL"]
   }
@@ -36,6 +41,27 @@ resource "aws_api_gateway_resource" "menu_run" {
   path_part   = "{runId}"
 }
 
+# /menu/{runId}/images resource
+resource "aws_api_gateway_resource" "run_images" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.menu_run.id
+  path_part   = "images"
+}
+
+# /menu/{runId}/recommendations resource
+resource "aws_api_gateway_resource" "run_recommendations" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.menu_run.id
+  path_part   = "recommendations"
+}
+
+# /menu/{runId}/recommendations/{prefsHash} resource
+resource "aws_api_gateway_resource" "run_recommendation" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.run_recommendations.id
+  path_part   = "{prefsHash}"
+}
+
 # /menu/extract resource
 resource "aws_api_gateway_resource" "extract" {
   rest_api_id = aws_api_gateway_rest_api.main.id
@@ -153,6 +179,49 @@ resource "aws_api_gateway_integration" "menu_get" {
   uri                     = aws_lambda_function.menu_get.invoke_arn
 }
 
+# GET /menu/{runId}/images - the cacheable twin of POST /menu/images
+resource "aws_api_gateway_method" "run_images_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.run_images.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.runId" = true
+  }
+}
+
+resource "aws_api_gateway_integration" "run_images_get" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.run_images.id
+  http_method             = aws_api_gateway_method.run_images_get.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.images.invoke_arn
+}
+
+# GET /menu/{runId}/recommendations/{prefsHash} - recommendations generated by POST /menu/recommend
+resource "aws_api_gateway_method" "run_recommendation_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.run_recommendation.id
+  http_method   = "GET"
+  authorization = "NONE"
+
+  request_parameters = {
+    "method.request.path.runId"     = true
+    "method.request.path.prefsHash" = true
+  }
+}
+
+resource "aws_api_gateway_integration" "run_recommendation_get" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.run_recommendation.id
+  http_method             = aws_api_gateway_method.run_recommendation_get.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.recommend.invoke_arn
+}
+
 # POST /menu/reviews
 resource "aws_api_gateway_method" "reviews_post" {
   rest_api_id   = aws_api_gateway_rest_api.main.id
@@ -211,6 +280,22 @@ module "cors_menu_run" {
   origin      = var.frontend_url
 }
 
+module "cors_run_images" {
+  source  = "./modules/cors"
+
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.run_images.id
+  origin      = var.frontend_url
+}
+
+module "cors_run_recommendation" {
+  source  = "./modules/cors"
+
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.run_recommendation.id
+  origin      = var.frontend_url
+}
+
 module "cors_reviews" {
   source  = "./modules/cors"
 
@@ -228,17 +313,30 @@ resource "aws_api_gateway_deployment" "main" {
     aws_api_gateway_integration.recommend,
     aws_api_gateway_integration.menu_get,
     aws_api_gateway_integration.reviews,
+    aws_api_gateway_integration.run_images_get,
+    aws_api_gateway_integration.run_recommendation_get,
     module.cors_presign,
     module.cors_extract,
     module.cors_images,
     module.cors_recommend,
     module.cors_menu_run,
-    module.cors_reviews
+    module.cors_reviews,
+    module.cors_run_images,
+    module.cors_run_recommendation
   ]
 
   rest_api_id = aws_api_gateway_rest_api.main.id
   stage_name  = var.environment
 
+  # API-level settings and new routes only reach the stage with a new deployment
+  triggers = {
+    redeployment = sha1(jsonencode([
+      aws_api_gateway_rest_api.main.binary_media_types,
+      aws_api_gateway_integration.run_images_get.id,
+      aws_api_gateway_integration.run_recommendation_get.id,
+    ]))
+  }
+
   lifecycle {
     create_before_destroy = true
   }
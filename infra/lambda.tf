@@ -56,8 +56,11 @@ resource "aws_iam_role_policy" "lambda_custom" {
         Effect = "Allow"
         Action = [
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem",
           "dynamodb:Query",
           "dynamodb:Scan"
         ]
@@ -67,6 +70,31 @@ resource "aws_iam_role_policy" "lambda_custom" {
           aws_dynamodb_table.image_cache.arn
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:ChangeMessageVisibility",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = [
+          aws_sqs_queue.extract.arn,
+          aws_sqs_queue.extract_dlq.arn
+        ]
+      },
+      {
+        # Extract starts image fetching, and so does the images API when
+        # nothing has yet, both as async invocations of the images function
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = [
+          aws_lambda_function.images.arn
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
@@ -82,16 +110,7 @@ resource "aws_iam_role_policy" "lambda_custom" {
   })
 }
 
-# Lambda layer for dependencies
-resource "aws_lambda_layer_version" "deps" {
-  filename            = "${path.module}/../services/api/layer.zip"
-  layer_name          = "${local.name_prefix}-deps"
-  compatible_runtimes = ["python3.11"]
-
-  lifecycle {
-    create_before_destroy = true
-  }
-}
+# Each package bundles its own dependencies (services/api/build.sh)
 
 # Presign Lambda
 resource "aws_lambda_function" "presign" {
@@ -104,8 +123,6 @@ resource "aws_lambda_function" "presign" {
   memory_size      = 256
   source_code_hash = filebase64sha256("${path.module}/../services/api/presign.zip")
 
-  layers = [aws_lambda_layer_version.deps.arn]
-
   environment {
     variables = {
       UPLOADS_BUCKET      = aws_s3_bucket.uploads.id
@@ -129,8 +146,6 @@ resource "aws_lambda_function" "extract" {
   memory_size      = 512
   source_code_hash = filebase64sha256("${path.module}/../services/api/extract.zip")
 
-  layers = [aws_lambda_layer_version.deps.arn]
-
   environment {
     variables = {
       UPLOADS_BUCKET       = aws_s3_bucket.uploads.id
@@ -138,6 +153,9 @@ resource "aws_lambda_function" "extract" {
       DYNAMO_TABLE         = aws_dynamodb_table.menu_runs.name
       OPENAI_SECRET_ARN    = aws_secretsmanager_secret.openai.arn
       IMAGES_FUNCTION_NAME = aws_lambda_function.images.function_name
+      EXTRACT_QUEUE_URL    = aws_sqs_queue.extract.url
+      EXTRACT_DLQ_URL      = aws_sqs_queue.extract_dlq.url
+      JOB_MAX_ATTEMPTS     = var.extract_max_attempts
       ENVIRONMENT          = var.environment
       SUPABASE_JWT_SECRET  = var.supabase_jwt_secret
       SUPABASE_URL         = var.supabase_url
@@ -153,25 +171,55 @@ resource "aws_lambda_function" "images" {
   role             = aws_iam_role.lambda.arn
   handler          = "handlers.images.handler"
   runtime          = "python3.11"
-  timeout          = 60
-  memory_size      = 256
+  # Thumbnail mirroring runs after the 40s search deadline and 8s URL checks
+  timeout          = var.thumbnail_mirror ? 75 : 60
+  # Extra room for the embeddings index (semantic image cache) and for
+  # decoding source photos (thumbnail mirroring, lib.thumbnails.RENDER_CONCURRENCY)
+  memory_size      = 256 + (var.semantic_image_cache ? 256 : 0) + (var.thumbnail_mirror ? 256 : 0)
   source_code_hash = filebase64sha256("${path.module}/../services/api/images.zip")
 
-  layers = [aws_lambda_layer_version.deps.arn]
-
   environment {
     variables = {
-      CACHE_BUCKET        = aws_s3_bucket.cache.id
-      IMAGE_CACHE_TABLE   = aws_dynamodb_table.image_cache.name
-      SERPAPI_SECRET      = aws_secretsmanager_secret.serpapi.arn
-      ENVIRONMENT         = var.environment
-      SUPABASE_JWT_SECRET = var.supabase_jwt_secret
-      SUPABASE_URL        = var.supabase_url
-      FRONTEND_URL        = var.frontend_url
+      CACHE_BUCKET                = aws_s3_bucket.cache.id
+      IMAGE_CACHE_TABLE           = aws_dynamodb_table.image_cache.name
+      SERPAPI_SECRET              = aws_secretsmanager_secret.serpapi.arn
+      OPENAI_SECRET_ARN           = aws_secretsmanager_secret.openai.arn
+      SEMANTIC_IMAGE_CACHE        = var.semantic_image_cache ? "1" : "0"
+      THUMBNAIL_MIRROR            = var.thumbnail_mirror ? "1" : "0"
+      THUMBNAIL_CDN_URL           = var.thumbnail_cdn_url
+      IMAGE_BACKGROUND_SEARCH_CAP = var.image_background_search_cap
+      ENVIRONMENT                 = var.environment
+      SUPABASE_JWT_SECRET         = var.supabase_jwt_secret
+      SUPABASE_URL                = var.supabase_url
+      FRONTEND_URL                = var.frontend_url
     }
   }
 }
 
+# Merge the semantic image cache's delta shards into its index, off the
+# request path (lib/semantic_cache.compact)
+resource "aws_cloudwatch_event_rule" "semantic_index_compaction" {
+  count               = var.semantic_image_cache ? 1 : 0
+  name                = "${local.name_prefix}-semantic-index-compaction"
+  schedule_expression = "rate(1 hour)"
+}
+
+resource "aws_cloudwatch_event_target" "semantic_index_compaction" {
+  count = var.semantic_image_cache ? 1 : 0
+  rule  = aws_cloudwatch_event_rule.semantic_index_compaction[0].name
+  arn   = aws_lambda_function.images.arn
+  input = jsonencode({ compact_semantic_index = true })
+}
+
+resource "aws_lambda_permission" "semantic_index_compaction" {
+  count         = var.semantic_image_cache ? 1 : 0
+  statement_id  = "AllowSemanticIndexCompaction"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.images.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.semantic_index_compaction[0].arn
+}
+
 # Recommend Lambda
 resource "aws_lambda_function" "recommend" {
   filename         = "${path.module}/../services/api/recommend.zip"
@@ -183,8 +231,6 @@ resource "aws_lambda_function" "recommend" {
   memory_size      = 256
   source_code_hash = filebase64sha256("${path.module}/../services/api/recommend.zip")
 
-  layers = [aws_lambda_layer_version.deps.arn]
-
   environment {
     variables = {
       CACHE_BUCKET        = aws_s3_bucket.cache.id
@@ -209,8 +255,6 @@ resource "aws_lambda_function" "menu_get" {
   memory_size      = 256
   source_code_hash = filebase64sha256("${path.module}/../services/api/menu_get.zip")
 
-  layers = [aws_lambda_layer_version.deps.arn]
-
   environment {
     variables = {
       CACHE_BUCKET        = aws_s3_bucket.cache.id
@@ -234,8 +278,6 @@ resource "aws_lambda_function" "reviews" {
   memory_size      = 256
   source_code_hash = filebase64sha256("${path.module}/../services/api/reviews.zip")
 
-  layers = [aws_lambda_layer_version.deps.arn]
-
   environment {
     variables = {
       CACHE_BUCKET        = aws_s3_bucket.cache.id
@@ -267,6 +309,14 @@ resource "aws_lambda_permission" "extract" {
   source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
 }
 
+resource "aws_lambda_permission" "extract_s3" {
+  statement_id  = "AllowS3Invoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.extract.function_name
+  principal     = "s3.amazonaws.com"
+  source_arn    = aws_s3_bucket.uploads.arn
+}
+
 resource "aws_lambda_permission" "images" {
   statement_id  = "AllowAPIGatewayInvoke"
   action        = "lambda:InvokeFunction"
@@ -17,3 +17,8 @@ output "dynamodb_table" {
   description = "DynamoDB table name"
   value       = aws_dynamodb_table.menu_runs.name
 }
+
+output "extract_dlq_url" {
+  description = "Dead-letter queue for failed extraction jobs"
+  value       = aws_sqs_queue.extract_dlq.url
+}
@@ -37,6 +37,18 @@ resource "aws_s3_bucket_lifecycle_configuration" "uploads" {
   }
 }
 
+# Start extraction as soon as a run's images have all been uploaded
+resource "aws_s3_bucket_notification" "uploads" {
+  bucket = aws_s3_bucket.uploads.id
+
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.extract.arn
+    events              = ["s3:ObjectCreated:*"]
+  }
+
+  depends_on = [aws_lambda_permission.extract_s3]
+}
+
 # S3 bucket for extraction cache
 resource "aws_s3_bucket" "cache" {
   bucket = "${local.name_prefix}-cache-${local.suffix}"
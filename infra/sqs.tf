@@ -0,0 +1,29 @@
+# Queue for menu extraction jobs
+resource "aws_sqs_queue" "extract" {
+  name                       = "${local.name_prefix}-extract"
+  visibility_timeout_seconds = 720 # 6x the extract Lambda timeout, as AWS recommends
+  message_retention_seconds  = 86400
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.extract_dlq.arn
+    maxReceiveCount     = var.extract_max_attempts
+  })
+}
+
+# Runs that failed every attempt
+resource "aws_sqs_queue" "extract_dlq" {
+  name                      = "${local.name_prefix}-extract-dlq"
+  message_retention_seconds = 1209600
+}
+
+# Extract Lambda consumes the queue with a cap on in-flight extractions
+resource "aws_lambda_event_source_mapping" "extract" {
+  event_source_arn        = aws_sqs_queue.extract.arn
+  function_name           = aws_lambda_function.extract.arn
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = var.extract_max_concurrency
+  }
+}
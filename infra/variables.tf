@@ -44,3 +44,39 @@ variable "supabase_url" {
   description = "Supabase project URL"
   type        = string
 }
+
+variable "extract_max_concurrency" {
+  description = "Max menu extractions running at once (SQS event source, min 2)"
+  type        = number
+  default     = 5
+}
+
+variable "extract_max_attempts" {
+  description = "Extraction attempts before a run is dead-lettered"
+  type        = number
+  default     = 4
+}
+
+variable "semantic_image_cache" {
+  description = "Reuse cached images of near-synonym dishes (embeddings index; costs an OpenAI embeddings call per image run)"
+  type        = bool
+  default     = false
+}
+
+variable "thumbnail_mirror" {
+  description = "Mirror each dish's top image into the cache bucket as thumbnails"
+  type        = bool
+  default     = false
+}
+
+variable "thumbnail_cdn_url" {
+  description = "Base URL of a CDN serving the cache bucket's thumbs/ prefix (empty: presigned S3 URLs)"
+  type        = string
+  default     = ""
+}
+
+variable "image_background_search_cap" {
+  description = "Image searches per menu run in the background; dishes past it are searched when viewed"
+  type        = number
+  default     = 30
+}
@@ -3,45 +3,67 @@ set -e
 
 # Build Lambda deployment packages
 # Run from services/api directory
+#
+# Each function gets its own package with only the lib/ modules its handler
+# imports and only the third-party packages those need (see package_deps.py),
+# so small functions like menu_get and presign don't ship or load openai and
+# Pillow. boto3 comes from the Lambda runtime.
+
+# Must match the Lambda runtime so the precompiled bytecode is used
+PYTHON=${PYTHON:-python3.11}
 
 echo "Building Lambda deployment packages..."
 
 # Create output directory
-mkdir -p dist
-
-# Build layer with dependencies
-echo "Building dependencies layer..."
-mkdir -p layer/python
-
-# Try to download Linux wheels using pip's platform flag
-echo "Downloading Linux-compatible wheels..."
-pip install -r requirements.txt -t layer/python \
-    --platform manylinux2014_x86_64 \
-    --implementation cp \
-    --python-version 3.11 \
-    --only-binary=:all: \
-    --quiet 2>/dev/null || {
-    echo "Platform-specific download failed, trying with --no-deps for compiled packages..."
-    # Fall back to installing normally but it may not work on Lambda for compiled deps
-    pip install -r requirements.txt -t layer/python --quiet
-}
-
-cd layer
-zip -r ../dist/layer.zip python -x "*.pyc" -x "*__pycache__*"
-cd ..
-rm -rf layer
-
-# Copy layer to expected location
-cp dist/layer.zip layer.zip
-
-# Build handler packages
+rm -rf dist build
+mkdir -p dist build
+
 HANDLERS=("presign" "extract" "images" "recommend" "menu_get" "reviews")
 
 for handler in "${HANDLERS[@]}"; do
     echo "Building ${handler}.zip..."
-    zip -r "dist/${handler}.zip" handlers/ lib/ -x "*.pyc" -x "*__pycache__*"
+    pkg="build/${handler}"
+    mkdir -p "$pkg"
+
+    # Handler and the lib/ modules it imports
+    for file in $($PYTHON package_deps.py "$handler" --files); do
+        mkdir -p "$pkg/$(dirname "$file")"
+        cp "$file" "$pkg/$file"
+    done
+
+    # Shared JSON schemas (used to validate model output)
+    if [ -f "$pkg/lib/schemas.py" ]; then
+        cp -r ../../packages/shared/schemas "$pkg/schemas"
+    fi
+
+    # Third-party dependencies of those modules
+    $PYTHON package_deps.py "$handler" --requirements > "build/${handler}-requirements.txt"
+    if [ -s "build/${handler}-requirements.txt" ]; then
+        # Try to download Linux wheels using pip's platform flag
+        $PYTHON -m pip install -r "build/${handler}-requirements.txt" -t "$pkg" \
+            --platform manylinux2014_x86_64 \
+            --implementation cp \
+            --python-version 3.11 \
+            --only-binary=:all: \
+            --quiet 2>/dev/null || {
+            echo "Platform-specific download failed, installing normally..."
+            # May not work on Lambda for compiled deps
+            $PYTHON -m pip install -r "build/${handler}-requirements.txt" -t "$pkg" --quiet
+        }
+        rm -rf "$pkg"/*.dist-info "$pkg"/bin
+    fi
+
+    # Precompile bytecode. The Lambda filesystem is read-only, so without
+    # this every cold start compiles every module from source. unchecked-hash
+    # skips the source mtime check that zip extraction would invalidate.
+    find "$pkg" -name "__pycache__" -type d -prune -exec rm -rf {} +
+    $PYTHON -m compileall -q -j 0 --invalidation-mode unchecked-hash "$pkg"
+
+    (cd "$pkg" && zip -qr "../../dist/${handler}.zip" .)
     cp "dist/${handler}.zip" "${handler}.zip"
 done
 
+rm -rf build
+
 echo "Build complete! Packages in dist/"
 ls -la dist/
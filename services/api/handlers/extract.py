@@ -1,22 +1,41 @@
 import json
 import os
-import boto3
-from lib.response import success, error
-from lib.dynamo import get_run, update_run_status
-from lib.openai_client import extract_menu_from_images
+import threading
+import time
+from urllib.parse import unquote_plus
+from lib import aws
+from lib.response import success, error, compress_response
+from lib.dynamo import get_run, update_run_status, record_upload, claim_run
+from lib.jobs import get_extract_queue, RetryableJobError, MAX_ATTEMPTS
+from lib.secrets import prefetch
 from lib.auth import require_auth
+from lib.extraction_cache import (
+    etag_digest,
+    content_key,
+    find_cached_menu,
+    copy_cached_menu,
+    store_menu,
+)
 
-s3_client = boto3.client("s3")
-lambda_client = boto3.client("lambda")
+# Fetch API keys in the background during init, not on the first request
+prefetch("openai")
 
+# Minimum seconds between partial menu writes while extraction streams
+PARTIAL_PUBLISH_INTERVAL = float(os.environ.get("PARTIAL_PUBLISH_INTERVAL", "3"))
 
+
+@compress_response
 def handler(event, context):
     """
     POST /menu/extract
 
-    Two modes:
-    1. API Gateway call (has 'body'): Starts async processing, returns immediately
-    2. Async invocation (has 'async_extract'): Does actual extraction
+    Four modes:
+    1. S3 upload notification: Records the upload; once every image of the
+       run is in, starts extraction without waiting for the client
+    2. API Gateway call (has 'body'): Status check, or starts extraction if
+       the upload notifications haven't already
+    3. SQS batch (has 'Records'): Does actual extraction for queued runs
+    4. Async invocation (has 'async_extract'): Legacy direct extraction
 
     Request body:
     {
@@ -26,9 +45,19 @@ def handler(event, context):
     Response:
     {
         "run_id": "uuid",
-        "status": "PROCESSING" | "EXTRACTED"
+        "status": "PROCESSING" | "PARTIAL" | "EXTRACTED"
     }
     """
+    records = event.get("Records") or []
+
+    # Upload completion notifications from the uploads bucket
+    if records and records[0].get("eventSource") == "aws:s3":
+        return handle_upload_events(records)
+
+    # Queued extraction jobs (SQS event source mapping)
+    if records:
+        return get_extract_queue().process_batch(event, process_extract_job)
+
     # Check if this is an async extraction call (internal Lambda invocation)
     if event.get("async_extract"):
         return do_async_extraction(event)
@@ -57,40 +86,39 @@ def _authenticated_handler(event, context, user):
         if run.get("status") == "EXTRACTED":
             return success({"run_id": run_id, "status": "EXTRACTED"})
 
-        # Check if already processing
-        if run.get("status") == "PROCESSING":
-            return success({"run_id": run_id, "status": "PROCESSING"})
+        # Check if already processing (PARTIAL means dishes are streaming in)
+        if run.get("status") in ("PROCESSING", "PARTIAL"):
+            return success({"run_id": run_id, "status": run["status"]})
 
         # Get keys
         keys = run.get("keys", [])
         if not keys:
             return error("No images found for this run", 400)
 
-        # Verify images exist
+        # Verify images exist. Uploads the bucket notification already
+        # recorded don't need a HEAD request.
         uploads_bucket = os.environ.get("UPLOADS_BUCKET")
+        uploaded = run.get("uploaded_keys") or set()
+        upload_etags = run.get("upload_etags") or {}
+        digests = []
         for key in keys:
+            if key in uploaded:
+                digests.append(etag_digest(upload_etags.get(key)))
+                continue
             try:
-                s3_client.head_object(Bucket=uploads_bucket, Key=key)
+                head = aws.client("s3").head_object(Bucket=uploads_bucket, Key=key)
             except:
                 return error(f"Image not found: {key}", 404)
+            digests.append(etag_digest(head.get("ETag")))
 
-        # Update status to processing
-        update_run_status(run_id, "PROCESSING")
-
-        # Invoke self asynchronously for actual extraction
-        function_name = context.function_name
-        lambda_client.invoke(
-            FunctionName=function_name,
-            InvocationType="Event",  # Async invocation
-            Payload=json.dumps({
-                "async_extract": True,
-                "run_id": run_id,
-                "keys": keys,
-            }),
-        )
+        # A FAILED run can be retried by calling extract again
+        status = start_extraction(run_id, keys, digests, from_status=run.get("status", "PENDING"))
+        if not status:
+            # The upload trigger got there first
+            status = get_run(run_id).get("status", "PROCESSING")
 
         # Return immediately - frontend will poll for status
-        return success({"run_id": run_id, "status": "PROCESSING"})
+        return success({"run_id": run_id, "status": status})
 
     except json.JSONDecodeError:
         return error("Invalid JSON in request body", 400)
@@ -99,57 +127,225 @@ def _authenticated_handler(event, context, user):
         return error("Internal server error", 500)
 
 
+def handle_upload_events(records):
+    """Record finished uploads and start extraction once a run has all its images."""
+    for record in records:
+        s3_object = record["s3"]["object"]
+        key = unquote_plus(s3_object["key"])
+        run_id = key.split("/", 1)[0]
+
+        try:
+            run = record_upload(run_id, key, s3_object.get("eTag"))
+        except Exception as e:
+            print(f"Failed to record upload {key}: {e}")
+            continue
+
+        if not run:
+            print(f"Ignoring upload {key}: no matching run")
+            continue
+
+        keys = run.get("keys", [])
+        uploaded = run.get("uploaded_keys") or set()
+        if run.get("status") != "PENDING" or not set(keys) <= uploaded:
+            continue
+
+        upload_etags = run.get("upload_etags") or {}
+        digests = [etag_digest(upload_etags.get(k)) for k in keys]
+        try:
+            status = start_extraction(run_id, keys, digests)
+        except Exception:
+            # The run is FAILED; the client can retry it through the API
+            continue
+        if status:
+            print(f"All {len(keys)} images uploaded for {run_id}, extraction {status}")
+
+    return {"status": "done"}
+
+
+def start_extraction(run_id, keys, digests, from_status="PENDING"):
+    """
+    Claim a run that's still in from_status and start extracting it.
+
+    Serves the run from the extraction cache when the upload digests match a
+    previous run, otherwise queues it. Returns the new status, or None if the
+    run was already claimed by another caller.
+
+    If starting fails, the run is marked FAILED (so calling extract again
+    retries it) and the error is raised.
+    """
+    if not claim_run(run_id, from_status, "PROCESSING"):
+        return None
+
+    try:
+        # Same photos extracted before? The ETag of a single-part upload is the
+        # MD5 of its bytes, so we can check the cache without downloading anything.
+        if all(digests):
+            cached_key = find_cached_menu(content_key(digests))
+            if cached_key:
+                _complete_from_cache(run_id, cached_key)
+                return "EXTRACTED"
+
+        # Queue the extraction; workers run with bounded concurrency
+        get_extract_queue().enqueue({"run_id": run_id, "keys": keys})
+        return "PROCESSING"
+    except Exception as e:
+        print(f"Failed to start extraction for {run_id}: {str(e)}")
+        update_run_status(run_id, "FAILED", {"error": f"Failed to start extraction: {e}"})
+        raise
+
+
+def process_extract_job(job, attempt):
+    """
+    Run a queued extraction job.
+
+    Rate limits and transient OpenAI errors raise RetryableJobError so the
+    queue retries with backoff; the run stays PROCESSING in between. Once
+    the last attempt fails, or on any other error, the run is marked FAILED.
+    """
+    # Imported here so the API path (status checks) doesn't load openai
+    from lib.openai_client import RETRYABLE_ERRORS
+
+    run_id = job.get("run_id")
+
+    # SQS delivers at least once - don't redo finished runs
+    run = get_run(run_id)
+    if run and run.get("status") == "EXTRACTED":
+        print(f"Skipping {run_id}: already extracted")
+        return
+
+    try:
+        run_extraction(run_id, job.get("keys", []))
+    except RETRYABLE_ERRORS as e:
+        if attempt >= MAX_ATTEMPTS:
+            update_run_status(run_id, "FAILED", {"error": f"Gave up after {attempt} attempts: {e}"})
+        raise RetryableJobError(str(e)) from e
+    except Exception as e:
+        print(f"Extraction error for {run_id}: {str(e)}")
+        update_run_status(run_id, "FAILED", {"error": str(e)})
+        raise
+
+
 def do_async_extraction(event):
     """Handle async extraction invocation."""
     run_id = event.get("run_id")
-    keys = event.get("keys", [])
-
-    uploads_bucket = os.environ.get("UPLOADS_BUCKET")
-    cache_bucket = os.environ.get("CACHE_BUCKET")
 
     try:
-        # Download images
-        image_data_list = []
-        for key in keys:
-            response = s3_client.get_object(Bucket=uploads_bucket, Key=key)
-            image_bytes = response["Body"].read()
-            content_type = response.get("ContentType", "image/jpeg")
-            image_data_list.append((image_bytes, content_type))
-
-        # Extract menu using GPT-4o Vision
-        menu_data = extract_menu_from_images(image_data_list)
-
-        # Cache the result
-        cache_key = f"{run_id}/menu.json"
-        s3_client.put_object(
-            Bucket=cache_bucket,
-            Key=cache_key,
-            Body=json.dumps(menu_data),
-            ContentType="application/json",
-        )
-
-        # Update status
-        update_run_status(run_id, "EXTRACTED")
-        print(f"Extraction complete for {run_id}")
-
-        # Trigger image fetching immediately (async, don't wait)
-        images_function = os.environ.get("IMAGES_FUNCTION_NAME")
-        if images_function:
-            try:
-                lambda_client.invoke(
-                    FunctionName=images_function,
-                    InvocationType="Event",
-                    Payload=json.dumps({
-                        "async_images": True,
-                        "run_id": run_id,
-                    }),
-                )
-                print(f"Triggered image fetching for {run_id}")
-            except Exception as img_err:
-                print(f"Failed to trigger image fetching: {img_err}")
-
+        run_extraction(run_id, event.get("keys", []))
     except Exception as e:
         print(f"Extraction error for {run_id}: {str(e)}")
         update_run_status(run_id, "FAILED", {"error": str(e)})
 
     return {"status": "done"}
+
+
+def run_extraction(run_id, keys):
+    """Extract a run's menu and mark it EXTRACTED. Raises on failure."""
+    from lib.openai_client import extract_menu_from_images
+    from lib.page_loader import load_pages, peak_rss_mb
+
+    uploads_bucket = os.environ.get("UPLOADS_BUCKET")
+    cache_bucket = os.environ.get("CACHE_BUCKET")
+
+    # Download and shrink all pages concurrently
+    pages = load_pages(uploads_bucket, keys)
+
+    # Check the global extraction cache before paying for a vision call
+    exact_key = content_key([page.digest for page in pages])
+    cached_key = find_cached_menu(exact_key)
+    if cached_key:
+        _complete_from_cache(run_id, cached_key)
+        return
+
+    image_data_list = [(page.image_bytes, page.content_type) for page in pages]
+    del pages
+
+    # Extract menu using GPT-4o Vision, publishing dishes as they stream in
+    publisher = PartialMenuPublisher(run_id, cache_bucket)
+    menu_data = extract_menu_from_images(image_data_list, on_progress=publisher.publish)
+
+    # Cache the result
+    cache_key = f"{run_id}/menu.json"
+    aws.client("s3").put_object(
+        Bucket=cache_bucket,
+        Key=cache_key,
+        Body=json.dumps(menu_data),
+        ContentType="application/json",
+    )
+
+    # Share the result with future runs of the same photos
+    try:
+        store_menu(menu_data, exact_key)
+    except Exception as cache_err:
+        print(f"Failed to store extraction cache entry: {cache_err}")
+
+    # Update status
+    update_run_status(run_id, "EXTRACTED")
+    print(f"Extraction complete for {run_id} ({len(keys)} pages, peak RSS {peak_rss_mb():.0f} MB)")
+
+    _trigger_images(run_id)
+
+
+class PartialMenuPublisher:
+    """
+    Persists partial menus to {run_id}/menu.partial.json while extraction streams.
+
+    Writes are throttled to one per PARTIAL_PUBLISH_INTERVAL seconds and only
+    happen when the menu has grown. The first write flips the run to PARTIAL so
+    GET /menu/{runId} starts returning dishes; each write bumps partial_dishes.
+    """
+
+    def __init__(self, run_id, cache_bucket):
+        self.run_id = run_id
+        self.cache_bucket = cache_bucket
+        self.lock = threading.Lock()
+        self.last_published = 0.0
+        self.published_dishes = 0
+
+    def publish(self, menu):
+        dish_count = sum(len(s.get("dishes", [])) for s in menu.get("sections", []))
+
+        with self.lock:
+            now = time.monotonic()
+            if dish_count <= self.published_dishes:
+                return
+            if now - self.last_published < PARTIAL_PUBLISH_INTERVAL:
+                return
+
+            aws.client("s3").put_object(
+                Bucket=self.cache_bucket,
+                Key=f"{self.run_id}/menu.partial.json",
+                Body=json.dumps(menu),
+                ContentType="application/json",
+            )
+            # partial_dishes lets long-polling clients see the menu grow
+            update_run_status(self.run_id, "PARTIAL", {"partial_dishes": dish_count})
+
+            self.last_published = now
+            self.published_dishes = dish_count
+            print(f"Published partial menu for {self.run_id}: {dish_count} dishes")
+
+
+def _complete_from_cache(run_id, cached_key):
+    """Finish a run using a previously extracted menu."""
+    copy_cached_menu(cached_key, run_id)
+    update_run_status(run_id, "EXTRACTED", {"extraction_cache": "hit"})
+    print(f"Extraction cache hit for {run_id}: {cached_key}")
+    _trigger_images(run_id)
+
+
+def _trigger_images(run_id):
+    """Trigger image fetching immediately (async, don't wait)."""
+    images_function = os.environ.get("IMAGES_FUNCTION_NAME")
+    if images_function:
+        try:
+            aws.client("lambda").invoke(
+                FunctionName=images_function,
+                InvocationType="Event",
+                Payload=json.dumps({
+                    "async_images": True,
+                    "run_id": run_id,
+                }),
+            )
+            print(f"Triggered image fetching for {run_id}")
+        except Exception as img_err:
+            print(f"Failed to trigger image fetching: {img_err}")
@@ -1,44 +1,110 @@
 import json
 import os
-import boto3
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
+import threading
+import time
 from botocore.exceptions import ClientError
-from lib.response import success, error
-from lib.image_search import search_dish_images
+from lib import aws
+from lib.response import success, error, not_modified, get_header, IMMUTABLE, NO_STORE, compress_response
+from lib.artifacts import read_json, write_json
+from lib.image_engine import search_dishes
+from lib import semantic_cache, thumbnails
+from lib.secrets import prefetch
 from lib.auth import require_auth
 
-s3_client = boto3.client("s3")
+# Fetch API keys in the background during init, not on the first request
+prefetch("serpapi")
 
+# Long-poll limits. API Gateway gives up after 29s.
+LONG_POLL_MAX_SECONDS = 20
+LONG_POLL_INTERVAL = 0.5
 
-def fetch_dish_image(dish_name):
-    """Fetch images for a single dish. Returns extra candidates for frontend fallback."""
-    images = search_dish_images(dish_name, num_results=5)  # Will fetch 15, return all
-    return {"name": dish_name, "images": images}
+# A run whose images started longer ago than this (beyond the Lambda timeout)
+# and never completed is started again
+PRODUCER_STALE_SECONDS = 120
 
+# Error codes of a conditional S3 write that lost to another writer
+LOST_RACE = ("PreconditionFailed", "ConditionalRequestConflict")
 
+# SerpAPI searches per run in the background. Dishes past the cap are
+# searched when their section is viewed (requests with "dishes").
+BACKGROUND_SEARCH_CAP = int(os.environ.get("IMAGE_BACKGROUND_SEARCH_CAP", "30"))
+
+# Sections searched last in the background: drinks lists are long and
+# rarely looked at, so they're usually past the cap
+LOW_PRIORITY_SECTIONS = re.compile(
+    r"\b(wines?|beers?|ciders?|cocktails?|drinks?|beverages?|spirits?|whiske?y|bourbon|sake|"
+    r"coffee|teas?|juices?|sodas?|liquors?|by the glass|on tap)\b",
+    re.IGNORECASE,
+)
+
+# Requests for specific dishes: at most this many (about a section), with
+# time for searching and verifying them well inside API Gateway's 29s
+DISHES_PER_REQUEST = 40
+DISHES_DEADLINE_SECONDS = 10
+
+
+@compress_response
 def handler(event, context):
     """
+    GET /menu/{runId}/images?since=<seq>&wait=<seconds>
     POST /menu/images
 
-    Two modes:
-    1. API Gateway call (has 'body'): Authenticated request from frontend
-    2. Async invocation (has 'async_images'): Internal call from extract Lambda
+    Three modes:
+    1. API Gateway call: Authenticated request from frontend
+    2. Async invocation (has 'async_images'): Internal call from extract
+       Lambda, or from an API call that found the images not started yet.
+       Searches the images, publishing progress as dishes complete.
+    3. Scheduled (has 'compact_semantic_index'): merges the semantic image
+       cache's delta shards into its index (lib.semantic_cache.compact)
 
-    Request body:
+    Request (POST body; the GET takes since and wait as query parameters):
     {
-        "run_id": "uuid"
+        "run_id": "uuid",
+        "since": 12,    # optional: only dishes newer than this seq
+        "wait": 10,     # optional: long-poll up to this many seconds (max 20)
+        "dishes": ["Spring Rolls"]  # optional: just these dishes, see below
     }
 
     Response:
     {
         "dishes": [
-            { "name": "Spring Rolls", "images": ["url1", "url2", "url3"] }
-        ]
+            { "name": "Spring Rolls", "images": ["url1", "url2", "url3"], "seq": 3,
+              "thumbnails": {"sm": "url", "md": "url"} }
+        ],
+        "seq": 12,          # pass as "since" to get only what's new
+        "complete": false   # true once every dish is final
     }
+
+    Returns straight away with the dishes ready so far (cache hits are ready
+    within a second or two). A dish is sent again with a higher seq if its
+    images change, e.g. once they've been verified. With "since" and "wait",
+    the request blocks until something newer is ready.
+
+    "thumbnails" is only there when mirroring is on (lib.thumbnails) and the
+    dish has some.
+
+    The background search goes through the menu in order with drinks
+    sections last, and stops after BACKGROUND_SEARCH_CAP searches; dishes
+    past that are left out of the result. With "dishes" (e.g. a section
+    scrolling into view, or recommended dishes), the response has just
+    those dishes - { "dishes": [...] }, no seq - searching any that aren't
+    cached or in the run's result yet. Names not on the menu are ignored.
+
+    The complete result is cached per run and never changes, so complete
+    responses to the GET are cacheable forever, and without "since" carry
+    its ETag so a matching If-None-Match gets a 304 - except with presigned
+    thumbnail URLs, which expire: those responses are cacheable briefly and
+    carry no ETag. In-progress responses are never cached. POST responses
+    carry no validators (nothing caches a POST); it's there for "dishes".
     """
     # Async invocation from extract Lambda - no auth needed
     if event.get("async_images"):
-        return _fetch_images(event.get("run_id"), api_gateway=False)
+        return _fetch_images(event.get("run_id"))
+
+    # Scheduled (infra/lambda.tf), when the semantic image cache is on
+    if event.get("compact_semantic_index"):
+        return {"merged": semantic_cache.compact()}
 
     # API Gateway call - require auth
     return _authenticated_handler(event, context)
@@ -47,13 +113,31 @@ def handler(event, context):
 @require_auth
 def _authenticated_handler(event, context, user):
     try:
-        body = json.loads(event.get("body", "{}"))
-        run_id = body.get("run_id")
+        cacheable = event.get("httpMethod") == "GET"
+        if cacheable:
+            run_id = (event.get("pathParameters") or {}).get("runId")
+            body = event.get("queryStringParameters") or {}
+        else:
+            body = json.loads(event.get("body") or "{}")
+            run_id = body.get("run_id")
 
         if not run_id:
             return error("run_id is required", 400)
 
-        return _fetch_images(run_id, api_gateway=True)
+        try:
+            since = int(body.get("since", 0))
+            wait_seconds = min(float(body.get("wait", 0)), LONG_POLL_MAX_SECONDS)
+        except (TypeError, ValueError):
+            return error("since and wait must be numbers", 400)
+
+        dishes = body.get("dishes") if not cacheable else None
+        if dishes is not None:
+            if not isinstance(dishes, list) or not all(isinstance(name, str) for name in dishes):
+                return error("dishes must be a list of dish names", 400)
+            return _get_dish_images(run_id, dishes)
+
+        return _get_images(run_id, since, wait_seconds, if_none_match=get_header(event, "If-None-Match"),
+                           cacheable=cacheable)
 
     except json.JSONDecodeError:
         return error("Invalid JSON in request body", 400)
@@ -62,68 +146,292 @@ def _authenticated_handler(event, context, user):
         return error("Internal server error", 500)
 
 
-def _fetch_images(run_id, api_gateway=True):
-    """Core image fetching logic shared by both API and async paths."""
-    cache_bucket = os.environ.get("CACHE_BUCKET")
-    cache_key = f"{run_id}/menu.json"
+# Presigned thumbnail URLs expire, so responses carrying them can't be immutable
+PRESIGNED_THUMBNAILS = thumbnails.ENABLED and not thumbnails.CDN_URL
+
+
+def _images_key(run_id):
+    return f"{run_id}/images.json"
+
+
+def _progress_key(run_id):
+    return f"{run_id}/images.partial.json"
 
+
+class ImagesProgress:
+    """
+    A run's images as they come in. Every dish gets a seq when it's first
+    published and a new one whenever its entry changes, so clients can ask
+    for just the dishes newer than the last seq they saw.
+
+    One producer per run: claim() creates the progress object, or replaces
+    a stale one, with a conditional write, and every later write is
+    conditional on it still being ours. A producer that finds it isn't
+    stops writing, and only the first complete result is stored.
+    """
+
+    def __init__(self, run_id, names, previous=None):
+        self.run_id = run_id
+        self.names = names
+        # Carry on from a stale producer's progress, so seqs clients have seen stay valid
+        previous = previous or {}
+        self.seq = previous.get("seq", 0)
+        self.started_at = time.time()
+        self._dishes = {dish["name"]: dish for dish in previous.get("dishes", [])}
+        self._etag = None
+        self._lost = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def claim(cls, run_id, names, previous=None, previous_etag=None):
+        """
+        Become the run's producer, taking over previous (the stale progress
+        object at previous_etag) if given. Returns None if another producer
+        got there first.
+        """
+        tracker = cls(run_id, names, previous)
+        condition = {"if_match": previous_etag} if previous_etag else {"if_none_match": "*"}
+        if not tracker._write_progress(tracker.document(complete=False), **condition):
+            return None
+        return tracker
+
+    def _write_progress(self, document, **condition):
+        """Write the progress object if the condition holds. Returns whether it did."""
+        try:
+            self._etag = write_json(_progress_key(self.run_id), document, **condition)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] not in LOST_RACE:
+                raise
+            print(f"Another producer has the images for {self.run_id}")
+            self._lost = True
+            return False
+
+    def update(self, dishes):
+        """Merge {name: dish entry}. Returns whether anything changed."""
+        changed = False
+        for name, dish in dishes.items():
+            current = self._dishes.get(name)
+            if current is None or {k: v for k, v in current.items() if k != "seq"} != dish:
+                self.seq += 1
+                self._dishes[name] = {**dish, "seq": self.seq}
+                changed = True
+        return changed
+
+    def document(self, complete):
+        return {
+            "dishes": [self._dishes[name] for name in self.names if name in self._dishes],
+            "seq": self.seq,
+            "complete": complete,
+            "started_at": self.started_at,
+        }
+
+    def publish(self, images_by_dish):
+        """on_progress callback for search_dishes: write the dishes ready so far."""
+        with self._lock:
+            if self._lost:
+                return
+            if self.update({name: {"name": name, "images": images} for name, images in images_by_dish.items()}):
+                self._write_progress(self.document(complete=False), if_match=self._etag)
+
+    def finish(self, dishes):
+        """
+        Store the complete result. Dishes whose final entry differs from the
+        published one (verified lists, thumbnails) get a new seq. The
+        progress object is marked complete too, for long-pollers. Returns
+        None if another producer took the run over.
+        """
+        with self._lock:
+            if self._lost:
+                return None
+            self.update(dishes)
+            result = self.document(complete=True)
+            try:
+                write_json(_images_key(self.run_id), result, if_none_match="*")
+            except ClientError as e:
+                if e.response['Error']['Code'] not in LOST_RACE:
+                    raise
+                print(f"Images for {self.run_id} were already stored")
+                return None
+            self._write_progress({**result, "dishes": []}, if_match=self._etag)
+        return result
+
+
+def _menu_dish_names(run_id):
+    """Dish names in search order (menu order, drinks sections last), or None if the menu doesn't exist."""
     try:
-        response = s3_client.get_object(Bucket=cache_bucket, Key=cache_key)
-        menu_data = json.loads(response["Body"].read().decode("utf-8"))
+        menu_data, _ = read_json(f"{run_id}/menu.json")
     except ClientError as e:
         if e.response['Error']['Code'] == 'NoSuchKey':
-            if api_gateway:
-                return error("Menu not found. Please extract the menu first.", 404)
-            print(f"Menu not found for {run_id}")
-            return {"status": "error", "message": "Menu not found"}
+            return None
         raise
 
-    # Check for cached images result
-    images_cache_key = f"{run_id}/images.json"
-    try:
-        response = s3_client.get_object(Bucket=cache_bucket, Key=images_cache_key)
-        cached_images = json.loads(response["Body"].read().decode("utf-8"))
-        if api_gateway:
-            return success(cached_images)
-        return cached_images
-    except ClientError as e:
-        if e.response['Error']['Code'] != 'NoSuchKey':
-            raise
-        # Need to fetch images
-
-    # Extract all dish names
-    dishes = []
+    dishes, drinks = [], []
     for section in menu_data.get("sections", []):
+        target = drinks if LOW_PRIORITY_SECTIONS.search(section.get("name") or "") else dishes
         for dish in section.get("dishes", []):
             dish_name = dish.get("name")
             if dish_name:
-                dishes.append(dish_name)
+                target.append(dish_name)
+    return dishes + drinks
 
-    # Fetch images for each dish in parallel
-    dish_images = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_dish_image, name): name for name in dishes}
-        for future in as_completed(futures):
-            try:
-                result = future.result()
-                dish_images.append(result)
-            except Exception as e:
-                dish_name = futures[future]
-                print(f"Error fetching image for {dish_name}: {e}")
-                dish_images.append({"name": dish_name, "images": []})
-
-    result = {"dishes": dish_images}
-
-    # Cache the result
-    s3_client.put_object(
-        Bucket=cache_bucket,
-        Key=images_cache_key,
-        Body=json.dumps(result),
-        ContentType="application/json",
+
+def _read(key, cached=True):
+    """(data, etag) of a run artifact, or (None, None) if it doesn't exist."""
+    try:
+        return read_json(key, cached=cached)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            return None, None
+        raise
+
+
+def _start_images(run_id):
+    """Search the run's images in a separate (async) invocation of this function, or inline when run locally."""
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+    if not function_name:
+        _fetch_images(run_id)
+        return
+    aws.client("lambda").invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=json.dumps({"async_images": True, "run_id": run_id}),
     )
+    print(f"Started image fetching for {run_id}")
+
+
+def _with_thumbnail_urls(dish):
+    # A copy: dish may be shared with the artifact cache
+    if "thumbnails" not in dish:
+        return dish
+    return {**dish, "thumbnails": thumbnails.thumbnail_urls(dish["thumbnails"])}
+
+
+def _respond(result, since=0, etag=None, cacheable=True):
+    """
+    API response for a (partial or complete) images result: the dishes
+    newer than since, thumbnails as URLs. Cache headers only if cacheable (GET).
+    """
+    complete = result.get("complete", True)
+    dishes = [_with_thumbnail_urls(dish) for dish in result.get("dishes", []) if dish.get("seq", 1) > since]
+    body = {"dishes": dishes, "seq": result.get("seq", 1), "complete": complete}
+
+    if not cacheable:
+        return success(body)
+    if not complete:
+        return success(body, cache_control=NO_STORE)
+    if PRESIGNED_THUMBNAILS and any("thumbnails" in dish for dish in dishes):
+        return success(body, cache_control=f"private, max-age={thumbnails.PRESIGN_SECONDS // 2}")
+    # The same since always gets the same body, but only the full one has the artifact's ETag
+    return success(body, etag=etag if not since else None, cache_control=IMMUTABLE)
+
+
+def _get_images(run_id, since=0, wait_seconds=0, if_none_match=None, cacheable=True):
+    """API path: what's ready for the run, starting the search if nobody has."""
+    if PRESIGNED_THUMBNAILS or since or not cacheable:
+        if_none_match = None
+
+    try:
+        result, etag = read_json(_images_key(run_id), if_none_match)
+        if result is None:
+            return not_modified(etag, cache_control=IMMUTABLE)
+        return _respond(result, since, etag, cacheable)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchKey':
+            raise
+
+    progress, _ = _read(_progress_key(run_id), cached=False)
+    if progress is None or (not progress.get("complete")
+                            and time.time() - progress.get("started_at", 0) > PRODUCER_STALE_SECONDS):
+        if _menu_dish_names(run_id) is None:
+            return error("Menu not found. Please extract the menu first.", 404)
+        _start_images(run_id)
+
+    # Long-poll for dishes newer than since
+    deadline = time.monotonic() + wait_seconds
+    while not (progress and (progress.get("complete") or progress.get("seq", 0) > since)) \
+            and time.monotonic() + LONG_POLL_INTERVAL < deadline:
+        time.sleep(LONG_POLL_INTERVAL)
+        progress, _ = _read(_progress_key(run_id), cached=False)
+
+    if progress and progress.get("complete"):
+        result, etag = _read(_images_key(run_id))
+        if result is not None:
+            return _respond(result, since, etag, cacheable)
+    return _respond(progress or {"dishes": [], "seq": since, "complete": False}, since, cacheable=cacheable)
+
+
+def _get_dish_images(run_id, names):
+    """
+    API path for specific dishes: from the run's result if it has them, else
+    searched now. Dishes searched now have no thumbnails: mirroring them
+    would hold up a request that is on screen, and the run's own result has
+    them once its producer gets there.
+    """
+    menu_names = _menu_dish_names(run_id)
+    if menu_names is None:
+        return error("Menu not found. Please extract the menu first.", 404)
+
+    # Only the run's own dishes, so this can't be used for arbitrary searches
+    on_menu = set(menu_names)
+    names = [name for name in dict.fromkeys(names) if name in on_menu][:DISHES_PER_REQUEST]
+
+    result, _ = _read(_images_key(run_id))
+    known = {dish["name"]: dish for dish in (result or {}).get("dishes", [])}
+
+    # Searches the background run is doing too are done once (search leases,
+    # lib.image_search): whichever comes second waits for the other's result
+    todo = [name for name in names if name not in known]
+    found = search_dishes(todo, num_results=5, deadline_seconds=DISHES_DEADLINE_SECONDS) if todo else {}
+
+    dishes = [_with_thumbnail_urls(known[name]) if name in known else {"name": name, "images": found.get(name, [])}
+              for name in names]
+    return success({"dishes": dishes})
+
+
+def _fetch_images(run_id):
+    """Async path: search the run's images, publishing progress, and store the complete result."""
+    result, _ = _read(_images_key(run_id))
+    if result is not None:
+        return result
+
+    # Someone else is on it (the API path and the extract Lambda can both start a run)
+    progress, progress_etag = _read(_progress_key(run_id), cached=False)
+    if progress and time.time() - progress.get("started_at", 0) <= PRODUCER_STALE_SECONDS:
+        print(f"Images already in progress for {run_id}")
+        return progress
+
+    dishes = _menu_dish_names(run_id)
+    if dishes is None:
+        print(f"Menu not found for {run_id}")
+        return {"status": "error", "message": "Menu not found"}
+
+    # Whoever starts at the same time, or takes over the same stale run, loses here
+    tracker = ImagesProgress.claim(run_id, dishes, progress, progress_etag)
+    if tracker is None:
+        return {"status": "in_progress"}
+
+    # Fetch images for the dishes concurrently, publishing cache hits first
+    # and then dishes as their searches finish. Fresh results include extra
+    # candidates (15 for 5) for the frontend to fall back on. Misses past the
+    # cap are left out, for the frontend to ask for when they're viewed.
+    images_by_dish = search_dishes(dishes, num_results=5, on_progress=tracker.publish,
+                                   max_searches=BACKGROUND_SEARCH_CAP)
+    final = {name: {"name": name, "images": images} for name, images in images_by_dish.items()}
 
-    print(f"Images fetched for {run_id}: {len(dish_images)} dishes")
+    # Our own copies of the top photos, stored as S3 keys and resolved per response
+    if thumbnails.ENABLED:
+        try:
+            mirrored = thumbnails.mirror_dishes(images_by_dish)
+        except Exception as e:
+            print(f"Thumbnail mirroring failed: {e}")
+            mirrored = {}
+        for name, dish in final.items():
+            if name in mirrored:
+                dish["thumbnails"] = mirrored[name]
 
-    if api_gateway:
-        return success(result)
+    result = tracker.finish(final)
+    if result is None:
+        return {"status": "superseded"}
+    print(f"Images fetched for {run_id}: {len(result['dishes'])} dishes")
     return result
@@ -1,22 +1,55 @@
 import json
 import os
-import boto3
+import time
 from botocore.exceptions import ClientError
-from lib.response import success, error
+from lib import aws
+from lib.response import success, error, not_modified, get_header, IMMUTABLE, NO_STORE, compress_response
+from lib.artifacts import read_json
 from lib.dynamo import get_run
 from lib.auth import require_auth
 
-s3_client = boto3.client("s3")
+# Long-poll limits. API Gateway gives up after 29s.
+LONG_POLL_MAX_SECONDS = 20
+LONG_POLL_INTERVAL = 1.0
 
 
+def run_version(run):
+    """Token that changes whenever a poller would see something new."""
+    return f"{run.get('status')}:{run.get('partial_dishes', 0)}"
+
+
+def wait_for_change(run_id, run, since, wait_seconds):
+    """
+    Re-read the run until its version differs from `since` or wait_seconds pass.
+
+    Uses consistent reads so a status written just before we looked isn't missed.
+    """
+    deadline = time.monotonic() + wait_seconds
+    while run and run_version(run) == since and time.monotonic() + LONG_POLL_INTERVAL < deadline:
+        time.sleep(LONG_POLL_INTERVAL)
+        run = get_run(run_id, consistent=True)
+    return run
+
+
+@compress_response
 @require_auth
 def handler(event, context, user):
     """
-    GET /menu/{runId}
+    GET /menu/{runId}?since=<version>&wait=<seconds>
+
+    Long-poll: with `since` set to the `version` from a previous response,
+    the request blocks for up to `wait` seconds (max 20) until the run
+    changes, instead of the client polling on a timer.
+
+    Once the run is EXTRACTED the response carries the ETag of menu.json and
+    is cacheable forever; a matching If-None-Match gets a 304 without the
+    menu being downloaded from S3. In-progress statuses are never cached.
 
     Response:
     {
         "run_id": "uuid",
+        "status": "PENDING" | "PROCESSING" | "PARTIAL" | "EXTRACTED" | "FAILED",
+        "version": "opaque token for the next ?since=",
         "menu": {
             "restaurant_name": "...",
             "sections": [...]
@@ -35,23 +68,59 @@ def handler(event, context, user):
         if not run:
             return error("Run not found", 404)
 
+        # Long-poll until something changes
+        params = event.get("queryStringParameters") or {}
+        since = params.get("since")
+        if since:
+            try:
+                wait_seconds = min(float(params.get("wait", LONG_POLL_MAX_SECONDS)), LONG_POLL_MAX_SECONDS)
+            except ValueError:
+                return error("wait must be a number of seconds", 400)
+            run = wait_for_change(run_id, run, since, wait_seconds)
+
         # Check status
         status = run.get("status")
+        version = run_version(run)
         if status == "PENDING":
-            return success({"run_id": run_id, "status": "PENDING"})
+            return success({"run_id": run_id, "status": "PENDING", "version": version}, cache_control=NO_STORE)
         if status == "PROCESSING":
-            return success({"run_id": run_id, "status": "PROCESSING"})
+            return success({"run_id": run_id, "status": "PROCESSING", "version": version}, cache_control=NO_STORE)
         if status == "FAILED":
-            return success({"run_id": run_id, "status": "FAILED", "error": run.get("error", "Unknown error")})
+            return success({
+                "run_id": run_id,
+                "status": "FAILED",
+                "version": version,
+                "error": run.get("error", "Unknown error"),
+            }, cache_control=NO_STORE)
 
-        # Get cached menu
         cache_bucket = os.environ.get("CACHE_BUCKET")
+
+        # Extraction still streaming - return the dishes found so far
+        if status == "PARTIAL":
+            try:
+                response = aws.client("s3").get_object(Bucket=cache_bucket, Key=f"{run_id}/menu.partial.json")
+                partial_menu = json.loads(response["Body"].read().decode("utf-8"))
+                return success(
+                    {"run_id": run_id, "status": "PARTIAL", "version": version, "menu": partial_menu},
+                    cache_control=NO_STORE,
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'NoSuchKey':
+                    return success({"run_id": run_id, "status": "PROCESSING", "version": version}, cache_control=NO_STORE)
+                raise
+
+        # Get cached menu - immutable once the run is EXTRACTED
         cache_key = f"{run_id}/menu.json"
 
         try:
-            response = s3_client.get_object(Bucket=cache_bucket, Key=cache_key)
-            menu_data = json.loads(response["Body"].read().decode("utf-8"))
-            return success({"run_id": run_id, "status": "EXTRACTED", "menu": menu_data})
+            menu_data, etag = read_json(cache_key, get_header(event, "If-None-Match"))
+            if menu_data is None:
+                return not_modified(etag, cache_control=IMMUTABLE)
+            return success(
+                {"run_id": run_id, "status": "EXTRACTED", "version": version, "menu": menu_data},
+                etag=etag,
+                cache_control=IMMUTABLE,
+            )
         except ClientError as e:
             if e.response['Error']['Code'] == 'NoSuchKey':
                 return error("Menu data not found", 404)
@@ -1,14 +1,13 @@
 import json
 import os
 import uuid
-import boto3
-from lib.response import success, error
+from lib import aws
+from lib.response import success, error, compress_response
 from lib.dynamo import create_run
 from lib.auth import require_auth
 
-s3_client = boto3.client("s3")
-
 
+@compress_response
 @require_auth
 def handler(event, context, user):
     """
@@ -64,7 +63,7 @@ def handler(event, context, user):
             keys.append(key)
 
             # Generate presigned URL for PUT
-            url = s3_client.generate_presigned_url(
+            url = aws.client("s3").generate_presigned_url(
                 "put_object",
                 Params={
                     "Bucket": bucket,
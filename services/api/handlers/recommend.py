@@ -1,13 +1,21 @@
 import json
-import os
 import hashlib
-import boto3
+import re
 from botocore.exceptions import ClientError
-from lib.response import success, error
-from lib.openai_client import get_recommendations
+from lib.response import success, error, not_modified, get_header, IMMUTABLE, compress_response
+from lib.artifacts import read_json, write_json
+from lib.secrets import prefetch
 from lib.auth import require_auth
 
-s3_client = boto3.client("s3")
+# Fetch API keys in the background during init, not on the first request
+prefetch("openai")
+
+
+PREFS_HASH = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _rec_cache_key(run_id: str, prefs_hash: str) -> str:
+    return f"{run_id}/recommendations/{prefs_hash}.json"
 
 
 def get_prefs_hash(run_id: str, vibe: str, group_size: int, prefs: dict) -> str:
@@ -16,10 +24,12 @@ def get_prefs_hash(run_id: str, vibe: str, group_size: int, prefs: dict) -> str:
     return hashlib.md5(key.encode()).hexdigest()
 
 
+@compress_response
 @require_auth
 def handler(event, context, user):
     """
     POST /menu/recommend
+    GET /menu/{runId}/recommendations/{prefsHash}
 
     Request body:
     {
@@ -45,9 +55,19 @@ def handler(event, context, user):
         ],
         "avoid": [
             { "dish": "Super Spicy Wings", "reason": "..." }
-        ]
+        ],
+        "prefs_hash": "..."
     }
+
+    Recommendations are cached per run and preferences and never change.
+    The POST generates them (or returns the cached ones); the GET, with the
+    prefs_hash from a POST, returns them with an ETag and as cacheable
+    forever, so repeats are served by the browser's cache and a matching
+    If-None-Match gets a 304. 404 if they haven't been generated.
     """
+    if event.get("httpMethod") == "GET":
+        return _get_cached(event)
+
     try:
         # Parse request body
         body = json.loads(event.get("body", "{}"))
@@ -80,32 +100,30 @@ def handler(event, context, user):
         if budget not in valid_budget:
             budget = "moderate"
 
-        # Get menu data from cache
-        cache_bucket = os.environ.get("CACHE_BUCKET")
-        cache_key = f"{run_id}/menu.json"
-
-        try:
-            response = s3_client.get_object(Bucket=cache_bucket, Key=cache_key)
-            menu_data = json.loads(response["Body"].read().decode("utf-8"))
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchKey':
-                return error("Menu not found. Please extract the menu first.", 404)
-            raise
-
         # Check for cached recommendations
         prefs_hash = get_prefs_hash(run_id, vibe, group_size, prefs)
-        rec_cache_key = f"{run_id}/recommendations/{prefs_hash}.json"
+        rec_cache_key = _rec_cache_key(run_id, prefs_hash)
 
         try:
-            response = s3_client.get_object(Bucket=cache_bucket, Key=rec_cache_key)
-            cached_recs = json.loads(response["Body"].read().decode("utf-8"))
-            return success(cached_recs)
+            cached_recs, _ = read_json(rec_cache_key)
+            return success({**cached_recs, "prefs_hash": prefs_hash})
         except ClientError as e:
             if e.response['Error']['Code'] != 'NoSuchKey':
                 raise
             # Need to generate recommendations
 
-        # Get recommendations from GPT-4o
+        # Get menu data from cache
+        try:
+            menu_data, _ = read_json(f"{run_id}/menu.json")
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                return error("Menu not found. Please extract the menu first.", 404)
+            raise
+
+        # Get recommendations from GPT-4o. Imported here so cached
+        # responses don't pay for loading openai on a cold start.
+        from lib.openai_client import get_recommendations
+
         try:
             recommendations = get_recommendations(
                 menu=menu_data,
@@ -119,17 +137,34 @@ def handler(event, context, user):
             return error(f"Failed to generate recommendations: {str(e)}", 500)
 
         # Cache the result
-        s3_client.put_object(
-            Bucket=cache_bucket,
-            Key=rec_cache_key,
-            Body=json.dumps(recommendations),
-            ContentType="application/json",
-        )
+        write_json(rec_cache_key, recommendations)
 
-        return success(recommendations)
+        return success({**recommendations, "prefs_hash": prefs_hash})
 
     except json.JSONDecodeError:
         return error("Invalid JSON in request body", 400)
     except Exception as e:
         print(f"Error: {str(e)}")
         return error("Internal server error", 500)
+
+
+def _get_cached(event):
+    """GET path: recommendations generated before, by prefs hash."""
+    params = event.get("pathParameters") or {}
+    run_id = params.get("runId")
+    prefs_hash = params.get("prefsHash") or ""
+
+    if not run_id or not PREFS_HASH.match(prefs_hash):
+        return error("runId and prefsHash are required", 400)
+
+    try:
+        cached_recs, etag = read_json(_rec_cache_key(run_id, prefs_hash), get_header(event, "If-None-Match"))
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            return error("Recommendations not found", 404)
+        print(f"Error: {str(e)}")
+        return error("Internal server error", 500)
+
+    if cached_recs is None:
+        return not_modified(etag, cache_control=IMMUTABLE)
+    return success({**cached_recs, "prefs_hash": prefs_hash}, etag=etag, cache_control=IMMUTABLE)
@@ -1,16 +1,17 @@
 import hashlib
 import json
-import os
 import re
-import requests
-import boto3
 from botocore.exceptions import ClientError
-from lib.response import success, error
-from lib.secrets import get_serpapi_key, get_openai_api_key
+from lib.response import success, error, compress_response
+from lib.artifacts import read_json, write_json
+from lib.http import get_session
+from lib.secrets import get_serpapi_key, get_openai_api_key, prefetch
 from lib.dynamo import get_run
+from lib.llm_json import parse_llm_json
 from lib.auth import require_auth
 
-s3_client = boto3.client("s3")
+# Fetch API keys in the background during init, not on the first request
+prefetch("serpapi", "openai")
 
 SERPAPI_URL = "https://serpapi.com/search"
 OPENAI_URL = "https://api.openai.com/v1/chat/completions"
@@ -44,7 +45,7 @@ def resolve_short_url(url: str) -> str:
     if any(domain in url for domain in short_domains):
         try:
             # Follow redirects to get the full URL
-            response = requests.head(url, allow_redirects=True, timeout=10)
+            response = get_session().head(url, allow_redirects=True, timeout=10)
             return response.url
         except Exception as e:
             print(f"Error resolving short URL: {e}")
@@ -104,7 +105,7 @@ def fetch_reviews_from_serpapi(google_maps_url: str) -> list:
         }
 
         try:
-            search_response = requests.get(SERPAPI_URL, params=search_params, timeout=15)
+            search_response = get_session().get(SERPAPI_URL, params=search_params, timeout=15)
             search_response.raise_for_status()
             search_data = search_response.json()
 
@@ -125,7 +126,7 @@ def fetch_reviews_from_serpapi(google_maps_url: str) -> list:
             return []
 
     try:
-        response = requests.get(SERPAPI_URL, params=params, timeout=15)
+        response = get_session().get(SERPAPI_URL, params=params, timeout=15)
         response.raise_for_status()
         data = response.json()
 
@@ -188,19 +189,14 @@ Return JSON array only, no other text."""
     }
 
     try:
-        response = requests.post(OPENAI_URL, headers=headers, json=payload, timeout=30)
+        response = get_session().post(OPENAI_URL, headers=headers, json=payload, timeout=30)
         response.raise_for_status()
         data = response.json()
 
-        content = data["choices"][0]["message"]["content"].strip()
+        content = data["choices"][0]["message"]["content"]
 
-        # Parse JSON from response
-        # Handle potential markdown code blocks
-        if content.startswith("```"):
-            content = re.sub(r'^```json?\n?', '', content)
-            content = re.sub(r'\n?```$', '', content)
-
-        mentions = json.loads(content)
+        # Tolerates fences, trailing commas and truncation
+        mentions = parse_llm_json(content).value
         return mentions if isinstance(mentions, list) else []
 
     except Exception as e:
@@ -208,6 +204,7 @@ Return JSON array only, no other text."""
         return []
 
 
+@compress_response
 @require_auth
 def handler(event, context, user):
     """
@@ -255,13 +252,11 @@ def handler(event, context, user):
             })
 
         # Check for cached reviews (include URL hash in cache key)
-        cache_bucket = os.environ.get("CACHE_BUCKET")
         url_hash = hashlib.md5(google_maps_url.encode()).hexdigest()[:8]
         reviews_cache_key = f"{run_id}/reviews_{url_hash}.json"
 
         try:
-            response = s3_client.get_object(Bucket=cache_bucket, Key=reviews_cache_key)
-            cached = json.loads(response["Body"].read().decode("utf-8"))
+            cached, _ = read_json(reviews_cache_key)
             return success(cached)
         except ClientError as e:
             if e.response['Error']['Code'] != 'NoSuchKey':
@@ -270,8 +265,7 @@ def handler(event, context, user):
         # Get menu data to know which dishes to look for
         menu_cache_key = f"{run_id}/menu.json"
         try:
-            response = s3_client.get_object(Bucket=cache_bucket, Key=menu_cache_key)
-            menu_data = json.loads(response["Body"].read().decode("utf-8"))
+            menu_data, _ = read_json(menu_cache_key)
         except ClientError:
             return error("Menu not found", 404)
 
@@ -287,12 +281,7 @@ def handler(event, context, user):
 
         if not reviews:
             result = {"mentions": [], "review_count": 0, "message": "No reviews found"}
-            s3_client.put_object(
-                Bucket=cache_bucket,
-                Key=reviews_cache_key,
-                Body=json.dumps(result),
-                ContentType="application/json",
-            )
+            write_json(reviews_cache_key, result)
             return success(result)
 
         # Extract dish mentions using GPT
@@ -304,12 +293,7 @@ def handler(event, context, user):
         }
 
         # Cache the result
-        s3_client.put_object(
-            Bucket=cache_bucket,
-            Key=reviews_cache_key,
-            Body=json.dumps(result),
-            ContentType="application/json",
-        )
+        write_json(reviews_cache_key, result)
 
         return success(result)
 
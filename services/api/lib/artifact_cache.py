@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Total size of the cached objects (as stored in S3, not parsed)
+MAX_BYTES = int(float(os.environ.get("ARTIFACT_CACHE_MAX_MB", "32")) * 1024 * 1024)
+
+# Entries younger than this are served without asking S3; older ones are
+# revalidated with a conditional GET on their ETag
+REVALIDATE_SECONDS = float(os.environ.get("ARTIFACT_CACHE_REVALIDATE_SECONDS", "300"))
+
+
+@dataclass
+class CachedArtifact:
+    data: Any
+    etag: str
+    size: int
+    checked_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.checked_at < REVALIDATE_SECONDS
+
+
+class ArtifactCache:
+    """
+    In-process LRU of parsed run artifacts (menu.json, images.json, ...),
+    keyed by S3 key and bounded by total object size.
+
+    Lives at module level so it survives between invocations of a warm
+    container. Cached values are shared between callers: treat them as
+    read-only.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, CachedArtifact]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedArtifact]:
+        """Return the entry for key (fresh or not) and mark it recently used."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, data: Any, etag: str, size: int):
+        """Add or replace an entry, evicting least recently used ones to fit."""
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self.entries[key] = CachedArtifact(data, etag, size, time.monotonic())
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+
+    def touch(self, key: str):
+        """Record that S3 confirmed the entry is current (a 304 on revalidation)."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.checked_at = time.monotonic()
+            self.revalidations += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+
+artifact_cache = ArtifactCache()
@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Any, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from lib import aws
+from lib.artifact_cache import artifact_cache
+from lib.response import etag_matches
+
+
+def _log(outcome: str, key: str):
+    stats = artifact_cache.stats()
+    print(f"Artifact cache {outcome}: {key} (hits={stats['hits']} misses={stats['misses']} "
+          f"entries={stats['entries']} bytes={stats['bytes']})")
+
+
+def read_json(key: str, if_none_match: Optional[str] = None, cached: bool = True) -> Tuple[Optional[Any], str]:
+    """
+    Read a JSON run artifact (menu.json, images.json, ...) from the cache
+    bucket, along with its S3 ETag.
+
+    Parsed artifacts are kept in lib.artifact_cache between invocations of a
+    warm container. A recent copy is returned without touching S3; an older
+    one is revalidated with a conditional GET, so an unchanged object isn't
+    downloaded or parsed again. Returned data is shared: don't mutate it.
+
+    With if_none_match (the client's If-None-Match header), returns None
+    instead of the data if the client's copy is current.
+
+    Returns:
+        Tuple of (data or None if not modified, etag)
+
+    Raises:
+        ClientError: NoSuchKey if the artifact doesn't exist
+    """
+    entry = artifact_cache.get(key) if cached else None
+    if entry is not None and entry.fresh:
+        artifact_cache.record(hit=True)
+        _log("hit", key)
+        return (None if etag_matches(if_none_match, entry.etag) else entry.data), entry.etag
+
+    params = {"Bucket": os.environ.get("CACHE_BUCKET"), "Key": key}
+    # Revalidate our own copy if we have one; otherwise S3 checks the client's
+    if entry is not None:
+        params["IfNoneMatch"] = entry.etag
+    elif if_none_match:
+        params["IfNoneMatch"] = if_none_match
+
+    try:
+        response = aws.client("s3").get_object(**params)
+    except ClientError as e:
+        metadata = e.response.get("ResponseMetadata", {})
+        if metadata.get("HTTPStatusCode") == 304:
+            if entry is None:
+                return None, metadata.get("HTTPHeaders", {}).get("etag", if_none_match)
+            artifact_cache.touch(key)
+            artifact_cache.record(hit=True)
+            _log("revalidated", key)
+            return (None if etag_matches(if_none_match, entry.etag) else entry.data), entry.etag
+        if entry is not None:
+            artifact_cache.invalidate(key)
+        raise
+
+    body = response["Body"].read()
+    data = json.loads(body.decode("utf-8"))
+    etag = response["ETag"]
+    if cached:
+        artifact_cache.put(key, data, etag, len(body))
+        artifact_cache.record(hit=False)
+        _log("miss", key)
+
+    return (None if etag_matches(if_none_match, etag) else data), etag
+
+
+def write_json(key: str, data: Any, if_match: Optional[str] = None, if_none_match: Optional[str] = None) -> str:
+    """
+    Write a JSON run artifact to the cache bucket. Returns its ETag.
+
+    The artifact cache is updated too, so the next read is served from memory.
+
+    With if_match (an ETag) or if_none_match ("*"), the write only happens
+    if the artifact is still that version, or doesn't exist yet.
+
+    Raises:
+        ClientError: PreconditionFailed or ConditionalRequestConflict if the
+            condition didn't hold
+    """
+    body = json.dumps(data)
+    params = {"Bucket": os.environ.get("CACHE_BUCKET"), "Key": key}
+    if if_match:
+        params["IfMatch"] = if_match
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    response = aws.client("s3").put_object(**params, Body=body, ContentType="application/json")
+    artifact_cache.put(key, data, response["ETag"], len(body))
+    return response["ETag"]
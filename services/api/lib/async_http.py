@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from typing import Awaitable, Dict, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+# Idle connections are kept this long. httpx's default (5s) drops them
+# between invocations; most hosts keep idle connections open for a minute
+# or more, and one that has closed is noticed before the request is sent.
+KEEPALIVE_EXPIRY = 60.0
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_clients: Dict[str, httpx.AsyncClient] = {}
+_client_kwargs: Dict[str, dict] = {}
+
+
+def run(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine to completion on the container's event loop.
+
+    Use instead of asyncio.run(): that closes its loop, and with it the
+    connections of every client opened on it. This loop lives as long as
+    the container, so get_client() connections (TCP and TLS) are reused
+    across warm invocations, like lib.http's session. Calls from several
+    threads run one at a time.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+        return _loop.run_until_complete(coro)
+
+
+def get_client(name: str, **kwargs) -> httpx.AsyncClient:
+    """
+    Shared AsyncClient for one kind of traffic (e.g. "serpapi"), created on
+    first use with kwargs (timeout, limits, headers, ...) and kept for the
+    life of the container. Only use it from coroutines passed to run().
+
+    Raises:
+        ValueError: If name was first used with different kwargs - the
+            existing client would silently ignore them
+    """
+    client = _clients.get(name)
+    if client is not None:
+        if _client_kwargs[name] != kwargs:
+            raise ValueError(f"HTTP client {name!r} already exists with different settings")
+        return client
+
+    _client_kwargs[name] = dict(kwargs)
+    limits = kwargs.pop("limits", None) or httpx.Limits()
+    limits = httpx.Limits(
+        max_connections=limits.max_connections,
+        max_keepalive_connections=limits.max_keepalive_connections,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    client = _clients[name] = httpx.AsyncClient(limits=limits, **kwargs)
+    return client
@@ -0,0 +1,50 @@
+import os
+import threading
+from functools import lru_cache
+
+# botocore defaults to 10 connections per client, fewer than the threads
+# that share a client (images.py runs 10 dish lookups at once, each doing
+# DynamoDB reads and writes), so calls queued for a connection.
+MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "32"))
+
+
+@lru_cache(maxsize=None)
+def _config():
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        connect_timeout=5,
+        read_timeout=30,
+        retries={"max_attempts": 3, "mode": "standard"},
+    )
+
+
+# boto3 is imported and clients are created on first use rather than at
+# import time, so a cold start only pays for the clients a request needs.
+# Creation is serialized: boto3's default session isn't thread-safe, and
+# clients can be first used from worker threads (e.g. lib.secrets.prefetch).
+_clients = {}
+_lock = threading.Lock()
+
+
+def _get(kind: str, service_name: str):
+    key = (kind, service_name)
+    if key not in _clients:
+        with _lock:
+            if key not in _clients:
+                import boto3
+
+                factory = boto3.client if kind == "client" else boto3.resource
+                _clients[key] = factory(service_name, config=_config())
+    return _clients[key]
+
+
+def client(service_name: str):
+    """Shared boto3 client for a service, with the pool and retry settings above."""
+    return _get("client", service_name)
+
+
+def resource(service_name: str):
+    """Shared boto3 resource for a service, with the pool and retry settings above."""
+    return _get("resource", service_name)
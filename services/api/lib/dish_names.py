@@ -0,0 +1,89 @@
+import re
+import unicodedata
+from typing import Optional
+
+# Words that don't change what a dish looks like
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "with", "w", "in", "on", "de", "la", "le", "al", "el",
+    "our", "homemade", "famous", "classic", "style", "fresh", "n",
+}
+
+# Portion words, also dropped when they stand alone ("Large Fries"). Not
+# "half" or "full": a half chicken or a full rack is a different picture.
+SIZE_WORDS = {"small", "medium", "large", "regular", "sm", "md", "lg", "xl"}
+
+# Sizes and prices: 12", 12 inch, 16oz, 1/2 lb, $12.99, 12.99, 12pc
+_SIZE_RE = re.compile(
+    r"\d+(?:[./]\d+)?\s*(?:\"|''|”|inch(?:es)?|in\b|oz|ounces?|lbs?|pounds?|g\b|kg|ml|cl|l\b|pcs?|pieces?|ct)",
+)
+_PRICE_RE = re.compile(r"[$€£¥]\s*\d+(?:[.,]\d+)?|\b\d+(?:[.,]\d{2})\b")
+_PARENS_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+
+# Menu item numbers: "12. Pad Thai", "#7 Combo", "No. 3 Pho"
+_ITEM_NUMBER_RE = re.compile(r"^\s*(?:(?:#|no\.)\s*\d+|\d+\s*[.):])(?=\s)")
+
+# Plurals that aren't plurals
+_KEEP_S = ("ss", "us", "is")
+
+# Singulars ending in -ie or -che, which the -ies and -es rules would mangle
+_IE_WORDS = {"pie", "brownie", "cookie", "smoothie", "veggie", "hoagie", "toastie", "sarnie", "frankie"}
+_CHE_WORDS = {"quiche", "brioche", "ceviche", "panache", "mache"}
+
+
+def fold_unicode(text: str) -> str:
+    """Casefold and strip accents: "Crème Brûlée" -> "creme brulee"."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def singular(word: str) -> str:
+    """Crude English singular, good enough to line up menu wording ("Tacos", "Cherries")."""
+    if len(word) <= 3 or word.endswith(_KEEP_S):
+        return word
+    if word[:-1] in _IE_WORDS or word[:-1] in _CHE_WORDS:
+        return word[:-1]
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def canonical_dish_name(name: Optional[str]) -> str:
+    """
+    Canonical form of a dish name for cache keys, so that differently
+    written menu entries for the same dish share one entry:
+
+        "Margherita Pizza", "Pizza Margherita", 'Margherita pizza (12")'
+            -> "margherita pizza"
+        "Crème Brûlée", "Creme Brulee" -> "brulee creme"
+
+    Folds case and accents, drops item numbers, parentheticals, sizes and
+    prices, punctuation, stopwords and portion words, singularizes and sorts
+    the remaining words. Other numbers are kept ("Chicken 65" is its own
+    dish). Falls back to the plain folded name if nothing is left.
+    """
+    if not name:
+        return ""
+
+    text = fold_unicode(name)
+    text = _ITEM_NUMBER_RE.sub(" ", text, count=1)
+    text = _PARENS_RE.sub(" ", text)
+    text = _SIZE_RE.sub(" ", text)
+    text = _PRICE_RE.sub(" ", text)
+    text = text.replace("&", " ")
+    text = re.sub(r"[^\w\s]|_", " ", text)
+
+    words = set()
+    for word in text.split():
+        if word in STOPWORDS or word in SIZE_WORDS:
+            continue
+        words.add(singular(word))
+
+    if not words:
+        return " ".join(fold_unicode(name).split())
+    return " ".join(sorted(words))
@@ -1,21 +1,52 @@
+import hashlib
 import os
-import boto3
+import random
+import time
+from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from lib import aws
 
-dynamodb = boto3.resource("dynamodb")
+# DynamoDB's limit on keys per BatchGetItem call
+BATCH_GET_SIZE = 100
+
+# Rounds of retrying keys DynamoDB returned as unprocessed (throttling)
+BATCH_MAX_RETRIES = 5
+
+# Image cache lifetimes. Dishes with no results are cached too ("negative"
+# entries), for less time since new pictures may show up; a failed search
+# (SerpAPI 5xx, throttling, timeouts) is only remembered briefly so it
+# backs off instead of being retried on every run.
+IMAGES_TTL = timedelta(days=30)
+NO_IMAGES_TTL = timedelta(days=int(os.environ.get("IMAGE_CACHE_EMPTY_TTL_DAYS", "7")))
+SEARCH_FAILED_TTL = timedelta(minutes=int(os.environ.get("IMAGE_CACHE_FAILURE_TTL_MINUTES", "15")))
+
+# Image URL checks (lib.image_verify) live in the same table under
+# "url#<md5>" keys. A broken URL (a 4xx/5xx or non-image answer; probes
+# that time out or fail aren't cached) is rechecked sooner: hosts come back.
+URL_CHECK_TTL = timedelta(days=int(os.environ.get("IMAGE_URL_CHECK_TTL_DAYS", "7")))
+URL_DEAD_TTL = timedelta(hours=int(os.environ.get("IMAGE_URL_DEAD_TTL_HOURS", "24")))
+
+# Mirrored thumbnails per dish (lib.thumbnails), under "thumbs#<dish_hash>".
+# Shorter than the cache bucket's 30-day expiry, so an entry never outlives
+# the objects it points to (see lib.thumbnails.REUSE_DAYS).
+THUMBNAILS_TTL = timedelta(days=20)
+
+# Search leases (lib.image_search) are "lease#<dish_hash>" items whose ttl
+# is the lease expiry; an expired one can be taken over straight away.
 
 
 def get_menu_runs_table():
     """Get the menu runs DynamoDB table."""
     table_name = os.environ.get("DYNAMO_TABLE", "nibble-dev-menu-runs")
-    return dynamodb.Table(table_name)
+    return aws.resource("dynamodb").Table(table_name)
 
 
 def get_image_cache_table():
     """Get the image cache DynamoDB table."""
     table_name = os.environ.get("IMAGE_CACHE_TABLE", "nibble-dev-image-cache")
-    return dynamodb.Table(table_name)
+    return aws.resource("dynamodb").Table(table_name)
 
 
 def create_run(run_id: str, keys: List[str], google_maps_url: Optional[str] = None) -> Dict[str, Any]:
@@ -29,6 +60,7 @@ def create_run(run_id: str, keys: List[str], google_maps_url: Optional[str] = No
         "run_id": run_id,
         "status": "PENDING",
         "keys": keys,
+        "upload_etags": {},
         "created_at": now.isoformat(),
         "ttl": ttl,
     }
@@ -40,11 +72,11 @@ def create_run(run_id: str, keys: List[str], google_maps_url: Optional[str] = No
     return item
 
 
-def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+def get_run(run_id: str, consistent: bool = False) -> Optional[Dict[str, Any]]:
     """Get a menu run record."""
     table = get_menu_runs_table()
 
-    response = table.get_item(Key={"run_id": run_id})
+    response = table.get_item(Key={"run_id": run_id}, ConsistentRead=consistent)
     return response.get("Item")
 
 
@@ -74,29 +106,301 @@ def update_run_status(run_id: str, status: str, extra_data: Optional[Dict] = Non
     )
 
 
+def record_upload(run_id: str, key: str, etag: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Atomically record that one of a run's images finished uploading.
+
+    Returns the updated run record, or None if the run doesn't exist or the
+    key isn't one of its expected uploads.
+    """
+    table = get_menu_runs_table()
+
+    def update():
+        return table.update_item(
+            Key={"run_id": run_id},
+            UpdateExpression="ADD uploaded_keys :key_set SET upload_etags.#key = :etag",
+            ConditionExpression="attribute_exists(run_id) AND contains(#keys, :key)",
+            ExpressionAttributeNames={"#key": key, "#keys": "keys"},
+            ExpressionAttributeValues={
+                ":key_set": {key},
+                ":key": key,
+                ":etag": etag or "",
+            },
+            ReturnValues="ALL_NEW",
+        )
+
+    try:
+        try:
+            response = update()
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ValidationException":
+                raise
+            # Runs created before upload_etags existed have no map to set a key in
+            table.update_item(
+                Key={"run_id": run_id},
+                UpdateExpression="SET upload_etags = if_not_exists(upload_etags, :empty)",
+                ConditionExpression="attribute_exists(run_id)",
+                ExpressionAttributeValues={":empty": {}},
+            )
+            response = update()
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return None
+        raise
+
+    return response["Attributes"]
+
+
+def claim_run(run_id: str, from_status: str = "PENDING", to_status: str = "PROCESSING") -> bool:
+    """
+    Move a run from one status to another only if it's still in from_status.
+
+    Used so the upload trigger and POST /menu/extract can't both start the
+    same extraction. Returns True if this caller won.
+    """
+    table = get_menu_runs_table()
+
+    try:
+        table.update_item(
+            Key={"run_id": run_id},
+            UpdateExpression="SET #status = :to_status, updated_at = :updated_at",
+            ConditionExpression="#status = :from_status",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":from_status": from_status,
+                ":to_status": to_status,
+                ":updated_at": datetime.utcnow().isoformat(),
+            },
+        )
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+
+
+def _image_cache_item(dish_hash: str, images: List[str], failed: bool = False) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    if failed:
+        lifetime, negative = SEARCH_FAILED_TTL, "failed"
+    elif not images:
+        lifetime, negative = NO_IMAGES_TTL, "empty"
+    else:
+        lifetime, negative = IMAGES_TTL, None
+
+    item = {
+        "dish_hash": dish_hash,
+        "images": images,
+        "cached_at": now.isoformat(),
+        "ttl": int((now + lifetime).timestamp()),
+    }
+    if negative:
+        item["negative"] = negative
+    return item
+
+
+def _is_live(item: Dict[str, Any]) -> bool:
+    """DynamoDB deletes expired items lazily (up to days later), so check ttl on read."""
+    ttl = item.get("ttl")
+    return ttl is None or int(ttl) > datetime.utcnow().timestamp()
+
+
 def get_cached_images(dish_hash: str) -> Optional[List[str]]:
-    """Get cached images for a dish."""
+    """
+    Get cached images for a dish.
+
+    Returns None on a miss, and an empty list for a negative entry (no
+    results, or a recent failed search) - callers shouldn't search again.
+    """
     table = get_image_cache_table()
 
     response = table.get_item(Key={"dish_hash": dish_hash})
     item = response.get("Item")
 
-    if item:
+    if item and _is_live(item):
         return item.get("images", [])
     return None
 
 
 def cache_images(dish_hash: str, images: List[str]):
-    """Cache images for a dish."""
+    """Cache images for a dish. An empty list is cached as a negative entry."""
     table = get_image_cache_table()
+    table.put_item(Item=_image_cache_item(dish_hash, images))
 
-    ttl = int((datetime.utcnow() + timedelta(days=30)).timestamp())
 
-    table.put_item(
-        Item={
-            "dish_hash": dish_hash,
-            "images": images,
-            "cached_at": datetime.utcnow().isoformat(),
-            "ttl": ttl,
+def cache_search_failure(dish_hash: str):
+    """Remember briefly that searching for a dish failed, so it isn't retried on every run."""
+    table = get_image_cache_table()
+    table.put_item(Item=_image_cache_item(dish_hash, [], failed=True))
+
+
+def _batch_get_live(keys: List[str], attributes: List[str]) -> List[Dict[str, Any]]:
+    """
+    Live image-cache items for many keys with BatchGetItem.
+
+    Keys DynamoDB leaves unprocessed (throttling, response size) are retried
+    with backoff; any still left after that are treated as misses.
+    """
+    table = get_image_cache_table()
+    unique = list(dict.fromkeys(keys))
+    found = []
+    # Aliased, since some attribute names (ttl, url) are DynamoDB reserved words
+    names = {f"#a{i}": name for i, name in enumerate(["dish_hash", "ttl"] + attributes)}
+
+    for i in range(0, len(unique), BATCH_GET_SIZE):
+        request = {
+            table.name: {
+                "Keys": [{"dish_hash": key} for key in unique[i:i + BATCH_GET_SIZE]],
+                "ProjectionExpression": ", ".join(names),
+                "ExpressionAttributeNames": names,
+            }
         }
-    )
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            response = aws.resource("dynamodb").batch_get_item(RequestItems=request)
+            found.extend(item for item in response.get("Responses", {}).get(table.name, []) if _is_live(item))
+
+            request = response.get("UnprocessedKeys")
+            if not request:
+                break
+            if attempt == BATCH_MAX_RETRIES:
+                print(f"Image cache: {len(request[table.name]['Keys'])} keys still unprocessed, treating as misses")
+                break
+            time.sleep(min(1.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    return found
+
+
+def get_cached_images_batch(dish_hashes: List[str]) -> Dict[str, List[str]]:
+    """
+    Get cached images for many dishes with BatchGetItem.
+
+    Returns {dish_hash: images} for the dishes that have a live entry,
+    including negative ones (empty list); misses are left out.
+    """
+    return {item["dish_hash"]: item.get("images", []) for item in _batch_get_live(dish_hashes, ["images"])}
+
+
+def cache_images_batch(images_by_hash: Dict[str, List[str]], failed_hashes: List[str] = ()):
+    """
+    Cache images for many dishes with BatchWriteItem.
+
+    Empty lists become negative entries; failed_hashes get the short-lived
+    failed-search entry. The batch writer sends 25 items per call and
+    resends any DynamoDB returns as unprocessed.
+    """
+    if not images_by_hash and not failed_hashes:
+        return
+
+    table = get_image_cache_table()
+
+    with table.batch_writer(overwrite_by_pkeys=["dish_hash"]) as batch:
+        for dish_hash, images in images_by_hash.items():
+            batch.put_item(Item=_image_cache_item(dish_hash, images))
+        for dish_hash in failed_hashes:
+            batch.put_item(Item=_image_cache_item(dish_hash, [], failed=True))
+
+
+def _url_check_key(url: str) -> str:
+    return "url#" + hashlib.md5(url.encode()).hexdigest()
+
+
+def get_url_checks_batch(urls: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Cached liveness checks for image URLs, as {url: check} for the URLs
+    checked recently (see cache_url_checks); unchecked ones are left out.
+    """
+    items = _batch_get_live([_url_check_key(url) for url in urls], ["url", "check"])
+    return {
+        item["url"]: {key: int(value) if isinstance(value, Decimal) else value for key, value in item["check"].items()}
+        for item in items if "url" in item
+    }
+
+
+def cache_url_checks(checks: Dict[str, Dict[str, Any]]):
+    """
+    Cache liveness checks for image URLs ({url: check}, where check is a
+    dict with at least "ok"), so each URL is probed once per TTL rather
+    than once per run.
+    """
+    if not checks:
+        return
+
+    table = get_image_cache_table()
+    now = datetime.utcnow()
+
+    with table.batch_writer(overwrite_by_pkeys=["dish_hash"]) as batch:
+        for url, check in checks.items():
+            lifetime = URL_CHECK_TTL if check.get("ok") else URL_DEAD_TTL
+            batch.put_item(Item={
+                "dish_hash": _url_check_key(url),
+                "url": url,
+                "check": {key: value for key, value in check.items() if value is not None},
+                "cached_at": now.isoformat(),
+                "ttl": int((now + lifetime).timestamp()),
+            })
+
+
+def get_thumbnails_batch(dish_hashes: List[str]) -> Dict[str, Dict[str, str]]:
+    """Mirrored thumbnails for many dishes, as {dish_hash: {size: s3_key}}; dishes without are left out."""
+    items = _batch_get_live([f"thumbs#{dish_hash}" for dish_hash in dish_hashes], ["thumbnails"])
+    return {item["dish_hash"].split("#", 1)[1]: item["thumbnails"] for item in items if item.get("thumbnails")}
+
+
+def cache_thumbnails(thumbnails_by_hash: Dict[str, Dict[str, str]]):
+    """Remember each dish's mirrored thumbnails ({dish_hash: {size: s3_key}}) for later runs."""
+    if not thumbnails_by_hash:
+        return
+
+    table = get_image_cache_table()
+    now = datetime.utcnow()
+
+    with table.batch_writer(overwrite_by_pkeys=["dish_hash"]) as batch:
+        for dish_hash, thumbnails in thumbnails_by_hash.items():
+            batch.put_item(Item={
+                "dish_hash": f"thumbs#{dish_hash}",
+                "thumbnails": thumbnails,
+                "cached_at": now.isoformat(),
+                "ttl": int((now + THUMBNAILS_TTL).timestamp()),
+            })
+
+
+def acquire_lease(key: str, owner: str, seconds: int) -> Tuple[bool, int]:
+    """
+    Take the lease on key for seconds unless another owner holds a live one
+    (conditional put). Returns (acquired, expiry as epoch seconds) - the
+    holder's expiry when it wasn't acquired.
+    """
+    table = get_image_cache_table()
+    now = int(time.time())
+    expires = now + seconds
+
+    try:
+        table.put_item(
+            Item={"dish_hash": f"lease#{key}", "owner": owner, "ttl": expires},
+            ConditionExpression="attribute_not_exists(dish_hash) OR #ttl < :now",
+            ExpressionAttributeNames={"#ttl": "ttl"},
+            ExpressionAttributeValues={":now": now},
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+        return True, expires
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        # The holder's item comes back in the low-level format
+        held = e.response.get("Item", {}).get("ttl", {}).get("N")
+        return False, int(held) if held else expires
+
+
+def release_lease(key: str, owner: str):
+    """Give up a lease early, if it's still ours."""
+    table = get_image_cache_table()
+    try:
+        table.delete_item(
+            Key={"dish_hash": f"lease#{key}"},
+            ConditionExpression="#owner = :owner",
+            ExpressionAttributeNames={"#owner": "owner"},
+            ExpressionAttributeValues={":owner": owner},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
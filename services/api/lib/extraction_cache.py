@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from botocore.exceptions import ClientError
+from typing import Any, Dict, List, Optional
+from lib import aws
+
+# Bump when the extraction prompt or output format changes so stale menus stop matching
+CACHE_VERSION = "v2"
+CACHE_PREFIX = f"extractions/{CACHE_VERSION}"
+
+
+def page_digest(image_bytes: bytes) -> str:
+    """MD5 of a page's bytes. Matches the S3 ETag of a single-part upload."""
+    return hashlib.md5(image_bytes).hexdigest()
+
+
+def etag_digest(etag: Optional[str]) -> Optional[str]:
+    """
+    Turn an S3 ETag into a page digest.
+
+    Returns None for multipart ETags ("<md5>-<parts>"), which are not a hash of
+    the object bytes and can't be compared with page_digest().
+    """
+    if not etag:
+        return None
+    etag = etag.strip('"')
+    if "-" in etag or len(etag) != 32:
+        return None
+    return etag.lower()
+
+
+def content_key(digests: List[str]) -> str:
+    """Cache key for an ordered list of page digests."""
+    joined = ",".join(digests)
+    return hashlib.sha256(joined.encode()).hexdigest()
+
+
+def _object_key(kind: str, key: str) -> str:
+    return f"{CACHE_PREFIX}/{kind}/{key}.json"
+
+
+def find_cached_menu(exact_key: str) -> Optional[str]:
+    """
+    Look up a previously extracted menu by its content key.
+
+    Returns the S3 key of the cached menu in the cache bucket, or None on a miss.
+    Lookup errors are treated as a miss so the cache never fails a run.
+    """
+    cache_bucket = os.environ.get("CACHE_BUCKET")
+    object_key = _object_key("sha", exact_key)
+    try:
+        aws.client("s3").head_object(Bucket=cache_bucket, Key=object_key)
+        return object_key
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+            print(f"Extraction cache lookup error: {e}")
+    return None
+
+
+def copy_cached_menu(cached_key: str, run_id: str):
+    """Server-side copy of a cached menu into {run_id}/menu.json."""
+    cache_bucket = os.environ.get("CACHE_BUCKET")
+    aws.client("s3").copy_object(
+        Bucket=cache_bucket,
+        Key=f"{run_id}/menu.json",
+        CopySource={"Bucket": cache_bucket, "Key": cached_key},
+        ContentType="application/json",
+        MetadataDirective="REPLACE",
+    )
+
+
+def store_menu(menu_data: Dict[str, Any], exact_key: str):
+    """Store an extracted menu under its content key."""
+    aws.client("s3").put_object(
+        Bucket=os.environ.get("CACHE_BUCKET"),
+        Key=_object_key("sha", exact_key),
+        Body=json.dumps(menu_data),
+        ContentType="application/json",
+    )
@@ -0,0 +1,66 @@
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connections kept per host. Enough for the thread pools that fan out
+# synchronous requests; the images fan-out uses lib.image_engine instead.
+POOL_MAXSIZE = 10
+
+# Number of hosts to keep pools for (SerpAPI, OpenAI, Google redirects, image hosts)
+POOL_CONNECTIONS = 20
+
+# (connect, read) seconds, used when a call doesn't pass its own timeout
+DEFAULT_TIMEOUT = (3.05, 15)
+
+# Only idempotent requests are retried; the statuses are the transient ones
+RETRY = Retry(
+    total=2,
+    connect=2,
+    read=1,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+class PooledSession(requests.Session):
+    """requests.Session with a default timeout on every request."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+_session: Optional[PooledSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Shared keep-alive session for outbound HTTP calls.
+
+    Created once per container, so warm invocations reuse open TCP/TLS
+    connections. At most POOL_MAXSIZE connections are opened per host;
+    extra threads wait for one to free up. Thread-safe for the way we use
+    it (no per-request cookies or auth on the session).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = PooledSession()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    pool_block=True,
+                    max_retries=RETRY,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
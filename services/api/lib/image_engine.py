@@ -0,0 +1,485 @@
+import asyncio
+import math
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from lib import async_http, image_verify, semantic_cache
+from lib.dynamo import get_cached_images_batch, cache_images_batch
+from lib.image_search import (
+    LEASE_POLL_SECONDS, LEASE_SECONDS, SERPAPI_URL, claim_searches, get_dish_hash, parse_image_results,
+    release_searches, search_params,
+)
+from lib.secrets import get_serpapi_key
+
+# SerpAPI requests in flight: start here, never go outside the bounds
+INITIAL_CONCURRENCY = int(os.environ.get("IMAGE_SEARCH_CONCURRENCY", "8"))
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.environ.get("IMAGE_SEARCH_MAX_CONCURRENCY", "32"))
+
+# Whole-menu budget. Dishes still searching when it runs out are cancelled
+# and get no images (and nothing is cached for them), so the handler
+# finishes well inside the 60s Lambda timeout.
+DEADLINE_SECONDS = float(os.environ.get("IMAGE_SEARCH_DEADLINE_SECONDS", "40"))
+
+REQUEST_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 0.5
+
+# Concurrent failures usually share one cause; halve the limit once per window
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+# With on_progress, results so far are reported at most this often
+PROGRESS_INTERVAL_SECONDS = float(os.environ.get("IMAGE_PROGRESS_INTERVAL_SECONDS", "1.0"))
+
+# Search leases last until the deadline plus this, for the last cache write
+LEASE_MARGIN_SECONDS = 5
+
+# Fresh results are cached in small batches this often, not all at the end,
+# so runs waiting on our search leases (lib.image_search) get them early
+CACHE_WRITE_INTERVAL_SECONDS = LEASE_POLL_SECONDS
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to the upstream (AIMD, as in TCP
+    congestion control): every success raises the limit by 1/limit, so
+    about one more slot per round of requests; a 429 or timeout halves it.
+    A Retry-After pauses new requests until it passes.
+
+    Single event loop only; not thread-safe.
+    """
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, minimum: int = MIN_CONCURRENCY,
+                 maximum: int = MAX_CONCURRENCY):
+        self.limit = float(max(minimum, min(maximum, initial)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.throttles = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: List[asyncio.Future] = []
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    def release(self, outcome: str, retry_after: Optional[float] = None):
+        """Free a slot. outcome is "ok", "throttled" (429/timeout) or "error" (no change)."""
+        self.in_flight -= 1
+        now = time.monotonic()
+
+        if outcome == "ok":
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+        elif outcome == "throttled":
+            self.throttles += 1
+            if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+        # Wake everyone; each re-checks the (possibly lower) limit
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _search_dish(client: httpx.AsyncClient, limiter: AdaptiveLimiter, dish_name: str,
+                       num_results: int, api_key: str, deadline: float, stats: dict) -> Optional[List[str]]:
+    """
+    Images for one dish from SerpAPI, with retries inside the deadline.
+
+    Returns None if the search failed (as opposed to finding nothing).
+    """
+    params = search_params(dish_name, api_key, num_results)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.acquire()
+        outcome, retry_after, data = "error", None, None
+        try:
+            stats["requests"] += 1
+            response = await client.get(SERPAPI_URL, params=params)
+            if response.status_code == 429:
+                outcome, retry_after = "throttled", _retry_after(response)
+            elif response.status_code < 500:
+                response.raise_for_status()
+                outcome, data = "ok", response.json()
+        except httpx.TimeoutException:
+            outcome = "throttled"
+        except httpx.HTTPError as e:
+            print(f"SerpAPI error for '{dish_name}': {e}")
+            return None
+        finally:
+            limiter.release(outcome, retry_after)
+
+        if data is not None:
+            images = parse_image_results(data, params["num"])
+            if not images:
+                print(f"No images found for '{dish_name}'")
+            return images
+
+        delay = retry_after or RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+        if attempt == MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+            break
+        await asyncio.sleep(delay)
+
+    print(f"Giving up on images for '{dish_name}' after {attempt} attempts")
+    return None
+
+
+class _Throttled:
+    """
+    Calls a (blocking) callback in a worker thread with a snapshot of the
+    results so far whenever something new is ready, at most every interval
+    seconds, so a burst of completions is one call.
+    """
+
+    def __init__(self, name: str, callback: Callable[[dict], None], snapshot: Callable[[], dict],
+                 interval: float, flush_on_stop: bool = False):
+        self._name = name
+        self._callback = callback
+        self._snapshot = snapshot
+        self._interval = interval
+        self._flush_on_stop = flush_on_stop
+        self._changed = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def changed(self):
+        self._changed.set()
+
+    async def stop(self):
+        """
+        Stop; waits for a call in progress. Pending changes are dropped (the
+        caller has the final results) unless flush_on_stop, then they get
+        one last call.
+        """
+        self._stopped.set()
+        self._changed.set()
+        await self._task
+
+    async def _call(self):
+        try:
+            await asyncio.to_thread(self._callback, self._snapshot())
+        except Exception as e:
+            print(f"{self._name} failed: {e}")
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            if self._stopped.is_set():
+                break
+            await self._call()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self._interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+        if self._flush_on_stop:
+            await self._call()
+
+
+def _lease_seconds(deadline: float) -> int:
+    """
+    Search lease length for dishes to be searched before the deadline.
+    They may wait behind the limiter until then, so a shorter lease would
+    let concurrent runs take them over and search them twice.
+    """
+    return max(LEASE_SECONDS, math.ceil(deadline - time.monotonic()) + LEASE_MARGIN_SECONDS)
+
+
+async def _search_missing(names: List[str], num_results: int, deadline: float,
+                          on_result: Optional[Callable[[str, Optional[List[str]]], None]] = None
+                          ) -> Dict[str, Optional[List[str]]]:
+    """
+    SerpAPI results for dishes that weren't cached: None for failed
+    searches, nothing for dishes cancelled at the deadline. on_result is
+    called with each dish's result as soon as it's in.
+    """
+    start = time.monotonic()
+    limiter = AdaptiveLimiter()
+    stats = {"requests": 0}
+
+    try:
+        api_key = await asyncio.to_thread(get_serpapi_key)
+    except Exception as e:
+        print(f"No SerpAPI key, serving cached images only: {e}")
+        return {}
+
+    limits = httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY)
+    client = async_http.get_client("serpapi", timeout=REQUEST_TIMEOUT, limits=limits)
+    tasks = {
+        asyncio.create_task(_search_dish(client, limiter, name, num_results, api_key, deadline, stats)): name
+        for name in names
+    }
+    if on_result:
+        for task, name in tasks.items():
+            task.add_done_callback(
+                lambda task, name=name: on_result(name, task.result())
+                if not task.cancelled() and task.exception() is None else None
+            )
+    done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+
+    # Stragglers past the deadline are cancelled rather than awaited
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for task in done:
+        if task.exception() is None:
+            results[tasks[task]] = task.result()
+        else:
+            print(f"Error fetching images for {tasks[task]}: {task.exception()}")
+
+    print(f"Image search: {len(names)} dishes in {time.monotonic() - start:.1f}s, "
+          f"{stats['requests']} requests, {limiter.throttles} throttled, "
+          f"{len(pending)} cancelled at deadline, concurrency peak {limiter.peak_limit:.1f} "
+          f"final {limiter.limit:.1f}")
+    return results
+
+
+async def _await_leaders(held: Dict[str, str], expiry: Dict[str, int], num_results: int, deadline: float,
+                         on_result: Callable[[str, Optional[List[str]]], None],
+                         on_found: Callable[[str, List[str]], None]) -> Dict[str, Optional[List[str]]]:
+    """
+    Results for dishes ({dish_hash: name}) other runs are searching: the
+    cache is polled until each shows up (passed to on_found). A dish whose
+    lease expires first is leased again and searched here; those results
+    are returned, as from _search_missing.
+    """
+    pending = dict(held)
+    expiry = dict(expiry)
+    takeovers = []
+    while pending and time.monotonic() < deadline:
+        await asyncio.sleep(LEASE_POLL_SECONDS)
+        try:
+            found = await asyncio.to_thread(get_cached_images_batch, list(pending))
+        except Exception as e:
+            print(f"Image cache poll failed: {e}")
+            found = {}
+        for dish_hash, images in found.items():
+            on_found(pending.pop(dish_hash), images)
+
+        expired = [dish_hash for dish_hash in pending if time.time() >= expiry[dish_hash]]
+        if expired:
+            ours, still_held = await asyncio.to_thread(claim_searches, expired, _lease_seconds(deadline))
+            expiry.update(still_held)
+            if ours:
+                print(f"Image search: taking over {len(ours)} dishes whose leases expired")
+                names = [pending.pop(dish_hash) for dish_hash in ours]
+                takeovers.append(asyncio.create_task(_search_missing(names, num_results, deadline, on_result)))
+
+    results = {}
+    for taken in await asyncio.gather(*takeovers):
+        results.update(taken)
+    if pending:
+        print(f"Image search: {len(pending)} dishes searched elsewhere not ready at deadline")
+    return results
+
+
+async def _search_all(dish_names: List[str], num_results: int, deadline_seconds: float,
+                      on_progress: Optional[Callable[[Dict[str, List[str]]], None]] = None,
+                      max_searches: Optional[int] = None) -> Dict[str, List[str]]:
+    deadline = time.monotonic() + deadline_seconds
+    names = list(dict.fromkeys(dish_names))
+    hashes = {name: get_dish_hash(name) for name in names}
+
+    # All cache hits for the menu in one or two BatchGetItem calls
+    try:
+        cached = await asyncio.to_thread(get_cached_images_batch, list(hashes.values()))
+    except Exception as e:
+        print(f"Image cache lookup failed, searching everything: {e}")
+        cached = {}
+
+    results = {}
+    missing = {}
+    for name in names:
+        images = cached.get(hashes[name])
+        if images is not None:
+            # May be empty: a negative entry, known to have no results
+            results[hashes[name]] = images
+        else:
+            # Names that canonicalize the same are searched once
+            missing.setdefault(hashes[name], name)
+    hits = sum(1 for name in names if hashes[name] in results)
+    negative = sum(1 for name in names if hashes[name] in results and not results[hashes[name]])
+    print(f"Image cache: {hits}/{len(names)} dishes cached ({negative} negative)")
+
+    # Cached results are trimmed to num_results; fresh ones keep the extras
+    fresh_hashes = set()
+
+    def by_name():
+        return {
+            name: results[hashes[name]] if hashes[name] in fresh_hashes else results[hashes[name]][:num_results]
+            for name in names if hashes[name] in results
+        }
+
+    # Cache hits are reported straight away, searches as they finish
+    reporter = (_Throttled("Image progress callback", on_progress, by_name, PROGRESS_INTERVAL_SECONDS)
+                if on_progress else None)
+    if reporter and results:
+        reporter.changed()
+
+    # Near-synonyms of dishes already cached (optional, see lib.semantic_cache).
+    # Hits are not cached under their own key: a wrong neighbour would become
+    # an exact hit for 30 days, beyond the reach of the threshold.
+    similar, vectors = {}, {}
+    if missing and semantic_cache.enabled():
+        try:
+            similar, vectors = await asyncio.to_thread(semantic_cache.find_cached_images, list(missing.values()))
+        except Exception as e:
+            print(f"Semantic image cache lookup failed: {e}")
+        for name, images in similar.items():
+            results[hashes[name]] = images
+            del missing[hashes[name]]
+        if reporter and similar:
+            reporter.changed()
+
+    # Misses past the cap are left for later. Names come in priority order,
+    # so it's the tail that goes; searches also start in that order.
+    deferred = set()
+    if max_searches is not None and len(missing) > max_searches:
+        deferred = set(list(missing)[max_searches:])
+        for dish_hash in deferred:
+            del missing[dish_hash]
+        print(f"Image search: {len(deferred)} dishes deferred, over the cap of {max_searches} searches")
+
+    # Cache all fetched results as returned (verification is cached per
+    # URL instead), empty results and failed searches included
+    unsaved = {}
+
+    def take_unsaved():
+        taken = dict(unsaved)
+        unsaved.clear()
+        return taken
+
+    def save(images_by_hash):
+        found = {dish_hash: images for dish_hash, images in images_by_hash.items() if images is not None}
+        failed = [dish_hash for dish_hash, images in images_by_hash.items() if images is None]
+        cache_images_batch(found, failed)
+
+    writer = _Throttled("Image cache write", save, take_unsaved, CACHE_WRITE_INTERVAL_SECONDS, flush_on_stop=True)
+
+    def on_found(name, images):
+        results[hashes[name]] = images
+        fresh_hashes.add(hashes[name])
+        if reporter:
+            reporter.changed()
+
+    def on_result(name, images):
+        if hashes[name] in fresh_hashes:
+            return
+        on_found(name, images or [])
+        unsaved[hashes[name]] = images
+        writer.changed()
+
+    # Only dishes we lease are searched here; the rest are being searched
+    # by concurrent runs of the same dishes, and we wait for their results
+    fresh = {}
+    if missing:
+        try:
+            ours, held = await asyncio.to_thread(claim_searches, list(missing), _lease_seconds(deadline))
+        except Exception as e:
+            print(f"Search leases failed, searching everything: {e}")
+            ours, held = list(missing), {}
+
+        searching = [_await_leaders({dish_hash: missing[dish_hash] for dish_hash in held}, held, num_results,
+                                    deadline, on_result, on_found)]
+        if ours:
+            searching.append(_search_missing([missing[dish_hash] for dish_hash in ours], num_results, deadline,
+                                             on_result))
+        for searched in await asyncio.gather(*searching):
+            fresh.update(searched)
+        for name, images in fresh.items():
+            on_result(name, images)
+
+        # Leases on dishes we didn't finish (deadline, no SerpAPI key) would
+        # hold up other runs until they expire. Releasing is conditional on
+        # the owner, so other runs' leases are left alone.
+        unfinished = [dish_hash for dish_hash in missing if dish_hash not in fresh_hashes]
+        if unfinished:
+            await asyncio.to_thread(release_searches, unfinished)
+
+    await writer.stop()
+    if reporter:
+        await reporter.stop()
+
+    # Index dishes that found images, so their near-synonyms can reuse them.
+    # Runs alongside verification rather than before it.
+    indexed = {hashes[name]: (name, vectors[name]) for name, images in fresh.items() if images and name in vectors}
+    indexing = asyncio.create_task(asyncio.to_thread(semantic_cache.remember, indexed)) if indexed else None
+
+    # Probe the candidates and put the ones likely to load fast first. Has
+    # its own time budget after the search deadline, inside the Lambda timeout.
+    results = await image_verify.verify(results)
+
+    if indexing:
+        try:
+            await indexing
+        except Exception as e:
+            print(f"Failed to update semantic image cache: {e}")
+
+    ready = by_name()
+    return {name: ready.get(name, []) for name in names if hashes[name] not in deferred}
+
+
+def search_dishes(dish_names: List[str], num_results: int = 5,
+                  deadline_seconds: float = DEADLINE_SECONDS,
+                  on_progress: Optional[Callable[[Dict[str, List[str]]], None]] = None,
+                  max_searches: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Search images for many dishes at once.
+
+    Cache hits for the whole menu are read in bulk first, then (if enabled)
+    near-synonyms from lib.semantic_cache; only the misses are searched.
+    Searches run on one event loop under an AdaptiveLimiter, so concurrency
+    ramps up while SerpAPI keeps up and backs off on 429s and timeouts.
+    Anything unfinished at the deadline is cancelled and gets no images.
+    Each miss is searched by one run at a time (search leases, see
+    lib.image_search): dishes a concurrent run is already searching are
+    polled for in the cache instead, and searched here only if its lease
+    expires. New results are cached in small batches as they come in, and
+    every dish's list is then verified and ranked by lib.image_verify
+    (broken URLs dropped).
+
+    With on_progress, it's called (from a worker thread) with {dish name:
+    images} for every dish ready so far: cache hits right away, then again
+    as searches finish, at most every PROGRESS_INTERVAL_SECONDS. Those lists
+    aren't verified yet; the return value is the final word.
+
+    dish_names are searched in the order given. With max_searches, misses
+    past the first max_searches aren't searched at all and are left out of
+    the result (unlike dishes that found nothing or ran out of time).
+
+    Returns:
+        Dictionary mapping each dish name to its image URLs (cached results
+        are trimmed to num_results; fresh ones include the extras)
+    """
+    return async_http.run(_search_all(dish_names, num_results, deadline_seconds, on_progress, max_searches))
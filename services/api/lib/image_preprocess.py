@@ -0,0 +1,104 @@
+import io
+import os
+from typing import Tuple
+
+from PIL import Image, ImageChops, ImageOps
+
+# GPT-4o "high" detail fits the image in 2048x2048, then scales the short side
+# down to 768px. Anything larger is thrown away on OpenAI's side.
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+
+# Pixels closer than this to the border colour count as background when cropping
+BORDER_THRESHOLD = 24
+
+# Don't crop if the detected content is smaller than this fraction of the image;
+# that usually means the "border" detection picked up the menu itself.
+MIN_CROP_AREA = 0.3
+
+
+def _target_size(width: int, height: int) -> Tuple[int, int]:
+    """Size the vision model will actually look at for a width x height image."""
+    scale = min(1.0, MAX_LONG_SIDE / max(width, height))
+    scale = min(scale, MAX_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _content_box(img: Image.Image) -> Tuple[int, int, int, int]:
+    """
+    Bounding box of the image without uniform borders (scanner margins,
+    letterboxing, a plain tabletop).
+
+    Detection runs on a small copy so it doesn't allocate full-size masks.
+    """
+    full_box = (0, 0, img.width, img.height)
+    factor = max(1, min(img.size) // 256)
+    small = img.reduce(factor).convert("L") if factor > 1 else img.convert("L")
+
+    background = Image.new("L", small.size, small.getpixel((0, 0)))
+    diff = ImageChops.difference(small, background)
+    mask = diff.point(lambda p: 255 if p > BORDER_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return full_box
+
+    left, top, right, bottom = bbox
+    if (right - left) * (bottom - top) < MIN_CROP_AREA * small.width * small.height:
+        return full_box
+
+    return (
+        left * factor,
+        top * factor,
+        min(img.width, right * factor),
+        min(img.height, bottom * factor),
+    )
+
+
+def preprocess_image(image_bytes: bytes, content_type: str = None) -> Tuple[bytes, str]:
+    """
+    Prepare an uploaded menu photo for a vision request.
+
+    Decodes the upload (letting the JPEG decoder downscale while decoding, which
+    keeps memory low for 12MP photos), applies the EXIF orientation, crops
+    uniform borders, resizes to the resolution the model uses and re-encodes
+    it as JPEG (or EXTRACT_IMAGE_FORMAT).
+
+    Falls back to the original bytes if the image can't be decoded or the
+    re-encoded version isn't smaller.
+
+    Returns:
+        Tuple of (image_bytes, content_type)
+    """
+    output_format = os.environ.get("EXTRACT_IMAGE_FORMAT", "JPEG").upper()
+    quality = int(os.environ.get("EXTRACT_IMAGE_QUALITY", "80"))
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # draft() only ever scales down by powers of two, and only to a size
+            # that's still at least as large as requested
+            img.draft("RGB", _target_size(*img.size))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+            # Crop and resize in one pass, without an intermediate cropped copy
+            box = _content_box(img)
+            size = _target_size(box[2] - box[0], box[3] - box[1])
+            if size != img.size:
+                img = img.resize(size, Image.LANCZOS, box=box)
+
+            buffer = io.BytesIO()
+            if output_format == "WEBP":
+                img.save(buffer, format="WEBP", quality=quality, method=4)
+                out_type = "image/webp"
+            else:
+                img.save(buffer, format="JPEG", quality=quality, optimize=True)
+                out_type = "image/jpeg"
+    except Exception as e:
+        print(f"Image preprocessing failed, sending original: {e}")
+        return image_bytes, content_type or "image/jpeg"
+
+    processed = buffer.getvalue()
+    if len(processed) >= len(image_bytes):
+        return image_bytes, content_type or "image/jpeg"
+    return processed, out_type
@@ -1,12 +1,32 @@
 import hashlib
+import os
+import time
+import uuid
 import requests
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
+from lib import semantic_cache
+from lib.http import get_session
 from lib.secrets import get_serpapi_key
-from lib.dynamo import get_cached_images, cache_images
+from lib.dynamo import get_cached_images, cache_images, cache_search_failure, acquire_lease, release_lease
+from lib.dish_names import canonical_dish_name
 
 SERPAPI_URL = "https://serpapi.com/search"
 
+# Single flight across invocations: a dish missing from the cache is
+# searched by whichever run leases it first, and concurrent runs of the
+# same menu wait for that result instead of spending their own searches.
+# Long enough for a search with retries; if the holder dies, the lease
+# expires and a waiter searches instead. The minimum: lib.image_engine
+# leases a whole menu's misses until its search deadline.
+LEASE_SECONDS = int(os.environ.get("IMAGE_SEARCH_LEASE_SECONDS", "30"))
+LEASE_POLL_SECONDS = 0.5
+LEASE_WORKERS = 16
+
+# Whose lease it is: one owner per container
+LEASE_OWNER = uuid.uuid4().hex
+
 # Domains to skip - blocked by tracking prevention or unreliable
 BLOCKED_DOMAINS = [
     "wp.com",           # WordPress CDN - blocked by Safari/Firefox tracking prevention
@@ -26,9 +46,14 @@ def is_blocked_domain(url: str) -> bool:
 
 
 def get_dish_hash(dish_name: str) -> str:
-    """Generate a hash for a dish name for caching."""
-    normalized = dish_name.lower().strip()
-    return hashlib.md5(normalized.encode()).hexdigest()
+    """
+    Generate a hash for a dish name for caching.
+
+    Keyed on the canonical name, so "Pizza Margherita" and
+    'Margherita pizza (12")' share an entry. Searches still use the name
+    as written on the menu.
+    """
+    return hashlib.md5(canonical_dish_name(dish_name).encode()).hexdigest()
 
 
 def search_dish_images(dish_name: str, num_results: int = 5) -> List[str]:
@@ -45,50 +70,131 @@ def search_dish_images(dish_name: str, num_results: int = 5) -> List[str]:
     # Check cache first
     dish_hash = get_dish_hash(dish_name)
     cached = get_cached_images(dish_hash)
-    if cached:
+    if cached is not None:
+        # May be empty: a negative entry for a dish with no results
         return cached[:num_results]
 
-    # Search Google Images via SerpAPI - request extra in case some fail
-    api_key = get_serpapi_key()
-    fetch_count = num_results * 3  # Get 3x to account for broken links
+    # A near-synonym's images, if the semantic tier is on
+    vectors = {}
+    if semantic_cache.enabled():
+        try:
+            similar, vectors = semantic_cache.find_cached_images([dish_name])
+            if dish_name in similar:
+                cache_images(dish_hash, similar[dish_name])
+                return similar[dish_name][:num_results]
+        except Exception as e:
+            print(f"Semantic image cache lookup failed: {e}")
+
+    # Another run is searching this dish already: use its result
+    _, held = claim_searches([dish_hash])
+    if dish_hash in held:
+        images = wait_for_search(dish_hash, held[dish_hash])
+        if images is not None:
+            return images[:num_results]
 
-    params = {
-        "engine": "google_images",
-        "q": f"{dish_name} food",
-        "api_key": api_key,
-        "num": fetch_count,
-    }
+    # Search Google Images via SerpAPI - request extra in case some fail
+    params = search_params(dish_name, get_serpapi_key(), num_results)
 
     try:
-        response = requests.get(SERPAPI_URL, params=params, timeout=15)
+        response = get_session().get(SERPAPI_URL, params=params, timeout=15)
         response.raise_for_status()
-        data = response.json()
-
-        images = []
-        for item in data.get("images_results", []):
-            if len(images) >= fetch_count:
-                break
-            # Use original high-quality images
-            image_url = item.get("original")
-            if image_url and not is_blocked_domain(image_url):
-                images.append(image_url)
+        images = parse_image_results(response.json(), params["num"])
 
         if not images:
             print(f"No images found for '{dish_name}'")
-            return []
 
-        # Cache all fetched results (frontend will filter broken ones)
+        # Cache all fetched results (frontend will filter broken ones),
+        # including no results at all
         cache_images(dish_hash, images)
+        if images and dish_name in vectors:
+            semantic_cache.remember({dish_hash: (dish_name, vectors[dish_name])})
         return images
 
     except requests.RequestException as e:
         print(f"SerpAPI error: {e}")
+        cache_search_failure(dish_hash)
         return []
 
 
+def claim_searches(dish_hashes: List[str], lease_seconds: int = LEASE_SECONDS) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Lease the searches for dishes that missed the cache, for lease_seconds.
+
+    Returns (hashes to search here, {hash: lease expiry} for the dishes
+    another invocation is searching right now). A lease that can't be
+    written counts as ours: a duplicate search beats none.
+    """
+    def claim(dish_hash):
+        try:
+            return acquire_lease(dish_hash, LEASE_OWNER, lease_seconds)
+        except Exception as e:
+            print(f"Search lease failed for {dish_hash}: {e}")
+            return True, 0
+
+    if not dish_hashes:
+        return [], {}
+    with ThreadPoolExecutor(max_workers=min(LEASE_WORKERS, len(dish_hashes))) as executor:
+        outcomes = dict(zip(dish_hashes, executor.map(claim, dish_hashes)))
+
+    ours = [dish_hash for dish_hash, (acquired, _) in outcomes.items() if acquired]
+    held = {dish_hash: expires for dish_hash, (acquired, expires) in outcomes.items() if not acquired}
+    if held:
+        print(f"Image search: {len(held)}/{len(outcomes)} dishes already being searched elsewhere")
+    return ours, held
+
+
+def release_searches(dish_hashes: List[str]):
+    """Give back leases on dishes that weren't searched after all, so waiting runs take over at once."""
+    def release(dish_hash):
+        try:
+            release_lease(dish_hash, LEASE_OWNER)
+        except Exception as e:
+            print(f"Search lease release failed for {dish_hash}: {e}")
+
+    if dish_hashes:
+        with ThreadPoolExecutor(max_workers=min(LEASE_WORKERS, len(dish_hashes))) as executor:
+            list(executor.map(release, dish_hashes))
+
+
+def wait_for_search(dish_hash: str, expires_at: int) -> Optional[List[str]]:
+    """
+    The result of a search leased by another run, polling the cache until
+    its lease expires. None if it never showed up (the caller searches).
+    """
+    while time.time() < expires_at:
+        time.sleep(LEASE_POLL_SECONDS)
+        cached = get_cached_images(dish_hash)
+        if cached is not None:
+            return cached
+    return None
+
+
+def search_params(dish_name: str, api_key: str, num_results: int) -> dict:
+    """SerpAPI Google Images query for a dish, asking for 3x num_results to account for broken links."""
+    return {
+        "engine": "google_images",
+        "q": f"{dish_name} food",
+        "api_key": api_key,
+        "num": num_results * 3,
+    }
+
+
+def parse_image_results(data: dict, limit: int) -> List[str]:
+    """Original image URLs from a SerpAPI response, in Google's order, skipping blocked domains."""
+    images = []
+    for item in data.get("images_results", []):
+        if len(images) >= limit:
+            break
+        # Use original high-quality images
+        image_url = item.get("original")
+        if image_url and not is_blocked_domain(image_url):
+            images.append(image_url)
+    return images
+
+
 def search_multiple_dishes(dishes: List[str], num_results_per_dish: int = 1) -> dict:
     """
-    Search for images of multiple dishes.
+    Search for images of multiple dishes, concurrently (see lib.image_engine).
 
     Args:
         dishes: List of dish names
@@ -97,10 +203,6 @@ def search_multiple_dishes(dishes: List[str], num_results_per_dish: int = 1) ->
     Returns:
         Dictionary mapping dish names to lists of image URLs
     """
-    results = {}
-
-    for dish_name in dishes:
-        images = search_dish_images(dish_name, num_results_per_dish)
-        results[dish_name] = images
+    from lib.image_engine import search_dishes
 
-    return results
+    return search_dishes(dishes, num_results=num_results_per_dish)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from lib import async_http
+from lib.dynamo import get_url_checks_batch, cache_url_checks
+
+# On by default; IMAGE_VERIFY=0 returns search results unchecked
+ENABLED = os.environ.get("IMAGE_VERIFY", "1") == "1"
+
+# Probes go to many different hosts, so a fixed limit is enough
+CONCURRENCY = int(os.environ.get("IMAGE_VERIFY_CONCURRENCY", "32"))
+
+# Time allowed for probing per run. URLs not checked by then keep their
+# place after the verified ones and are probed on a later run.
+BUDGET_SECONDS = float(os.environ.get("IMAGE_VERIFY_BUDGET_SECONDS", "8"))
+
+# Tight: an image that takes longer than this to answer is a bad first choice on a phone
+PROBE_TIMEOUT = httpx.Timeout(3.0, connect=1.5)
+
+# Responses that say the host is busy, not that the image is gone
+INCONCLUSIVE_STATUSES = {408, 429}
+
+# Live images slower or bigger than these go after the fast, small ones
+SLOW_MS = 800
+LARGE_BYTES = 2_000_000
+
+# Look like the browser loading the image from our site, so hotlink
+# protection (Referer checks) and bot blocking show up here, not on phones
+HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+                   "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1"),
+    "Accept": "image/avif,image/webp,image/png,image/*;q=0.8,*/*;q=0.5",
+    "Referer": os.environ.get("FRONTEND_URL", "http://localhost:3000").rstrip("/") + "/",
+}
+
+
+def _size(response: httpx.Response) -> Optional[int]:
+    # "bytes 0-0/48213" on a ranged GET, else Content-Length
+    total = response.headers.get("content-range", "").rpartition("/")[2]
+    if total.isdigit():
+        return int(total)
+    length = response.headers.get("content-length", "")
+    return int(length) if length.isdigit() and response.status_code != 206 else None
+
+
+async def _probe(client: httpx.AsyncClient, url: str) -> Optional[dict]:
+    """
+    Check one image URL: HEAD, falling back to a one-byte ranged GET when
+    HEAD is refused or inconclusive (plenty of hosts only answer GET).
+
+    Returns a check: ok (2xx/3xx with an image content type), status,
+    content_type, bytes and latency_ms. Returns None if the probe was
+    inconclusive (timeout, connection error, 408/429): a slow moment
+    on a host says nothing about the image, so it stays unchecked.
+    """
+    start = time.monotonic()
+    try:
+        response = await client.head(url)
+        if response.status_code >= 400 or not response.headers.get("content-type", "").startswith("image/"):
+            async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                pass
+    except httpx.HTTPError:
+        return None
+    if response.status_code in INCONCLUSIVE_STATUSES:
+        return None
+
+    status = response.status_code
+    content_type = response.headers.get("content-type", "").split(";")[0].strip() or None
+    return {
+        "ok": status < 400 and (content_type or "").startswith("image/"),
+        "status": status,
+        "content_type": content_type,
+        "bytes": _size(response),
+        "latency_ms": int((time.monotonic() - start) * 1000),
+    }
+
+
+async def _probe_all(urls: List[str], deadline: float) -> Dict[str, dict]:
+    """Checks for the URLs probed conclusively before the deadline; the rest are left out."""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def probe(client, url):
+        async with semaphore:
+            return await _probe(client, url)
+
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    client = async_http.get_client("image_probes", timeout=PROBE_TIMEOUT, limits=limits, headers=HEADERS,
+                                   follow_redirects=True)
+    tasks = {asyncio.create_task(probe(client, url)): url for url in urls}
+    done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    return {tasks[task]: task.result() for task in done
+            if task.exception() is None and task.result() is not None}
+
+
+def rank(images: List[str], checks: Dict[str, dict]) -> List[str]:
+    """
+    Order a dish's images so the first is very likely to load fast: live
+    ones first (fast and small before slow or large, otherwise Google's
+    order), then unchecked ones. Broken ones are dropped.
+    """
+    live = [url for url in images if checks.get(url, {}).get("ok")]
+    live.sort(key=lambda url: (checks[url].get("latency_ms", 0) > SLOW_MS,
+                               (checks[url].get("bytes") or 0) > LARGE_BYTES))
+    unchecked = [url for url in images if url not in checks]
+    return live + unchecked
+
+
+async def verify(images_by_key: Dict[str, List[str]], deadline: Optional[float] = None) -> Dict[str, List[str]]:
+    """
+    Verify and rank the image lists of many dishes.
+
+    Checks are cached per URL (lib.dynamo.cache_url_checks), so a popular
+    image is probed once per TTL, not once per run; only new URLs are
+    probed, concurrently, within BUDGET_SECONDS (or the deadline, if
+    sooner). Returns the lists reordered and pruned by rank().
+    """
+    if not ENABLED:
+        return images_by_key
+
+    start = time.monotonic()
+    budget_end = start + BUDGET_SECONDS
+    deadline = min(deadline, budget_end) if deadline else budget_end
+    urls = list(dict.fromkeys(url for images in images_by_key.values() for url in images))
+    if not urls:
+        return images_by_key
+
+    try:
+        checks = await asyncio.to_thread(get_url_checks_batch, urls)
+    except Exception as e:
+        print(f"Image URL check lookup failed: {e}")
+        checks = {}
+
+    unchecked = [url for url in urls if url not in checks]
+    probed = await _probe_all(unchecked, deadline) if unchecked else {}
+    checks.update(probed)
+
+    if probed:
+        try:
+            await asyncio.to_thread(cache_url_checks, probed)
+        except Exception as e:
+            print(f"Failed to cache image URL checks: {e}")
+
+    ranked = {key: rank(images, checks) for key, images in images_by_key.items()}
+    broken = sum(1 for url in urls if url in checks and not checks[url]["ok"])
+    print(f"Image verify: {len(urls)} URLs, {len(urls) - len(unchecked)} cached checks, {len(probed)} probed, "
+          f"{len(unchecked) - len(probed)} unchecked (deadline or inconclusive), {broken} broken, "
+          f"{time.monotonic() - start:.1f}s")
+    return ranked
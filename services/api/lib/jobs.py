@@ -0,0 +1,189 @@
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from lib import aws
+
+# Attempts before a job is dead-lettered. Must match maxReceiveCount in infra/sqs.tf.
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "4"))
+
+BACKOFF_BASE_SECONDS = 20
+BACKOFF_MAX_SECONDS = 900  # Also the SQS cap for a visibility change via the Lambda integration
+
+
+class RetryableJobError(Exception):
+    """Raised by a job processor when the job should be retried later."""
+
+
+def backoff_seconds(attempt: int) -> int:
+    """Exponential backoff with jitter before attempt + 1."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return int(delay / 2 + random.uniform(0, delay / 2))
+
+
+class SqsJobQueue:
+    """
+    Job queue backed by SQS. Retries and dead-lettering of retryable
+    failures come from the queue's redrive policy; jobs that fail for good
+    are sent to dead_letter_url straight away.
+    """
+
+    def __init__(self, queue_url: str, dead_letter_url: Optional[str] = None):
+        self.queue_url = queue_url
+        self.dead_letter_url = dead_letter_url
+        self.sqs = aws.client("sqs")
+
+    def enqueue(self, job: Dict[str, Any], delay_seconds: int = 0):
+        body = dict(job, enqueued_at=time.time())
+        self.sqs.send_message(
+            QueueUrl=self.queue_url,
+            MessageBody=json.dumps(body),
+            DelaySeconds=delay_seconds,
+        )
+
+    def depth(self) -> int:
+        """Approximate number of jobs waiting (not counting in-flight ones)."""
+        response = self.sqs.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=["ApproximateNumberOfMessages"],
+        )
+        return int(response["Attributes"]["ApproximateNumberOfMessages"])
+
+    def process_batch(self, event: Dict[str, Any], process: Callable[[Dict[str, Any], int], None]) -> Dict[str, Any]:
+        """
+        Process an SQS event delivered by the Lambda event source mapping.
+
+        process(job, attempt) is called for each message. RetryableJobError
+        makes the message visible again after a backoff and reports it as a
+        batch item failure; after MAX_ATTEMPTS receives SQS moves it to the
+        dead-letter queue. Any other exception (or a message that isn't a
+        valid job) is final: the message is dead-lettered right away.
+
+        Returns the partial batch response expected with ReportBatchItemFailures.
+        """
+        failures = []
+
+        try:
+            depth = self.depth()
+        except Exception as e:
+            print(f"Could not read queue depth: {e}")
+            depth = None
+
+        for record in event.get("Records", []):
+            attempt = int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+            job = {}
+            try:
+                parsed = json.loads(record["body"])
+                if not isinstance(parsed, dict):
+                    raise ValueError("Job is not a JSON object")
+                job = parsed
+                wait = time.time() - job.get("enqueued_at", time.time())
+                print(f"Job {job.get('run_id')}: attempt {attempt}/{MAX_ATTEMPTS}, "
+                      f"waited {wait:.1f}s, queue depth {depth}")
+                process(job, attempt)
+            except RetryableJobError as e:
+                failures.append({"itemIdentifier": record["messageId"]})
+                if attempt < MAX_ATTEMPTS:
+                    delay = backoff_seconds(attempt)
+                    print(f"Job {job.get('run_id')} will retry in {delay}s: {e}")
+                    self._delay(record["receiptHandle"], delay)
+                else:
+                    print(f"Job {job.get('run_id')} dead-lettered after {attempt} attempts: {e}")
+                    self._delay(record["receiptHandle"], 0)
+            except Exception as e:
+                # Not worth retrying; the processor has already recorded the failure
+                print(f"Job {job.get('run_id')} failed permanently: {e}")
+                if not self._dead_letter(record, e):
+                    # Left to the redrive policy, which moves it after MAX_ATTEMPTS receives
+                    failures.append({"itemIdentifier": record["messageId"]})
+                    self._delay(record["receiptHandle"], 0)
+
+        return {"batchItemFailures": failures}
+
+    def _dead_letter(self, record: Dict[str, Any], error: Exception) -> bool:
+        """Send a message to the dead-letter queue as is, with the error. Returns whether it was sent."""
+        if not self.dead_letter_url:
+            return False
+        try:
+            self.sqs.send_message(
+                QueueUrl=self.dead_letter_url,
+                MessageBody=record["body"],
+                MessageAttributes={"error": {"DataType": "String", "StringValue": str(error)[:1000] or "error"}},
+            )
+            return True
+        except Exception as e:
+            print(f"Could not dead-letter message {record['messageId']}: {e}")
+            return False
+
+    def _delay(self, receipt_handle: str, seconds: int):
+        try:
+            self.sqs.change_message_visibility(
+                QueueUrl=self.queue_url,
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=seconds,
+            )
+        except Exception as e:
+            print(f"Could not set retry backoff: {e}")
+
+
+class LocalJobQueue:
+    """
+    In-memory stand-in for SqsJobQueue, for tests and local runs.
+
+    Nothing runs until drain() is called; retries happen immediately
+    (backoff delays are ignored) and exhausted or failed jobs land in
+    dead_letters.
+    """
+
+    def __init__(self):
+        self.jobs = deque()
+        self.dead_letters: List[Dict[str, Any]] = []
+
+    def enqueue(self, job: Dict[str, Any], delay_seconds: int = 0):
+        self.jobs.append((dict(job, enqueued_at=time.time()), 1))
+
+    def depth(self) -> int:
+        return len(self.jobs)
+
+    def drain(self, process: Callable[[Dict[str, Any], int], None]):
+        """Process queued jobs one at a time until the queue is empty."""
+        while self.jobs:
+            job, attempt = self.jobs.popleft()
+            try:
+                process(job, attempt)
+            except RetryableJobError:
+                if attempt < MAX_ATTEMPTS:
+                    self.jobs.append((job, attempt + 1))
+                else:
+                    self.dead_letters.append(job)
+            except Exception as e:
+                print(f"Job {job.get('run_id')} failed permanently: {e}")
+                self.dead_letters.append(job)
+
+
+_local_queue: Optional[LocalJobQueue] = None
+
+
+def get_extract_queue():
+    """
+    The extraction job queue: SQS when EXTRACT_QUEUE_URL is set, otherwise
+    in-memory (local runs and tests only).
+
+    Raises:
+        RuntimeError: If running in Lambda without EXTRACT_QUEUE_URL - jobs
+            queued in memory would be lost when the invocation ends
+    """
+    global _local_queue
+
+    queue_url = os.environ.get("EXTRACT_QUEUE_URL")
+    if queue_url:
+        return SqsJobQueue(queue_url, os.environ.get("EXTRACT_DLQ_URL"))
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        raise RuntimeError("EXTRACT_QUEUE_URL is not set")
+
+    if _local_queue is None:
+        _local_queue = LocalJobQueue()
+    return _local_queue
@@ -0,0 +1,92 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from lib.partial_json import parse_partial
+from lib.schemas import load_schema, prune_invalid, validate
+
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+
+@dataclass
+class ParsedJSON:
+    """Result of parsing model output."""
+    value: Any
+    complete: bool  # False if the document was truncated and only a prefix was recovered
+
+
+def strip_fences(text: str) -> str:
+    """Remove markdown code fences and any prose around the JSON document."""
+    text = _FENCE_RE.sub("", text or "")
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text.strip()
+    return text[min(starts):].strip()
+
+
+def strip_continuation(text: str) -> str:
+    """Clean up a continuation of a truncated response before appending it."""
+    return _FENCE_RE.sub("", text or "").strip("\n")
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket, leaving strings alone."""
+    out = []
+    in_string = False
+    escape = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "," and _TRAILING_COMMA_RE.match(text, i):
+            continue
+        out.append(char)
+    return "".join(out)
+
+
+def repair_json(text: str) -> str:
+    """Fix common defects in model JSON: fences, surrounding prose, trailing commas."""
+    return _remove_trailing_commas(strip_fences(text))
+
+
+def parse_llm_json(text: str, schema_name: Optional[str] = None) -> ParsedJSON:
+    """
+    Parse JSON produced by a model, salvaging as much as possible.
+
+    Tries a strict parse, then a repaired parse, then recovers every complete
+    element from a truncated document (see lib.partial_json). With
+    schema_name, the result is checked against packages/shared/schemas:
+    invalid dishes/items are dropped and a document that still doesn't
+    validate raises.
+
+    Raises:
+        ValueError: If nothing usable could be recovered
+    """
+    repaired = repair_json(text)
+    complete = True
+
+    try:
+        # raw_decode ignores anything the model wrote after the document
+        value, _ = json.JSONDecoder().raw_decode(repaired)
+    except json.JSONDecodeError as e:
+        value = parse_partial(repaired)
+        complete = False
+        if value is None:
+            raise ValueError(f"No JSON could be recovered: {e}")
+
+    if schema_name:
+        schema = load_schema(schema_name)
+        value = prune_invalid(value, schema)
+        errors = validate(value, schema)
+        if errors:
+            raise ValueError(f"Result does not match {schema_name} schema: {'; '.join(errors[:3])}")
+
+    return ParsedJSON(value, complete)
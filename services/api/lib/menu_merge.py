@@ -0,0 +1,76 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Normalize a section or dish name for duplicate detection."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKC", name).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _merge_dish(existing: Dict[str, Any], dish: Dict[str, Any]):
+    """Fill gaps in an already-seen dish from a duplicate on another page."""
+    if not existing.get("description") and dish.get("description"):
+        existing["description"] = dish["description"]
+    if existing.get("price") is None and dish.get("price") is not None:
+        existing["price"] = dish["price"]
+
+    dietary = list(existing.get("dietary") or [])
+    for tag in dish.get("dietary") or []:
+        if tag not in dietary:
+            dietary.append(tag)
+    existing["dietary"] = dietary
+
+
+def merge_menus(menus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-page extraction results into a single menu.
+
+    Deterministic for a given page order: sections keep the order in which they
+    first appear, sections with the same name are unioned (a section often
+    continues onto the next page), and dishes are deduplicated by normalized
+    name within a section, filling missing description/price/dietary fields
+    from later duplicates.
+    """
+    restaurant_name = None
+    sections: List[Dict[str, Any]] = []
+    sections_by_name: Dict[str, Dict[str, Any]] = {}
+    dishes_by_section: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    for menu in menus:
+        if not menu:
+            continue
+        if not restaurant_name and menu.get("restaurant_name"):
+            restaurant_name = menu["restaurant_name"]
+
+        for section in menu.get("sections") or []:
+            section_key = normalize_name(section.get("name"))
+            if section_key not in sections_by_name:
+                merged_section = {"name": section.get("name") or "Menu", "dishes": []}
+                sections_by_name[section_key] = merged_section
+                dishes_by_section[section_key] = {}
+                sections.append(merged_section)
+
+            merged_section = sections_by_name[section_key]
+            seen = dishes_by_section[section_key]
+
+            for dish in section.get("dishes") or []:
+                dish_key = normalize_name(dish.get("name"))
+                if not dish_key:
+                    continue
+                if dish_key in seen:
+                    _merge_dish(seen[dish_key], dish)
+                    continue
+                merged_dish = dict(dish)
+                merged_dish["dietary"] = list(dish.get("dietary") or [])
+                seen[dish_key] = merged_dish
+                merged_section["dishes"].append(merged_dish)
+
+    return {
+        "restaurant_name": restaurant_name,
+        "sections": [s for s in sections if s["dishes"]],
+    }
@@ -1,7 +1,23 @@
 import json
+import os
 import base64
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from openai import OpenAI, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
 from lib.secrets import get_openai_api_key
+from lib.menu_merge import merge_menus
+from lib.partial_json import PartialJSONParser
+from lib.llm_json import parse_llm_json, strip_continuation
+
+# Errors worth retrying later (rate limits, timeouts, OpenAI-side failures)
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# Follow-up requests allowed when a response is cut off at max_tokens
+MAX_CONTINUATIONS = 2
+
+CONTINUATION_PROMPT = """Your previous response was cut off. Continue it exactly where it stopped.
+Output ONLY the remaining characters of the JSON document - do not repeat anything, do not start over, no markdown."""
 
 MENU_EXTRACTION_PROMPT = """You are a menu parser. Extract all dishes from this restaurant menu image.
 
@@ -70,23 +86,39 @@ Create an ordering plan. Return JSON:
 Return ONLY valid JSON, no markdown or explanations."""
 
 
-def get_client() -> OpenAI:
-    """Get an OpenAI client."""
-    return OpenAI(api_key=get_openai_api_key())
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
 
 
-def extract_menu_from_images(image_data_list: list[tuple[bytes, str]]) -> dict:
+def get_client() -> OpenAI:
     """
-    Extract menu information from images using GPT-4o vision.
+    Get the shared OpenAI client.
 
-    Args:
-        image_data_list: List of tuples (image_bytes, content_type)
+    Reused across calls and warm invocations so requests share its
+    keep-alive connection pool instead of opening a new TLS connection each
+    time. Replaced if the API key changes.
+    """
+    global _client, _client_key
+    api_key = get_openai_api_key()
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            _client = OpenAI(api_key=api_key)
+            _client_key = api_key
+        return _client
 
-    Returns:
-        Extracted menu data as a dictionary
+
+def _extract_page_group(
+    client: OpenAI,
+    image_data_list: list[tuple[bytes, str]],
+    on_partial: Callable[[dict], None] = None,
+) -> dict:
     """
-    client = get_client()
+    Run one vision extraction request over a group of pages.
 
+    With on_partial, the response is streamed and on_partial is called with
+    the menu parsed so far each time another dish (or section) completes.
+    """
     # Build content list with images
     content = []
 
@@ -107,32 +139,191 @@ def extract_menu_from_images(image_data_list: list[tuple[bytes, str]]) -> dict:
         "text": MENU_EXTRACTION_PROMPT
     })
 
-    response = client.chat.completions.create(
+    messages = [
+        {
+            "role": "user",
+            "content": content
+        }
+    ]
+
+    if on_partial:
+        result_text, finish_reason = _stream_completion(client, messages, on_partial)
+    else:
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            max_tokens=4096,
+            temperature=0.1,
+        )
+
+        # Parse the response
+        result_text = response.choices[0].message.content
+        finish_reason = response.choices[0].finish_reason
+
+    try:
+        return _parse_with_continuation(
+            client, messages, result_text, finish_reason, "menu",
+            max_tokens=4096, temperature=0.1,
+        )
+    except ValueError as e:
+        raise ValueError(f"Failed to parse menu extraction result: {e}")
+
+
+def _parse_with_continuation(
+    client: OpenAI,
+    messages: list,
+    result_text: str,
+    finish_reason: str,
+    schema_name: str,
+    max_tokens: int,
+    temperature: float,
+) -> dict:
+    """
+    Parse a model response, asking the model to finish it if it was truncated.
+
+    Malformed output is repaired and salvaged by lib.llm_json. Only when the
+    response hit max_tokens do we request a continuation, and then only for
+    the missing tail (up to MAX_CONTINUATIONS times). If the document is
+    still incomplete after that, whatever was recovered is returned.
+    """
+    parsed = None
+    error = None
+
+    for attempt in range(MAX_CONTINUATIONS + 1):
+        try:
+            parsed = parse_llm_json(result_text, schema_name)
+            error = None
+        except ValueError as e:
+            error = e
+
+        if parsed and parsed.complete and not error:
+            return parsed.value
+        if finish_reason != "length" or attempt == MAX_CONTINUATIONS:
+            break
+
+        print(f"Response truncated at {len(result_text)} chars, requesting continuation")
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages + [
+                {"role": "assistant", "content": result_text},
+                {"role": "user", "content": CONTINUATION_PROMPT},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        tail = response.choices[0].message.content or ""
+        result_text += strip_continuation(tail)
+        finish_reason = response.choices[0].finish_reason
+
+    if parsed:
+        if not parsed.complete:
+            print("Returning salvaged partial result")
+        return parsed.value
+    raise error
+
+
+def _stream_completion(
+    client: OpenAI,
+    messages: list,
+    on_partial: Callable[[dict], None],
+) -> tuple[str, str]:
+    """
+    Stream an extraction response, reporting partial menus as they complete.
+
+    Returns:
+        Tuple of (full response text, finish_reason)
+    """
+    stream = client.chat.completions.create(
         model="gpt-4o",
-        messages=[
-            {
-                "role": "user",
-                "content": content
-            }
-        ],
+        messages=messages,
         max_tokens=4096,
         temperature=0.1,
+        stream=True,
     )
 
-    # Parse the response
-    result_text = response.choices[0].message.content
+    parser = PartialJSONParser()
+    reported = 0
+    finish_reason = None
+
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+
+        parser.feed(delta)
+        if parser.updates != reported:
+            reported = parser.updates
+            partial = parser.snapshot()
+            if partial:
+                try:
+                    on_partial(partial)
+                except Exception as e:
+                    print(f"Partial menu callback failed: {e}")
+
+    return parser.text, finish_reason
 
-    # Try to extract JSON from the response
-    try:
-        # Handle potential markdown code blocks
-        if "```json" in result_text:
-            result_text = result_text.split("```json")[1].split("```")[0]
-        elif "```" in result_text:
-            result_text = result_text.split("```")[1].split("```")[0]
-
-        return json.loads(result_text.strip())
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Failed to parse menu extraction result: {e}")
+
+def extract_menu_from_images(
+    image_data_list: list[tuple[bytes, str]],
+    pages_per_request: int = None,
+    on_progress: Callable[[dict], None] = None,
+) -> dict:
+    """
+    Extract menu information from images using GPT-4o vision.
+
+    Pages are split into groups of `pages_per_request` and each group is
+    extracted concurrently as its own request, so wall-clock time stays close
+    to a single page and the max_tokens budget applies per group rather than
+    to the whole menu. The per-group results are then merged (see
+    lib.menu_merge).
+
+    Args:
+        image_data_list: List of tuples (image_bytes, content_type)
+        pages_per_request: Pages per request (defaults to
+            EXTRACT_PAGES_PER_REQUEST, or 1)
+        on_progress: Optional callback. When given, responses are streamed
+            and it's called with the merged partial menu every time a dish
+            completes on any page. May be called from worker threads.
+
+    Returns:
+        Extracted menu data as a dictionary
+    """
+    client = get_client()
+
+    if pages_per_request is None:
+        pages_per_request = int(os.environ.get("EXTRACT_PAGES_PER_REQUEST", "1"))
+    pages_per_request = max(1, pages_per_request)
+
+    groups = [
+        image_data_list[i:i + pages_per_request]
+        for i in range(0, len(image_data_list), pages_per_request)
+    ]
+
+    partials = [None] * len(groups)
+    partials_lock = threading.Lock()
+
+    def extract_group(index):
+        on_partial = None
+        if on_progress:
+            def on_partial(partial):
+                with partials_lock:
+                    partials[index] = partial
+                    merged = merge_menus(partials)
+                on_progress(merged)
+
+        return _extract_page_group(client, groups[index], on_partial)
+
+    if len(groups) == 1:
+        return merge_menus([extract_group(0)])
+
+    # Fan out, keeping results in page order so the merge is deterministic
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        page_menus = list(executor.map(extract_group, range(len(groups))))
+
+    return merge_menus(page_menus)
 
 
 def get_recommendations(
@@ -168,27 +359,27 @@ def get_recommendations(
         budget=budget,
     )
 
+    messages = [
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
     response = client.chat.completions.create(
         model="gpt-4o",
-        messages=[
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
+        messages=messages,
         max_tokens=2048,
         temperature=0.7,
     )
 
-    result_text = response.choices[0].message.content
-
     try:
-        # Handle potential markdown code blocks
-        if "```json" in result_text:
-            result_text = result_text.split("```json")[1].split("```")[0]
-        elif "```" in result_text:
-            result_text = result_text.split("```")[1].split("```")[0]
-
-        return json.loads(result_text.strip())
-    except json.JSONDecodeError as e:
+        return _parse_with_continuation(
+            client, messages,
+            response.choices[0].message.content,
+            response.choices[0].finish_reason,
+            "recommendation",
+            max_tokens=2048, temperature=0.7,
+        )
+    except ValueError as e:
         raise ValueError(f"Failed to parse recommendation result: {e}")
@@ -0,0 +1,50 @@
+import os
+import resource
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+from lib import aws
+from lib.extraction_cache import page_digest
+from lib.image_preprocess import preprocess_image
+
+# Pages downloaded/decoded at once. Bounds how many raw uploads are in memory.
+LOAD_CONCURRENCY = int(os.environ.get("EXTRACT_LOAD_CONCURRENCY", "4"))
+
+
+@dataclass
+class LoadedPage:
+    """A menu page ready for extraction. The raw upload is not kept."""
+    image_bytes: bytes
+    content_type: str
+    digest: str
+
+
+def _load_page(bucket: str, key: str) -> LoadedPage:
+    response = aws.client("s3").get_object(Bucket=bucket, Key=key)
+    raw = response["Body"].read()
+    content_type = response.get("ContentType", "image/jpeg")
+
+    # Hash the original bytes (cache keys must match the S3 ETag), then let the
+    # raw upload go out of scope as soon as the compact version exists
+    digest = page_digest(raw)
+    image_bytes, content_type = preprocess_image(raw, content_type)
+
+    return LoadedPage(image_bytes, content_type, digest)
+
+
+def load_pages(bucket: str, keys: List[str]) -> List[LoadedPage]:
+    """
+    Download and preprocess menu pages concurrently, in key order.
+
+    At most LOAD_CONCURRENCY raw uploads are held at once; only the
+    downscaled version of each page is returned.
+    """
+    workers = max(1, min(LOAD_CONCURRENCY, len(keys)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda key: _load_page(bucket, key), keys))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB (Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,104 @@
+import json
+from typing import Any, Optional
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class PartialJSONParser:
+    """
+    Incremental parser for a JSON document that is still being streamed.
+
+    Text is fed in chunks as it arrives; each chunk is scanned once. snapshot()
+    returns the document as it stands, keeping only values that have fully
+    arrived: a dish object shows up once its closing brace has been seen, and
+    the containers still open around it are closed off. A section that is
+    still streaming therefore appears with the dishes completed so far.
+
+    Leading text before the document starts (e.g. a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._cut = None  # (end offset, closing suffix) of the last complete value
+        self.updates = 0  # Bumped whenever snapshot() would return something new
+        self.complete = False
+
+    def feed(self, chunk: str):
+        """Scan the next chunk of streamed text."""
+        if not chunk or self.complete:
+            return
+
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+
+        for i, char in enumerate(chunk):
+            pos = offset + i
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._start is None:
+                if char in _CLOSERS:
+                    self._start = pos
+                    self._stack.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in _CLOSERS:
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._mark_cut(pos + 1)
+                    self.complete = True
+                    return
+                # Array elements are complete once closed; members of a
+                # still-open object wait for the object (or a top-level comma)
+                if self._stack[-1] == "[":
+                    self._mark_cut(pos + 1)
+            elif char == "," and len(self._stack) == 1:
+                # Sibling of a top-level value: whatever came before is complete
+                self._mark_cut(pos)
+
+    def _mark_cut(self, end: int):
+        suffix = "".join(_CLOSERS[c] for c in reversed(self._stack))
+        self._cut = (end, suffix)
+        self.updates += 1
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def snapshot(self) -> Optional[Any]:
+        """Parse everything that has fully arrived, or None if nothing has yet."""
+        if self._cut is None:
+            return None
+        end, suffix = self._cut
+        try:
+            return json.loads(self.text[self._start:end] + suffix)
+        except json.JSONDecodeError:
+            return None
+
+
+def parse_partial(text: str) -> Optional[Any]:
+    """Parse the complete prefix of a possibly truncated JSON document."""
+    parser = PartialJSONParser()
+    parser.feed(text)
+    return parser.snapshot()
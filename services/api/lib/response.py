@@ -1,29 +1,120 @@
+import base64
+import gzip
 import json
 import os
-from typing import Any, Dict, Optional
+from decimal import Decimal
+from functools import wraps
+from typing import Any, Dict, Optional, Set
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used without it
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used without it
+    brotli = None
 
 # Get allowed origin from environment, default to localhost for dev
 ALLOWED_ORIGIN = os.environ.get("FRONTEND_URL", "http://localhost:3000")
 
+# Run artifacts (menu.json, images.json, recommendations) never change once
+# written. "private" keeps shared caches from serving one user's response to
+# another, since every route is authenticated.
+IMMUTABLE = "private, max-age=31536000, immutable"
+NO_STORE = "no-store"
+
+# Bodies smaller than this aren't worth compressing (framing overhead plus
+# the CPU time on every request)
+MIN_COMPRESS_BYTES = 1024
+
+# Fast settings: responses are compressed on every request, not once at build time
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _json_default(value: Any) -> Any:
+    # DynamoDB returns numbers as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(body: Any) -> str:
+    """Serialize a response body, with orjson when it's installed."""
+    if orjson is not None:
+        return orjson.dumps(body, default=_json_default).decode("utf-8")
+    return json.dumps(body, default=_json_default)
+
 
 def cors_headers(origin: str = None) -> Dict[str, str]:
     """Return CORS headers for API Gateway responses."""
     return {
         "Access-Control-Allow-Origin": origin or ALLOWED_ORIGIN,
-        "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+        "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match",
         "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS",
+        "Access-Control-Expose-Headers": "ETag",
     }
 
 
-def success(body: Any, status_code: int = 200, origin: str = None) -> Dict[str, Any]:
+def cache_headers(etag: str = None, cache_control: str = None) -> Dict[str, str]:
+    """ETag / Cache-Control headers, omitting any that aren't set."""
+    headers = {}
+    if etag:
+        headers["ETag"] = etag
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Case-insensitive request header lookup (API Gateway keeps the client's casing)."""
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag (weak comparison, as for GET)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def success(
+    body: Any,
+    status_code: int = 200,
+    origin: str = None,
+    etag: str = None,
+    cache_control: str = None,
+) -> Dict[str, Any]:
     """Return a successful API Gateway response."""
     return {
         "statusCode": status_code,
         "headers": {
             "Content-Type": "application/json",
+            **cache_headers(etag, cache_control),
             **cors_headers(origin),
         },
-        "body": json.dumps(body),
+        "body": dumps(body),
+    }
+
+
+def not_modified(etag: str, origin: str = None, cache_control: str = None) -> Dict[str, Any]:
+    """Return a 304 for a conditional request whose If-None-Match still matches."""
+    return {
+        "statusCode": 304,
+        "headers": {
+            **cache_headers(etag, cache_control),
+            **cors_headers(origin),
+        },
+        "body": "",
     }
 
 
@@ -44,5 +135,92 @@ def error(
             "Content-Type": "application/json",
             **cors_headers(origin),
         },
-        "body": json.dumps(body),
+        "body": dumps(body),
     }
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    """Content codings the client accepts, from an Accept-Encoding header."""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def compress(response: Dict[str, Any], accept_encoding: Optional[str]) -> Dict[str, Any]:
+    """
+    Compress an API Gateway response body with brotli or gzip, whichever
+    the client accepts (brotli preferred). The body is base64-encoded, which
+    API Gateway decodes before sending because binary media types are
+    enabled on the API (infra/api_gateway.tf).
+
+    Small, empty or already-encoded bodies are returned unchanged. A strong
+    ETag on a compressed body is made weak (matching still works: see
+    etag_matches).
+    """
+    body = response.get("body")
+    if not isinstance(body, str) or response.get("isBase64Encoded"):
+        return response
+
+    headers = response.setdefault("headers", {})
+    raw = body.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return response
+    headers["Vary"] = "Accept-Encoding"
+
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        encoded, coding = brotli.compress(raw, quality=BROTLI_QUALITY), "br"
+    elif "gzip" in accepted or "*" in accepted:
+        encoded, coding = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    else:
+        return response
+
+    headers["Content-Encoding"] = coding
+    # Different bytes than the identity body, so not the same strong validator
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+    response["body"] = base64.b64encode(encoded).decode("ascii")
+    response["isBase64Encoded"] = True
+    return response
+
+
+def compress_response(handler_func):
+    """
+    Decorator for API Gateway handlers: decodes base64 request bodies and
+    compresses the response according to Accept-Encoding.
+
+    With binary media types enabled, API Gateway base64-encodes every
+    request body; it's decoded here so handlers keep reading JSON. Events that don't come
+    from API Gateway (async invocations, SQS, S3) pass through untouched.
+
+    Usage:
+        @compress_response
+        @require_auth
+        def handler(event, context, user):
+            ...
+    """
+    @wraps(handler_func)
+    def wrapper(event, context):
+        if event.get("isBase64Encoded") and event.get("body"):
+            event = dict(event, body=base64.b64decode(event["body"]).decode("utf-8"), isBase64Encoded=False)
+
+        response = handler_func(event, context)
+
+        if isinstance(response, dict) and "statusCode" in response:
+            return compress(response, get_header(event, "Accept-Encoding"))
+        return response
+
+    return wrapper
@@ -0,0 +1,120 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+# build.sh copies packages/shared/schemas next to lib/ in each Lambda package;
+# fall back to the monorepo location when running from a checkout
+_API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_DIRS = [
+    os.path.join(_API_ROOT, "schemas"),
+    os.path.join(_API_ROOT, "..", "..", "packages", "shared", "schemas"),
+]
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+@lru_cache(maxsize=None)
+def load_schema(name: str) -> Dict[str, Any]:
+    """Load a shared JSON schema by name (e.g. "menu")."""
+    for directory in SCHEMA_DIRS:
+        path = os.path.join(directory, f"{name}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+    raise FileNotFoundError(f"Schema not found: {name}")
+
+
+def validate(instance: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Validate an instance against the subset of JSON Schema our shared schemas
+    use (type, properties, required, items, enum).
+
+    Returns a list of error messages; empty if valid.
+    """
+    errors = []
+
+    expected = schema.get("type")
+    if expected:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_TYPE_CHECKS[t](instance) for t in types):
+            return [f"{path}: expected {' or '.join(types)}"]
+
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: must be one of {schema['enum']}")
+
+    if isinstance(instance, dict):
+        for key in schema.get("required", []):
+            if key not in instance:
+                errors.append(f"{path}: missing '{key}'")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in instance:
+                errors.extend(validate(instance[key], subschema, f"{path}.{key}"))
+
+    if isinstance(instance, list) and "items" in schema:
+        for i, item in enumerate(instance):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+
+    return errors
+
+
+def _coerce_number(value: Any, schema: Dict[str, Any]) -> Any:
+    """Turn "$12.99"-style strings into numbers where the schema wants a number."""
+    expected = schema.get("type")
+    types = expected if isinstance(expected, list) else [expected]
+    if not isinstance(value, str) or not {"number", "integer"} & set(types):
+        return value
+    cleaned = re.sub(r"[^\d.\-]", "", value)
+    try:
+        number = float(cleaned)
+    except ValueError:
+        return value
+    if "number" not in types:
+        return int(number) if number.is_integer() else value
+    return number
+
+
+def prune_invalid(instance: Any, schema: Dict[str, Any]) -> Any:
+    """
+    Drop array items that don't validate (e.g. a dish with no name) and
+    optional fields with the wrong type, recursing into objects and arrays.
+    Fields with a "default" get it instead when missing or of the wrong type
+    (an untitled section keeps its dishes). One bad dish shouldn't fail a
+    whole menu.
+    """
+    if isinstance(instance, dict):
+        properties = schema.get("properties", {})
+        required = schema.get("required", [])
+        pruned = {}
+        instance = {**instance, **{
+            key: subschema["default"] for key, subschema in properties.items()
+            if "default" in subschema and (key not in instance or validate(instance[key], subschema))
+        }}
+        for key, value in instance.items():
+            if key in properties:
+                value = prune_invalid(_coerce_number(value, properties[key]), properties[key])
+                # An optional field with the wrong type is dropped, not the whole object
+                if key not in required and validate(value, properties[key]):
+                    continue
+            pruned[key] = value
+        return pruned
+
+    if isinstance(instance, list) and "items" in schema:
+        item_schema = schema["items"]
+        kept = []
+        for item in instance:
+            item = prune_invalid(item, item_schema)
+            if not validate(item, item_schema):
+                kept.append(item)
+        return kept
+
+    return instance
@@ -1,37 +1,139 @@
-import os
-import boto3
 import json
-from functools import lru_cache
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from lib import aws
+
+# How long a fetched secret is used before it's refreshed in the background.
+# Rotated keys are picked up within this window.
+TTL_SECONDS = float(os.environ.get("SECRETS_TTL_SECONDS", "900"))
+
+# Secret name -> (env var holding the Secrets Manager ARN, env var that can
+# hold the value itself for local runs and tests)
+SECRETS = {
+    "openai": ("OPENAI_SECRET_ARN", "OPENAI_API_KEY"),
+    "serpapi": ("SERPAPI_SECRET", "SERPAPI_API_KEY"),
+    "unsplash": ("UNSPLASH_API_SECRET", "UNSPLASH_API_KEY"),
+}
+
+_values: Dict[str, Tuple[str, float]] = {}  # arn -> (value, fetched_at)
+_pending: Dict[str, Future] = {}  # arn -> in-flight fetch
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=len(SECRETS), thread_name_prefix="secrets")
+    return _executor
+
+
+def _fetch(secret_arn: str) -> str:
+    try:
+        response = aws.client("secretsmanager").get_secret_value(SecretId=secret_arn)
+        value = response["SecretString"]
+        with _lock:
+            _values[secret_arn] = (value, time.monotonic())
+        return value
+    finally:
+        with _lock:
+            _pending.pop(secret_arn, None)
+
+
+def _fetch_async(secret_arn: str) -> Future:
+    """Start fetching a secret unless a fetch is already in flight. Call with _lock held."""
+    future = _pending.get(secret_arn)
+    if future is None:
+        future = _get_executor().submit(_fetch, secret_arn)
+        _pending[secret_arn] = future
+    return future
+
+
+def _local_value(name: str) -> Optional[str]:
+    """
+    Value from the environment or SECRETS_FILE, if one is set. Used for
+    local runs and tests, where there's no Secrets Manager.
+    """
+    _, value_env = SECRETS[name]
+    if os.environ.get(value_env):
+        return os.environ[value_env]
+
+    secrets_file = os.environ.get("SECRETS_FILE")
+    if secrets_file:
+        with open(secrets_file) as f:
+            return json.load(f).get(name)
+    return None
+
 
-secrets_client = boto3.client("secretsmanager")
+def prefetch(*names: str):
+    """
+    Start fetching secrets in the background, all at once.
+
+    Call at module level in a handler, so the fetches run during the Lambda
+    init phase instead of one after another on the first request.
+    """
+    for name in names:
+        arn_env, _ = SECRETS[name]
+        secret_arn = os.environ.get(arn_env)
+        if not secret_arn or _local_value(name) is not None:
+            continue
+        with _lock:
+            if secret_arn not in _values:
+                _fetch_async(secret_arn)
 
 
-@lru_cache(maxsize=10)
 def get_secret(secret_arn: str) -> str:
-    """Get a secret value from Secrets Manager (cached)."""
-    response = secrets_client.get_secret_value(SecretId=secret_arn)
-    return response["SecretString"]
+    """
+    Get a secret value from Secrets Manager.
 
+    Values are cached for TTL_SECONDS. After that the cached value is still
+    returned while a background fetch replaces it, so rotation never adds
+    latency; if the refresh fails the old value stays in use.
+    """
+    with _lock:
+        cached = _values.get(secret_arn)
+        if cached is not None:
+            value, fetched_at = cached
+            if time.monotonic() - fetched_at >= TTL_SECONDS and secret_arn not in _pending:
+                _fetch_async(secret_arn).add_done_callback(_log_refresh_error)
+            return value
+        future = _fetch_async(secret_arn)
 
-def get_openai_api_key() -> str:
-    """Get the OpenAI API key."""
-    secret_arn = os.environ.get("OPENAI_SECRET_ARN")
+    return future.result()
+
+
+def _log_refresh_error(future: Future):
+    error = future.exception()
+    if error is not None:
+        print(f"Secret refresh failed, keeping cached value: {error}")
+
+
+def _get_named_secret(name: str) -> str:
+    local = _local_value(name)
+    if local is not None:
+        return local
+
+    arn_env, _ = SECRETS[name]
+    secret_arn = os.environ.get(arn_env)
     if not secret_arn:
-        raise ValueError("OPENAI_SECRET_ARN environment variable not set")
+        raise ValueError(f"{arn_env} environment variable not set")
     return get_secret(secret_arn)
 
 
+def get_openai_api_key() -> str:
+    """Get the OpenAI API key."""
+    return _get_named_secret("openai")
+
+
 def get_unsplash_api_key() -> str:
     """Get the Unsplash API key."""
-    secret_arn = os.environ.get("UNSPLASH_API_SECRET")
-    if not secret_arn:
-        raise ValueError("UNSPLASH_API_SECRET environment variable not set")
-    return get_secret(secret_arn)
+    return _get_named_secret("unsplash")
 
 
 def get_serpapi_key() -> str:
     """Get the SerpAPI key."""
-    secret_arn = os.environ.get("SERPAPI_SECRET")
-    if not secret_arn:
-        raise ValueError("SERPAPI_SECRET environment variable not set")
-    return get_secret(secret_arn)
+    return _get_named_secret("serpapi")
@@ -0,0 +1,328 @@
+import io
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from botocore.exceptions import ClientError
+
+from lib import aws
+from lib.dish_names import canonical_dish_name
+from lib.dynamo import get_cached_images_batch
+
+# Off unless turned on: each lookup costs an embeddings request
+ENABLED = os.environ.get("SEMANTIC_IMAGE_CACHE", "0") == "1"
+
+# Optional, and only imported when enabled so it stays off the cold start
+np = None
+if ENABLED:
+    try:
+        import numpy as np
+    except ImportError:
+        print("numpy not installed, semantic image cache disabled")
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+DIMENSIONS = int(os.environ.get("SEMANTIC_IMAGE_CACHE_DIMENSIONS", "256"))
+
+# Cosine similarity above which another dish's images are reused. High on
+# purpose: a wrong photo is worse than a SerpAPI search. Not yet checked
+# against real menus: run test/bench_semantic_cache.py --corpus before
+# turning the cache on or lowering it.
+THRESHOLD = float(os.environ.get("SEMANTIC_IMAGE_CACHE_THRESHOLD", "0.9"))
+
+# The index is one object in the cache bucket; warm containers revalidate
+# it this often. Runs don't rewrite it: each adds its new dishes as a small
+# delta shard, and compact() merges the shards in on a schedule.
+INDEX_KEY = "semantic/dish_index.npz"
+DELTA_PREFIX = "semantic/deltas/"
+RELOAD_SECONDS = int(os.environ.get("SEMANTIC_IMAGE_CACHE_RELOAD_SECONDS", "300"))
+DELTA_WORKERS = 8
+
+# The cache bucket expires objects after 30 days, so compact() rewrites an
+# index this old even when there are no shards to merge
+REFRESH_DAYS = 20
+
+
+@dataclass
+class Neighbor:
+    dish_hash: str
+    name: str
+    score: float
+
+
+class DishIndex:
+    """
+    Normalized dish-name embeddings, one row per cached dish, and the
+    image-cache hash of each row. Exact search: a brute-force scan of 100k
+    rows is a single matrix-vector product per batch of queries.
+
+    Rows are float32 in memory (BLAS) and float16 on S3 (half the download).
+    """
+
+    def __init__(self, hashes=None, names=None, vectors=None, dimensions: int = DIMENSIONS):
+        self.hashes: List[str] = list(hashes) if hashes is not None else []
+        self.names: List[str] = list(names) if names is not None else []
+        if vectors is None:
+            vectors = np.empty((0, dimensions))
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._rows = {dish_hash: i for i, dish_hash in enumerate(self.hashes)}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, dish_hash):
+        return dish_hash in self._rows
+
+    def nearest(self, queries) -> List[Optional[Neighbor]]:
+        """Best match above THRESHOLD for each normalized query vector, or None."""
+        if not len(self) or not len(queries):
+            return [None] * len(queries)
+
+        scores = np.asarray(queries, dtype=np.float32) @ self.vectors.T
+        rows = scores.argmax(axis=1)
+        best = scores[np.arange(len(rows)), rows]
+        return [
+            Neighbor(self.hashes[row], self.names[row], float(score)) if score >= THRESHOLD else None
+            for row, score in zip(rows, best)
+        ]
+
+    def entries(self) -> Dict[str, Tuple[str, "np.ndarray"]]:
+        return {dish_hash: (name, vector) for dish_hash, name, vector in zip(self.hashes, self.names, self.vectors)}
+
+    def add(self, entries: Dict[str, Tuple[str, "np.ndarray"]]) -> int:
+        """Add {dish_hash: (name, vector)} for hashes not already indexed. Returns how many were added."""
+        new = [(dish_hash, name, vector) for dish_hash, (name, vector) in entries.items()
+               if dish_hash not in self._rows]
+        if not new:
+            return 0
+        for dish_hash, name, _ in new:
+            self._rows[dish_hash] = len(self.hashes)
+            self.hashes.append(dish_hash)
+            self.names.append(name)
+        rows = np.stack([vector for _, _, vector in new]).astype(np.float32)
+        self.vectors = np.concatenate([self.vectors, rows])
+        return len(new)
+
+    def to_bytes(self) -> bytes:
+        # Strings as newline-joined UTF-8: numpy's fixed-width unicode
+        # arrays take 4 bytes per character of the longest name
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            hashes=np.frombuffer("\n".join(self.hashes).encode(), dtype=np.uint8),
+            names=np.frombuffer("\n".join(name.replace("\n", " ") for name in self.names).encode(), dtype=np.uint8),
+            vectors=self.vectors.astype(np.float16),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DishIndex":
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            vectors = archive["vectors"]
+            hashes = archive["hashes"].tobytes().decode().split("\n") if len(vectors) else []
+            names = archive["names"].tobytes().decode().split("\n") if len(vectors) else []
+        return cls(hashes, names, vectors, dimensions=vectors.shape[1])
+
+
+_index: Optional[DishIndex] = None
+_etag: Optional[str] = None
+_checked_at = 0.0
+# Delta shards already in _index
+_applied: Set[str] = set()
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return ENABLED and np is not None
+
+
+def _fetch(etag: Optional[str]) -> Tuple[Optional[DishIndex], Optional[str]]:
+    """The index from S3, or (None, etag) if ours is current. Empty if there isn't one yet."""
+    params = {"Bucket": os.environ.get("CACHE_BUCKET"), "Key": INDEX_KEY}
+    if etag:
+        params["IfNoneMatch"] = etag
+    try:
+        response = aws.client("s3").get_object(**params)
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+            return None, etag
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return DishIndex(), None
+        raise
+    return DishIndex.from_bytes(response["Body"].read()), response["ETag"]
+
+
+def _list_deltas() -> List[str]:
+    s3 = aws.client("s3")
+    keys = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=os.environ.get("CACHE_BUCKET"),
+                                                             Prefix=DELTA_PREFIX):
+        keys.extend(obj["Key"] for obj in page.get("Contents", []))
+    return sorted(keys)
+
+
+def _load_deltas(keys: List[str]) -> Dict[str, Tuple[str, "np.ndarray"]]:
+    """The entries of the delta shards, fetched concurrently. Shards deleted meanwhile are skipped."""
+    s3 = aws.client("s3")
+
+    def load(key):
+        try:
+            body = s3.get_object(Bucket=os.environ.get("CACHE_BUCKET"), Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                return {}
+            raise
+        return DishIndex.from_bytes(body).entries()
+
+    entries = {}
+    if keys:
+        with ThreadPoolExecutor(max_workers=min(DELTA_WORKERS, len(keys))) as executor:
+            for shard in executor.map(load, keys):
+                entries.update(shard)
+    return entries
+
+
+def get_index() -> DishIndex:
+    """
+    The shared index, loaded once per container with any delta shards not
+    merged into it yet, and revalidated against S3 (conditional GET, plus
+    a listing for new shards) at most every RELOAD_SECONDS.
+    """
+    global _index, _etag, _checked_at, _applied
+    with _lock:
+        if _index is None or time.monotonic() - _checked_at >= RELOAD_SECONDS:
+            index, etag = _fetch(_etag if _index is not None else None)
+            if index is not None:
+                _index, _etag, _applied = index, etag, set()
+            new = [key for key in _list_deltas() if key not in _applied]
+            added = _index.add(_load_deltas(new))
+            _applied.update(new)
+            if index is not None or added:
+                print(f"Semantic image cache: loaded {len(_index)} dishes ({len(_applied)} delta shards)")
+            _checked_at = time.monotonic()
+        return _index
+
+
+def embed(names: List[str]):
+    """Normalized embeddings of the canonical dish names, one row per name."""
+    from lib.openai_client import get_client
+
+    response = get_client().embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=[canonical_dish_name(name) or name for name in names],
+        dimensions=DIMENSIONS,
+    )
+    vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def find_cached_images(names: List[str]) -> Tuple[Dict[str, List[str]], Dict[str, "np.ndarray"]]:
+    """
+    Images cached for near-synonyms of dishes that missed the exact-key cache.
+
+    Returns ({name: images} for names whose nearest indexed dish is above
+    THRESHOLD and has images, {name: embedding} for every name) - the
+    embeddings are passed back to remember() for dishes searched afterwards.
+    Neighbors with no images (negative entries) don't count as hits.
+    """
+    if not enabled() or not names:
+        return {}, {}
+
+    vectors = embed(names)
+    neighbors = get_index().nearest(vectors)
+    matched = {name: neighbor for name, neighbor in zip(names, neighbors) if neighbor}
+
+    hits = {}
+    if matched:
+        cached = get_cached_images_batch([neighbor.dish_hash for neighbor in matched.values()])
+        for name, neighbor in matched.items():
+            images = cached.get(neighbor.dish_hash)
+            if images:
+                print(f"Semantic image cache: '{name}' -> '{neighbor.name}' ({neighbor.score:.3f})")
+                hits[name] = images
+
+    print(f"Semantic image cache: {len(hits)}/{len(names)} hits")
+    return hits, dict(zip(names, vectors))
+
+
+def remember(entries: Dict[str, Tuple[str, "np.ndarray"]]):
+    """
+    Add {dish_hash: (name, embedding)} for newly searched dishes: to this
+    container's index straight away, and to S3 as a delta shard of just
+    these dishes (a few KB), which other containers pick up when they
+    revalidate. The index itself is only rewritten by compact().
+    """
+    if not enabled() or not entries:
+        return
+
+    index = get_index()
+    new = {dish_hash: entry for dish_hash, entry in entries.items() if dish_hash not in index}
+    if not new:
+        return
+
+    delta = DishIndex()
+    delta.add(new)
+    key = f"{DELTA_PREFIX}{int(time.time())}-{uuid.uuid4().hex[:8]}.npz"
+    aws.client("s3").put_object(
+        Bucket=os.environ.get("CACHE_BUCKET"),
+        Key=key,
+        Body=delta.to_bytes(),
+        ContentType="application/octet-stream",
+    )
+    with _lock:
+        _index.add(new)
+        _applied.add(key)
+    print(f"Semantic image cache: added {len(new)} dishes ({key})")
+
+
+def compact() -> int:
+    """
+    Merge the delta shards into the index object and delete them. Runs on
+    a schedule (infra/lambda.tf), off the request path.
+
+    The write is conditional on the index's ETag, so if two compactions
+    overlap one gives up; its shards are merged next time. Shards written
+    while this runs are left for next time too. Returns how many shards
+    were merged.
+    """
+    if not enabled():
+        return 0
+
+    s3 = aws.client("s3")
+    bucket = os.environ.get("CACHE_BUCKET")
+    index, etag = _fetch(None)
+    keys = _list_deltas()
+    if not keys:
+        if etag is None:
+            return 0
+        modified = s3.head_object(Bucket=bucket, Key=INDEX_KEY)["LastModified"]
+        if (datetime.now(timezone.utc) - modified).days < REFRESH_DAYS:
+            return 0
+
+    index.add(_load_deltas(keys))
+    condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    try:
+        s3.put_object(
+            Bucket=bucket,
+            Key=INDEX_KEY,
+            Body=index.to_bytes(),
+            ContentType="application/octet-stream",
+            **condition,
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            print("Semantic image cache: index changed during compaction, leaving shards for next time")
+            return 0
+        raise
+
+    # Containers still holding the old index load these again harmlessly
+    # (add() skips indexed dishes) until they see the new one
+    for i in range(0, len(keys), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]],
+                                                 "Quiet": True})
+    print(f"Semantic image cache: compacted {len(keys)} delta shards, {len(index)} dishes")
+    return len(keys)
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from botocore.exceptions import ClientError
+
+from lib import async_http, aws
+from lib.dynamo import get_thumbnails_batch, cache_thumbnails
+from lib.image_search import get_dish_hash
+from lib.image_verify import HEADERS
+
+# Off unless turned on: mirroring downloads and re-encodes photos on every new dish
+ENABLED = os.environ.get("THUMBNAIL_MIRROR", "0") == "1"
+
+# Thumbnail name -> longest side in pixels (dish card, expanded card)
+SIZES = {"sm": 160, "md": 480}
+QUALITY = 75
+
+# Candidates tried per dish, in ranked order, until one mirrors
+CANDIDATES = int(os.environ.get("THUMBNAIL_CANDIDATES", "2"))
+
+# Source bytes downloaded per run across all dishes, and per photo
+BYTE_BUDGET = int(os.environ.get("THUMBNAIL_BYTE_BUDGET_MB", "25")) * 1024 * 1024
+MAX_SOURCE_BYTES = 8 * 1024 * 1024
+
+CONCURRENCY = int(os.environ.get("THUMBNAIL_CONCURRENCY", "8"))
+
+# Photos decoded at once, and the most pixels one may decode to. A decoded
+# 16MP photo is about 50 MB (RGB); JPEGs are downscaled while decoding, but
+# PNG and WebP sources decode at full size.
+RENDER_CONCURRENCY = int(os.environ.get("THUMBNAIL_RENDER_CONCURRENCY", "2"))
+MAX_DECODE_PIXELS = 16_000_000
+BUDGET_SECONDS = float(os.environ.get("THUMBNAIL_BUDGET_SECONDS", "10"))
+DOWNLOAD_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+
+# Served from a CDN in front of the cache bucket if there is one, else presigned
+CDN_URL = os.environ.get("THUMBNAIL_CDN_URL", "").rstrip("/")
+PRESIGN_SECONDS = 3600
+
+# Objects are keyed by a hash of the source photo, so the same photo found
+# for different dishes is stored once. The cache bucket expires objects
+# after 30 days: one older than this is written again rather than reused,
+# so it outlives the dish entries (20 days, lib.dynamo) that point at it.
+PREFIX = "thumbs/"
+REUSE_DAYS = 10
+
+
+async def _download(client: httpx.AsyncClient, url: str, state: dict) -> Optional[bytes]:
+    """The photo at url, or None if it isn't an image, is too big or the run's budget runs out."""
+    chunks, size = [], 0
+    async with client.stream("GET", url) as response:
+        if response.status_code >= 400 or not response.headers.get("content-type", "").startswith("image/"):
+            return None
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            state["bytes"] += len(chunk)
+            if size > MAX_SOURCE_BYTES or state["bytes"] > BYTE_BUDGET:
+                return None
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _render(data: bytes) -> Dict[str, bytes]:
+    """WebP thumbnails of a photo, one per SIZES entry."""
+    from PIL import Image, ImageOps
+
+    largest = max(SIZES.values())
+    with Image.open(io.BytesIO(data)) as img:
+        # Let the JPEG decoder downscale while decoding; keeps 12MP photos cheap
+        img.draft("RGB", (largest, largest))
+        # Only the header has been read so far
+        if img.width * img.height > MAX_DECODE_PIXELS:
+            raise ValueError(f"{img.width}x{img.height} {img.format} is too large to decode")
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        rendered = {}
+        for name, side in sorted(SIZES.items(), key=lambda item: -item[1]):
+            img.thumbnail((side, side), Image.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, format="WEBP", quality=QUALITY, method=4)
+            rendered[name] = buffer.getvalue()
+    return rendered
+
+
+def _store(data: bytes) -> Dict[str, str]:
+    """Thumbnails of a photo in the cache bucket, reusing a recent copy of the same photo. Returns {size: key}."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    keys = {name: f"{PREFIX}{digest}/{name}.webp" for name in SIZES}
+    bucket = os.environ.get("CACHE_BUCKET")
+    s3 = aws.client("s3")
+
+    try:
+        head = s3.head_object(Bucket=bucket, Key=keys[max(SIZES, key=SIZES.get)])
+        if (datetime.now(timezone.utc) - head["LastModified"]).days < REUSE_DAYS:
+            return keys
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") != 404:
+            raise
+
+    for name, body in _render(data).items():
+        s3.put_object(
+            Bucket=bucket,
+            Key=keys[name],
+            Body=body,
+            ContentType="image/webp",
+            CacheControl="public, max-age=31536000, immutable",
+        )
+    return keys
+
+
+async def _mirror_dish(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, render_semaphore: asyncio.Semaphore,
+                       images: List[str], state: dict) -> Optional[Dict[str, str]]:
+    for url in images[:CANDIDATES]:
+        if state["bytes"] >= BYTE_BUDGET:
+            return None
+        async with semaphore:
+            try:
+                data = await _download(client, url, state)
+            except httpx.HTTPError:
+                data = None
+        if data is None:
+            continue
+        try:
+            async with render_semaphore:
+                return await asyncio.to_thread(_store, data)
+        except Exception as e:
+            print(f"Thumbnail failed for {url}: {e}")
+    return None
+
+
+async def _mirror_all(images_by_dish: Dict[str, List[str]]) -> Dict[str, Dict[str, str]]:
+    start = time.monotonic()
+    hashes = {name: get_dish_hash(name) for name in images_by_dish}
+
+    # Dishes mirrored on an earlier run (any spelling, via the dish hash)
+    try:
+        existing = await asyncio.to_thread(get_thumbnails_batch, list(hashes.values()))
+    except Exception as e:
+        print(f"Thumbnail lookup failed: {e}")
+        existing = {}
+
+    todo = {}
+    for name, images in images_by_dish.items():
+        if images and hashes[name] not in existing:
+            todo.setdefault(hashes[name], images)
+
+    mirrored = {}
+    state = {"bytes": 0}
+    if todo:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        render_semaphore = asyncio.Semaphore(RENDER_CONCURRENCY)
+        limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+        client = async_http.get_client("image_downloads", timeout=DOWNLOAD_TIMEOUT, limits=limits, headers=HEADERS,
+                                       follow_redirects=True)
+        tasks = {asyncio.create_task(_mirror_dish(client, semaphore, render_semaphore, images, state)): dish_hash
+                 for dish_hash, images in todo.items()}
+        done, pending = await asyncio.wait(tasks, timeout=BUDGET_SECONDS)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        mirrored = {tasks[task]: task.result() for task in done
+                    if task.exception() is None and task.result()}
+        try:
+            await asyncio.to_thread(cache_thumbnails, mirrored)
+        except Exception as e:
+            print(f"Failed to cache thumbnails: {e}")
+
+    print(f"Thumbnails: {len(images_by_dish)} dishes, {len(existing)} reused, {len(mirrored)}/{len(todo)} "
+          f"mirrored, {state['bytes'] / 1e6:.1f} MB downloaded, {time.monotonic() - start:.1f}s")
+
+    thumbnails = {**existing, **mirrored}
+    return {name: thumbnails[hashes[name]] for name in images_by_dish if hashes[name] in thumbnails}
+
+
+def mirror_dishes(images_by_dish: Dict[str, List[str]]) -> Dict[str, Dict[str, str]]:
+    """
+    Mirror the top image of each dish into the cache bucket as thumbnails.
+
+    Dishes mirrored before are reused via their dish hash. The rest are
+    mirrored concurrently: the first of the top CANDIDATES images that
+    downloads and decodes is resized to SIZES and stored as WebP. At most
+    RENDER_CONCURRENCY photos are decoded at once. Stops
+    downloading once BYTE_BUDGET is spent, and gives up on dishes still
+    going after BUDGET_SECONDS; those keep their original images only.
+
+    Returns:
+        {dish name: {size: s3_key}} for the dishes that have thumbnails
+    """
+    return async_http.run(_mirror_all(images_by_dish))
+
+
+def thumbnail_urls(keys: Dict[str, str]) -> Dict[str, str]:
+    """URLs for a dish's thumbnails: on the CDN if configured, else presigned for PRESIGN_SECONDS."""
+    if CDN_URL:
+        return {name: f"{CDN_URL}/{key}" for name, key in keys.items()}
+    s3 = aws.client("s3")
+    return {
+        name: s3.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": os.environ.get("CACHE_BUCKET"), "Key": key},
+            ExpiresIn=PRESIGN_SECONDS,
+        )
+        for name, key in keys.items()
+    }
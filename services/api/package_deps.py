@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Work out what a handler's Lambda package needs: the lib/ modules it imports
+(directly or through other lib modules, including imports inside
+functions) and the requirements.txt lines for the third-party packages
+those modules use.
+
+Used by build.sh so each function ships only its own dependency closure.
+
+Usage:
+    python package_deps.py <handler> --files
+    python package_deps.py <handler> --requirements
+"""
+
+import ast
+import os
+import sys
+
+API_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Import name -> distribution in requirements.txt. None means the Lambda
+# runtime already provides it, so it isn't bundled.
+DISTRIBUTIONS = {
+    "boto3": None,
+    "botocore": None,
+    "PIL": "Pillow",
+    "jwt": "PyJWT",
+    "openai": "openai",
+    "requests": "requests",
+    "urllib3": "requests",
+    "httpx": "httpx",
+    "orjson": "orjson",
+    "brotli": "Brotli",
+    "numpy": "numpy",
+}
+
+
+def _imports(path):
+    """Top-level module names imported anywhere in a file."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+            # "from lib import aws" imports the lib.aws module
+            if node.module == "lib":
+                names.update(f"lib.{alias.name}" for alias in node.names)
+    return names
+
+
+def closure(handler):
+    """Return (source files relative to API_ROOT, third-party import names)."""
+    files = ["handlers/__init__.py", "lib/__init__.py"]
+    third_party = set()
+    pending = [f"handlers/{handler}.py"]
+
+    while pending:
+        path = pending.pop()
+        if path in files:
+            continue
+        files.append(path)
+
+        for name in _imports(os.path.join(API_ROOT, path)):
+            if name.startswith("lib."):
+                module_path = name.replace(".", "/") + ".py"
+                if os.path.exists(os.path.join(API_ROOT, module_path)):
+                    pending.append(module_path)
+            elif name != "lib":
+                top = name.split(".")[0]
+                if top not in sys.stdlib_module_names:
+                    third_party.add(top)
+
+    return sorted(files), third_party
+
+
+def requirements(third_party):
+    """requirements.txt lines for the given import names."""
+    unknown = third_party - DISTRIBUTIONS.keys()
+    if unknown:
+        raise SystemExit(f"Add {', '.join(sorted(unknown))} to DISTRIBUTIONS in package_deps.py")
+
+    wanted = {DISTRIBUTIONS[name].lower() for name in third_party if DISTRIBUTIONS[name]}
+    lines = []
+    with open(os.path.join(API_ROOT, "requirements.txt")) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name = line.split(">")[0].split("=")[0].split("<")[0].strip().lower()
+            if name in wanted:
+                lines.append(line)
+    return lines
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[2] not in ("--files", "--requirements"):
+        print(__doc__)
+        sys.exit(1)
+
+    files, third_party = closure(sys.argv[1])
+    if sys.argv[2] == "--files":
+        print("\n".join(files))
+    else:
+        print("\n".join(requirements(third_party)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark Lambda cold-start cost per handler: module import time and the
+time to create the AWS clients a first request needs.
+
+Each measurement runs in a fresh interpreter. By default the packages built
+by services/api/build.sh (dist/<handler>.zip) are measured, with only what
+the Lambda runtime provides (boto3 and its dependencies) available besides
+the package, so a missing dependency shows up as an import error.
+
+Usage:
+    cd services/api && ./build.sh && cd ../../test
+    python bench_cold_start.py [--runs N] [--source]
+
+--source measures the services/api checkout with everything installed in
+this environment instead of the built packages.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+API_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "services", "api")
+HANDLERS = ["presign", "menu_get", "images", "reviews", "recommend", "extract"]
+
+# Heavy dependencies only worker paths should load (extract's queue worker,
+# recommend's model call); listed when a handler imports them up front
+HEAVY_MODULES = ["openai", "PIL", "numpy"]
+
+# What the python3.11 Lambda runtime ships
+RUNTIME_MODULES = ["boto3", "botocore", "s3transfer", "jmespath", "dateutil", "six", "urllib3"]
+
+CHILD = """
+import json, sys, time
+paths = json.loads(sys.argv[1])
+sys.path[:0] = paths
+start = time.perf_counter()
+import handlers.{handler}
+imported = time.perf_counter()
+from lib import aws
+aws.client("s3")
+aws.resource("dynamodb")
+ready = time.perf_counter()
+heavy = [name for name in {heavy} if name in sys.modules]
+print(json.dumps({{"import_ms": (imported - start) * 1000, "clients_ms": (ready - imported) * 1000,
+                   "modules": len(sys.modules), "heavy": heavy}}))
+"""
+
+
+def runtime_dir(root):
+    """A directory holding only the packages the Lambda runtime provides."""
+    path = os.path.join(root, "runtime")
+    os.makedirs(path)
+    for name in RUNTIME_MODULES:
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            continue
+        source = os.path.dirname(spec.origin) if spec.submodule_search_locations else spec.origin
+        os.symlink(source, os.path.join(path, os.path.basename(source)))
+    return path
+
+
+def measure(handler, paths, isolated, runs):
+    args = [sys.executable]
+    if isolated:
+        args.append("-S")  # no site-packages: only the package and the runtime
+    args += ["-c", CHILD.format(handler=handler, heavy=HEAVY_MODULES), json.dumps(paths)]
+
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"))
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(args, capture_output=True, text=True, env=env)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--source", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'handler':10s} {'package':>9s} {'import':>9s} {'clients':>9s} {'total':>9s} {'modules':>8s}  heavy")
+    with tempfile.TemporaryDirectory() as root:
+        runtime = None if args.source else runtime_dir(root)
+
+        for handler in HANDLERS:
+            if args.source:
+                paths, size = [API_ROOT], "-"
+            else:
+                package = os.path.join(API_ROOT, "dist", f"{handler}.zip")
+                if not os.path.exists(package):
+                    print(f"{handler:10s} not built (run services/api/build.sh)")
+                    continue
+                target = os.path.join(root, handler)
+                with zipfile.ZipFile(package) as zf:
+                    zf.extractall(target)
+                paths, size = [target, runtime], f"{os.path.getsize(package) / 1e6:.1f}MB"
+
+            results, err = measure(handler, paths, not args.source, args.runs)
+            if err:
+                print(f"{handler:10s} {size:>9s} failed: {err}")
+                continue
+
+            import_ms = statistics.median(r["import_ms"] for r in results)
+            clients_ms = statistics.median(r["clients_ms"] for r in results)
+            print(f"{handler:10s} {size:>9s} {import_ms:7.0f}ms {clients_ms:7.0f}ms "
+                  f"{import_ms + clients_ms:7.0f}ms {results[0]['modules']:8d}  {', '.join(results[0]['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark how the extract worker loads menu pages from S3.
+
+Compares the old path (sequential get_object, raw bytes + base64 copies of
+every page held at once) against lib.page_loader.load_pages (concurrent,
+preprocessed, raw bytes dropped per page). Each mode runs in its own
+process so the peak RSS figures don't bleed into each other.
+
+Usage:
+    python bench_page_loading.py <uploads_bucket> <run_id>
+
+Upload a 10-page run through the web app first to get a realistic figure.
+"""
+
+import base64
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api"))
+
+REGION = "us-east-1"
+
+
+def list_keys(bucket, run_id):
+    import boto3
+
+    s3 = boto3.client("s3", region_name=REGION)
+    response = s3.list_objects_v2(Bucket=bucket, Prefix=f"{run_id}/")
+    return sorted(obj["Key"] for obj in response.get("Contents", []))
+
+
+def run_sequential(bucket, keys):
+    """The original extract worker: everything in memory at full size."""
+    import boto3
+
+    s3 = boto3.client("s3", region_name=REGION)
+    pages = []
+    for key in keys:
+        response = s3.get_object(Bucket=bucket, Key=key)
+        pages.append(response["Body"].read())
+    encoded = [base64.b64encode(page).decode("utf-8") for page in pages]
+    return sum(len(page) for page in pages), sum(len(e) for e in encoded)
+
+
+def run_loader(bucket, keys):
+    from lib.page_loader import load_pages
+
+    pages = load_pages(bucket, keys)
+    encoded = [base64.b64encode(page.image_bytes).decode("utf-8") for page in pages]
+    return sum(len(page.image_bytes) for page in pages), sum(len(e) for e in encoded)
+
+
+def child(mode, bucket, run_id):
+    from lib.page_loader import peak_rss_mb
+
+    keys = list_keys(bucket, run_id)
+    baseline_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "sequential":
+        image_bytes, encoded_bytes = run_sequential(bucket, keys)
+    else:
+        image_bytes, encoded_bytes = run_loader(bucket, keys)
+    elapsed = time.perf_counter() - start
+
+    print(f"{mode:12s} pages={len(keys):2d} time={elapsed:6.2f}s "
+          f"images={image_bytes / 1e6:6.1f} MB base64={encoded_bytes / 1e6:6.1f} MB "
+          f"peak_rss={peak_rss_mb():6.0f} MB (import baseline {baseline_rss:.0f} MB)")
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], sys.argv[4])
+        return
+
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    bucket, run_id = sys.argv[1], sys.argv[2]
+    print("=" * 60)
+    print(f"Loading pages for run {run_id}")
+    print("=" * 60)
+    for mode in ("sequential", "loader"):
+        subprocess.run([sys.executable, __file__, "--child", mode, bucket, run_id], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark menu extraction with and without image preprocessing.
+
+Runs extract_menu_from_images on the raw photos and on the preprocessed
+(downscaled, re-encoded) photos, then compares request size, latency and
+which dishes were found.
+
+Usage:
+    OPENAI_SECRET_ARN=<arn> python bench_preprocess.py menu1.jpg [menu2.jpg ...]
+
+    # Size/preprocessing time only, no OpenAI calls
+    python bench_preprocess.py --no-extract menu1.jpg [menu2.jpg ...]
+"""
+
+import os
+import sys
+import time
+import mimetypes
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api"))
+
+from lib.image_preprocess import preprocess_image  # noqa: E402
+from lib.menu_merge import normalize_name  # noqa: E402
+
+
+def load_images(paths):
+    """Read image files as (bytes, content_type) tuples."""
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            content_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+            images.append((f.read(), content_type))
+    return images
+
+
+def dish_names(menu):
+    """Set of normalized dish names in a menu."""
+    names = set()
+    for section in menu.get("sections", []):
+        for dish in section.get("dishes", []):
+            if dish.get("name"):
+                names.add(normalize_name(dish["name"]))
+    return names
+
+
+def time_extraction(images):
+    from lib.openai_client import extract_menu_from_images
+
+    start = time.perf_counter()
+    menu = extract_menu_from_images(images)
+    return menu, time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    extract = "--no-extract" not in args
+    paths = [a for a in args if not a.startswith("--")]
+    if not paths:
+        print(__doc__)
+        sys.exit(1)
+
+    raw = load_images(paths)
+
+    start = time.perf_counter()
+    processed = [preprocess_image(b, ct) for b, ct in raw]
+    preprocess_time = time.perf_counter() - start
+
+    raw_bytes = sum(len(b) for b, _ in raw)
+    processed_bytes = sum(len(b) for b, _ in processed)
+
+    print("=" * 60)
+    print("PREPROCESSING")
+    print("=" * 60)
+    for path, (raw_b, _), (proc_b, proc_ct) in zip(paths, raw, processed):
+        print(f"{os.path.basename(path):30s} {len(raw_b) / 1024:8.0f} KB -> {len(proc_b) / 1024:6.0f} KB ({proc_ct})")
+    print(f"Total: {raw_bytes / 1024:.0f} KB -> {processed_bytes / 1024:.0f} KB "
+          f"({raw_bytes / max(processed_bytes, 1):.1f}x smaller)")
+    print(f"Preprocessing time: {preprocess_time * 1000:.0f} ms")
+
+    if not extract:
+        return
+
+    print()
+    print("=" * 60)
+    print("EXTRACTION")
+    print("=" * 60)
+    raw_menu, raw_time = time_extraction(raw)
+    print(f"Raw images:          {raw_time:6.1f}s")
+    processed_menu, processed_time = time_extraction(processed)
+    print(f"Preprocessed images: {processed_time:6.1f}s (+{preprocess_time:.1f}s preprocessing)")
+
+    raw_dishes = dish_names(raw_menu)
+    processed_dishes = dish_names(processed_menu)
+    common = raw_dishes & processed_dishes
+
+    print()
+    print("=" * 60)
+    print("ACCURACY (raw extraction as reference)")
+    print("=" * 60)
+    print(f"Dishes (raw):          {len(raw_dishes)}")
+    print(f"Dishes (preprocessed): {len(processed_dishes)}")
+    print(f"In both:               {len(common)}")
+    if raw_dishes:
+        print(f"Recall vs raw:         {len(common) / len(raw_dishes):.0%}")
+    for name in sorted(raw_dishes - processed_dishes):
+        print(f"[MISSING] {name}")
+    for name in sorted(processed_dishes - raw_dishes):
+        print(f"[EXTRA]   {name}")
+
+
+if __name__ == "__main__":
+    main()
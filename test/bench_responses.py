@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark API response encoding for the big responses (images, menu_get).
+
+Builds realistic payloads (a 60-dish menu, 15 image URLs per dish) and
+reports serialization time with stdlib json vs orjson, and bytes on the
+wire uncompressed, gzip and brotli, as produced by lib.response.
+
+Usage:
+    python bench_responses.py [--dishes N] [--runs N]
+
+orjson and Brotli are optional; modes whose package isn't installed are
+skipped.
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api"))
+
+from lib import response  # noqa: E402
+
+SECTIONS = ["Starters", "Salads", "Mains", "Pasta", "Sides", "Desserts", "Wine", "Cocktails"]
+HOSTS = ["i.pinimg.com", "images.squarespace-cdn.com", "media-cdn.tripadvisor.com",
+         "s3-media0.fl.yelpcdn.com", "www.seriouseats.com", "cdn.loveandlemons.com"]
+
+
+def word(rng, length=None):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length or rng.randint(4, 9)))
+
+
+def image_url(rng):
+    path = "/".join(word(rng, 12) for _ in range(rng.randint(2, 4)))
+    return f"https://{rng.choice(HOSTS)}/{path}/{word(rng, 16)}.jpg"
+
+
+def build_payloads(num_dishes, seed=7):
+    rng = random.Random(seed)
+    names = [f"{word(rng).title()} {word(rng).title()} {word(rng)}" for _ in range(num_dishes)]
+
+    images = {"dishes": [{"name": name, "images": [image_url(rng) for _ in range(15)]} for name in names]}
+
+    sections = []
+    for i, section in enumerate(SECTIONS):
+        dishes = names[i::len(SECTIONS)]
+        sections.append({
+            "name": section,
+            "dishes": [{
+                "name": name,
+                "description": " ".join(word(rng) for _ in range(rng.randint(8, 20))),
+                "price": round(rng.uniform(6, 48), 2),
+                "dietary": rng.sample(["vegetarian", "vegan", "gluten_free", "spicy"], rng.randint(0, 2)),
+            } for name in dishes],
+        })
+    menu = {"run_id": "bench", "status": "EXTRACTED", "version": "EXTRACTED:0",
+            "menu": {"restaurant_name": "Bench Bistro", "sections": sections}}
+
+    return {"images": images, "menu_get": menu}
+
+
+def time_dumps(encoder, body, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        encoder(body)
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def wire_bytes(body, accept_encoding):
+    resp = response.compress(response.success(body), accept_encoding)
+    if resp.get("isBase64Encoded"):
+        return len(base64.b64decode(resp["body"])), resp["headers"].get("Content-Encoding")
+    return len(resp["body"].encode("utf-8")), "identity"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dishes", type=int, default=60)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    encoders = {"json": json.dumps}
+    if response.orjson is not None:
+        encoders["orjson"] = lambda body: response.orjson.dumps(body).decode("utf-8")
+
+    encodings = ["identity", "gzip"]
+    if response.brotli is not None:
+        encodings.append("br")
+
+    for name, body in build_payloads(args.dishes).items():
+        print("=" * 60)
+        print(f"{name} ({args.dishes} dishes)")
+        print("=" * 60)
+
+        for encoder_name, encoder in encoders.items():
+            print(f"serialize {encoder_name:8s} {time_dumps(encoder, body, args.runs):7.2f} ms")
+
+        raw = None
+        for accept in encodings:
+            start = time.perf_counter()
+            size, coding = wire_bytes(body, accept)
+            elapsed = (time.perf_counter() - start) * 1000
+            raw = raw or size
+            print(f"wire      {coding:8s} {size / 1024:7.1f} KB ({size / raw:5.1%}) "
+                  f"encode+compress {elapsed:6.2f} ms")
+
+    missing = [pkg for pkg, mod in (("orjson", response.orjson), ("Brotli", response.brotli)) if mod is None]
+    if missing:
+        print(f"\nNot installed, skipped: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
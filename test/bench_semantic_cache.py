@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark the semantic image cache tier (lib.semantic_cache).
+
+Latency: builds a synthetic index of N dishes (random unit vectors, the
+size and dtype the Lambda keeps in memory) and times serializing and
+loading it, and nearest-neighbor lookups for a single dish and for a
+whole menu's misses at once. Also shows the size of the delta shard a
+run writes for a menu's worth of new dishes.
+
+Searches avoided: replays a corpus of extracted menus (as in
+report_dish_cache_keys.py) with real embeddings, and counts the dishes
+served by an exact canonical-key hit, by a near-synonym above the
+threshold, and the ones that still need a SerpAPI search.
+
+Usage:
+    python bench_semantic_cache.py [--dishes 100000] [--runs 20]
+    OPENAI_API_KEY=... python bench_semantic_cache.py --corpus <dir|s3://bucket> [--threshold 0.9]
+
+Needs numpy; --corpus also needs an OpenAI key (OPENAI_API_KEY or OPENAI_SECRET_ARN).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ["SEMANTIC_IMAGE_CACHE"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api"))
+
+import numpy as np  # noqa: E402
+
+from lib import semantic_cache  # noqa: E402
+from lib.dish_names import canonical_dish_name  # noqa: E402
+from report_dish_cache_keys import dish_names, load_local, load_s3  # noqa: E402
+
+EMBED_BATCH = 500
+
+
+def unit_vectors(rng, count, dimensions):
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_latency(num_dishes, runs):
+    rng = np.random.default_rng(7)
+    dimensions = semantic_cache.DIMENSIONS
+    index = semantic_cache.DishIndex(dimensions=dimensions)
+    index.add({f"{i:032x}": (f"dish {i}", vector) for i, vector in enumerate(unit_vectors(rng, num_dishes, dimensions))})
+
+    data = index.to_bytes()
+    print(f"Index: {len(index)} dishes x {dimensions} dims, "
+          f"{index.vectors.nbytes / 1e6:.1f} MB in memory, {len(data) / 1e6:.1f} MB on S3")
+    print(f"  serialize   {timed(index.to_bytes, max(1, runs // 4)):8.1f} ms")
+
+    # What a run uploads now: a delta shard of its new dishes, not the index
+    delta = semantic_cache.DishIndex(dimensions=dimensions)
+    delta.add({f"new{i:029x}": (f"new dish {i}", vector) for i, vector in enumerate(unit_vectors(rng, 60, dimensions))})
+    print(f"  delta shard of 60 new dishes: {len(delta.to_bytes()) / 1e3:.1f} KB")
+    print(f"  load        {timed(lambda: semantic_cache.DishIndex.from_bytes(data), max(1, runs // 4)):8.1f} ms")
+
+    print(f"{'queries':>9}{'median ms':>12}{'per dish ms':>13}")
+    for batch in (1, 10, 60, 200):
+        # Near-copies of indexed rows, so lookups actually find something
+        rows = index.vectors[rng.integers(0, len(index), batch)].astype(np.float32)
+        queries = rows + unit_vectors(rng, batch, dimensions) * 0.1
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        ms = timed(lambda: index.nearest(queries), runs)
+        print(f"{batch:>9}{ms:>12.2f}{ms / batch:>13.3f}")
+
+
+def bench_corpus(corpus, threshold):
+    semantic_cache.THRESHOLD = threshold
+    if corpus.startswith("s3://"):
+        bucket, _, prefix = corpus[5:].partition("/")
+        menus = load_s3(bucket, prefix)
+    else:
+        menus = load_local(corpus)
+    menus = [list(dict.fromkeys(dish_names(menu))) for _, menu in menus]
+
+    names = list(dict.fromkeys(name for menu in menus for name in menu))
+    print(f"Embedding {len(names)} distinct dish names...")
+    vectors = {}
+    for i in range(0, len(names), EMBED_BATCH):
+        batch = names[i:i + EMBED_BATCH]
+        vectors.update(zip(batch, semantic_cache.embed(batch)))
+
+    index = semantic_cache.DishIndex()
+    cached = set()
+    exact = semantic = searched = 0
+    examples = []
+    for menu in menus:
+        keys = {name: canonical_dish_name(name) for name in menu}
+        misses = [name for name in menu if keys[name] not in cached]
+        exact += len(menu) - len(misses)
+        # Distinct keys within the menu are searched once (see lib.image_engine)
+        misses = list({keys[name]: name for name in misses}.values())
+
+        neighbors = index.nearest(np.array([vectors[name] for name in misses])) if misses else []
+        new = {}
+        for name, neighbor in zip(misses, neighbors):
+            if neighbor:
+                semantic += 1
+                examples.append((neighbor.score, name, neighbor.name))
+            else:
+                searched += 1
+                new[keys[name]] = (name, vectors[name])
+        # Every search is assumed to find images, so is cached and indexed
+        index.add(new)
+        cached.update(keys[name] for name in misses)
+
+    lookups = exact + semantic + searched
+    print(f"Menus:            {len(menus)}")
+    print(f"Dish lookups:     {lookups}")
+    print(f"Exact hits:       {exact:6} {exact / lookups:6.1%}")
+    print(f"Semantic hits:    {semantic:6} {semantic / lookups:6.1%}  (threshold {threshold})")
+    print(f"SerpAPI searches: {searched:6} {searched / lookups:6.1%}")
+    print(f"Searches avoided by the semantic tier: {semantic / max(1, semantic + searched):.1%} of exact misses")
+
+    if examples:
+        # The weakest accepted matches are where false merges show up
+        print()
+        print("Weakest semantic matches:")
+        for score, name, neighbor in sorted(examples)[:15]:
+            print(f"  {score:.3f}  {name!r} -> {neighbor!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dishes", type=int, default=100_000, help="synthetic index size")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--corpus", help="local directory or s3://bucket[/prefix] of menu.json files")
+    parser.add_argument("--threshold", type=float, default=semantic_cache.THRESHOLD)
+    args = parser.parse_args()
+
+    if args.corpus:
+        bench_corpus(args.corpus, args.threshold)
+    else:
+        bench_latency(args.dishes, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Report how much canonical dish names (lib.dish_names) improve the image
+cache hit rate over plain lowercased names.
+
+Replays a corpus of extracted menus (menu.json files) in order against an
+empty cache, once keyed the old way (name.lower().strip()) and once with
+canonical_dish_name, and counts the dishes that would have been served
+from cache - i.e. SerpAPI searches saved.
+
+Usage:
+    python report_dish_cache_keys.py <dir>                  # menu.json files under a local directory
+    python report_dish_cache_keys.py s3://<cache_bucket>    # {run_id}/menu.json in the cache bucket
+    python report_dish_cache_keys.py <dir> --examples 20
+    python report_dish_cache_keys.py --check                # known same/different names only
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api"))
+
+from lib.dish_names import canonical_dish_name  # noqa: E402
+
+
+# Names that must share a key, and names that must not
+SAME = [
+    ("Margherita Pizza", "Pizza Margherita", 'Margherita pizza (12")'),
+    ("Crème Brûlée", "Creme Brulee"),
+    ("Tacos", "Taco", "$12.99 Tacos"),
+    ("Large Fries", "Fries"),
+    ("Cherries", "Cherry"),
+    ("Apple Pies", "Apple Pie"),
+    ("Brownies", "Brownie"),
+    ("Cookies", "Cookie"),
+    ("Quiches", "Quiche"),
+    ("Sandwiches", "Sandwich"),
+    ("Potatoes", "Potato"),
+    ("12. Pad Thai", "Pad Thai"),
+    ("No. 3 Pho", "Pho"),
+]
+DIFFERENT = [
+    ("Chicken 65", "Chicken"),
+    ("Half Chicken", "Chicken"),
+    ("House Salad", "Salad"),
+    ("Caesar Salad", "Salad"),
+]
+
+
+def check():
+    """Check the SAME and DIFFERENT names. Returns the number of failures."""
+    failures = 0
+    for names in SAME:
+        keys = {name: canonical_dish_name(name) for name in names}
+        if len(set(keys.values())) != 1:
+            failures += 1
+            print(f"[SPLIT]  {keys}")
+    for first, second in DIFFERENT:
+        if canonical_dish_name(first) == canonical_dish_name(second):
+            failures += 1
+            print(f"[MERGED] {first!r}, {second!r} -> {canonical_dish_name(first)!r}")
+    print(f"{len(SAME) + len(DIFFERENT) - failures}/{len(SAME) + len(DIFFERENT)} name checks passed")
+    return failures
+
+
+def old_key(name):
+    return name.lower().strip()
+
+
+def load_local(root):
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in filenames if f == "menu.json")
+    # Oldest first, as the cache would have seen them
+    for path in sorted(paths, key=os.path.getmtime):
+        with open(path) as f:
+            yield path, json.load(f)
+
+
+def load_s3(bucket, prefix):
+    import boto3
+
+    s3 = boto3.client("s3")
+    objects = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        objects.extend(o for o in page.get("Contents", []) if o["Key"].endswith("/menu.json"))
+    for obj in sorted(objects, key=lambda o: o["LastModified"]):
+        body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+        yield obj["Key"], json.loads(body)
+
+
+def dish_names(menu):
+    for section in menu.get("sections", []):
+        for dish in section.get("dishes", []):
+            if dish.get("name"):
+                yield dish["name"]
+
+
+def replay(menus):
+    """Dish lookups per key scheme, replayed in corpus order."""
+    seen = {"old": set(), "new": set()}
+    hits = {"old": 0, "new": 0}
+    lookups = 0
+    runs = 0
+    spellings = defaultdict(set)
+
+    for _, menu in menus:
+        runs += 1
+        # The image engine searches each key once per menu, so a repeat
+        # within a menu counts as a hit like one from an earlier menu
+        for name in dict.fromkeys(dish_names(menu)):
+            lookups += 1
+            for scheme, key in (("old", old_key(name)), ("new", canonical_dish_name(name))):
+                if key in seen[scheme]:
+                    hits[scheme] += 1
+                seen[scheme].add(key)
+            spellings[canonical_dish_name(name)].add(old_key(name))
+
+    return runs, lookups, hits, seen, spellings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="local directory or s3://bucket[/prefix]")
+    parser.add_argument("--examples", type=int, default=10, help="merged name groups to show")
+    parser.add_argument("--check", action="store_true", help="check known same/different names")
+    args = parser.parse_args()
+
+    if args.check or not args.corpus:
+        if check():
+            sys.exit(1)
+        if not args.corpus:
+            return
+        print()
+
+    if args.corpus.startswith("s3://"):
+        bucket, _, prefix = args.corpus[5:].partition("/")
+        menus = load_s3(bucket, prefix)
+    else:
+        menus = load_local(args.corpus)
+
+    runs, lookups, hits, seen, spellings = replay(menus)
+    if not lookups:
+        print("No dishes found")
+        return
+
+    print(f"Menus:          {runs}")
+    print(f"Dish lookups:   {lookups}")
+    print(f"Distinct keys:  {len(seen['old'])} old, {len(seen['new'])} canonical")
+    print()
+    print(f"{'keys':<12}{'hits':>8}{'hit rate':>11}")
+    for scheme, label in (("old", "lowercase"), ("new", "canonical")):
+        print(f"{label:<12}{hits[scheme]:>8}{hits[scheme] / lookups:>10.1%}")
+    print()
+    saved = hits["new"] - hits["old"]
+    print(f"Uplift: {saved / lookups:+.1%} "
+          f"({saved} fewer SerpAPI searches, {len(seen['old']) - len(seen['new'])} fewer cache entries)")
+
+    merged = sorted(spellings.items(), key=lambda item: -len(item[1]))
+    merged = [(key, names) for key, names in merged if len(names) > 1][:args.examples]
+    if merged:
+        print()
+        print("Largest merged groups:")
+        for key, names in merged:
+            print(f"  {key!r} <- {', '.join(sorted(names))}")
+
+
+if __name__ == "__main__":
+    main()
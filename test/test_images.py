@@ -93,20 +93,29 @@ def test_images(run_id):
     print(f"\nTesting images for run_id: {run_id}")
     print("=" * 60)
 
-    # Call the images endpoint
-    response = requests.post(
-        f"{API_URL}/menu/images",
-        json={"run_id": run_id},
-        timeout=60
-    )
+    # Call the images endpoint, following progress until every dish is done
+    body = {"run_id": run_id}
+    by_name = {}
+    while True:
+        response = requests.post(
+            f"{API_URL}/menu/images",
+            json=body,
+            timeout=60
+        )
+
+        if response.status_code != 200:
+            print(f"ERROR: API returned {response.status_code}")
+            print(response.text)
+            return False
 
-    if response.status_code != 200:
-        print(f"ERROR: API returned {response.status_code}")
-        print(response.text)
-        return False
+        data = response.json()
+        for dish in data.get("dishes", []):
+            by_name[dish.get("name")] = dish
+        if data.get("complete", True):
+            break
+        body = {"run_id": run_id, "since": data["seq"], "wait": 15}
 
-    data = response.json()
-    dishes = data.get("dishes", [])
+    dishes = list(by_name.values())
 
     print(f"\nFound {len(dishes)} dishes")
     print("-" * 60)